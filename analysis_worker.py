@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+from data.folder_analysis import list_target_folders, analizar_destinos
+from data.ftp_targets import list_targets
+from data.google_sheets import load_excel_data
+from data.tracing import profile_thread, profiled, span
+
+
+class AnalysisWorker(QObject):
+    folders_listed = pyqtSignal(object)  # Servidor -> carpetas del FTP, antes de cruzarlas con la planilla
+    sheet_loaded = pyqtSignal(object)  # Registros de la planilla
+    target_failed = pyqtSignal(str, str)  # Servidor que falló o no respondió a tiempo, y el motivo
+    finished = pyqtSignal(list, list, list)  # Carpetas en uso, disponibles y faltantes en el FTP
+    error = pyqtSignal(str)  # Señal para indicar un error durante el análisis
+
+    def __init__(self, targets, sheet_url, credentials_file, remote_indexes=None, pools=None):
+        """
+        Constructor del worker que analiza las carpetas fuera del hilo de la interfaz.
+
+        Args:
+            targets: Destinos FTP (servidor y directorio raíz) a analizar, ver ftp_targets.
+            sheet_url: URL del Google Sheet con las asignaciones.
+            credentials_file: Ruta al archivo de credenciales de Google.
+            remote_indexes: Diccionario opcional servidor -> RemoteIndex. Si un
+                índice ya tiene las carpetas, se muestran al instante mientras
+                se actualiza la raíz.
+            pools: Diccionario opcional servidor -> FTPPool compartido; los
+                destinos sin pool abren una conexión propia.
+        """
+        super().__init__()
+        self.targets = targets
+        self.sheet_url = sheet_url
+        self.credentials_file = credentials_file
+        self.remote_indexes = remote_indexes or {}
+        self.pools = pools or {}
+        self.folders_by_server = {}
+
+    def list_ftp_folders(self, target):
+        """
+        Conecta al FTP del destino (o toma una conexión del pool) y lista las carpetas del directorio raíz.
+        """
+        return list_target_folders(
+            target, self.remote_indexes.get(target["name"]), self.pools.get(target["name"])
+        )
+
+    def on_target_listed(self, result):
+        if result.error is not None:
+            self.target_failed.emit(result.target["name"], result.error)
+            return
+        self.folders_by_server[result.target["name"]] = result.folders
+        self.folders_listed.emit(dict(self.folders_by_server))
+
+    def on_sheet_loaded(self, future):
+        if future.exception() is None:
+            self.sheet_loaded.emit(future.result())
+
+    def run(self):
+        """
+        Obtiene el listado de todos los destinos FTP y la planilla al mismo tiempo y los cruza.
+
+        Los destinos se listan en paralelo, cada uno con su plazo. Cada
+        resultado se emite apenas llega, de modo que la interfaz puede
+        mostrar las carpetas del FTP mientras la planilla todavía se
+        descarga. Un destino que falla se informa con target_failed y queda
+        fuera del resultado; sólo es un error si no respondió ninguno.
+        """
+        with profiled("analisis"), span("analysis", targets=len(self.targets)):
+            self.analyze()
+
+    def analyze(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            for target in self.targets:
+                index = self.remote_indexes.get(target["name"])
+                if index is not None and index.has_directory(target["base_path"]):
+                    self.folders_by_server[target["name"]] = index.folders(target["base_path"])
+            if self.folders_by_server:
+                self.folders_listed.emit(dict(self.folders_by_server))
+
+            sheet_future = executor.submit(profile_thread(load_excel_data), self.sheet_url, self.credentials_file)
+            sheet_future.add_done_callback(self.on_sheet_loaded)
+
+            results = list_targets(self.targets, profile_thread(self.list_ftp_folders), on_result=self.on_target_listed)
+            listed = {result.target["name"]: result.folders for result in results if result.error is None}
+            if not listed:
+                raise ConnectionError("; ".join(f"{result.target['name']}: {result.error}" for result in results))
+
+            used, available, missing = analizar_destinos(listed, sheet_future.result(), "Carpeta", "Editor")
+            self.finished.emit(used, available, missing)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,89 @@
+"""
+Benchmark del cruce carpetas FTP / planilla.
+
+Compara analizar_carpetas con el cálculo anterior de analyze_folders (dos
+búsquedas con máscara booleana por cada carpeta en uso). El método
+anterior sólo se mide si pandas está instalado, y sobre una muestra de
+carpetas para que el benchmark no tarde minutos; el resultado se
+extrapola al total.
+
+Uso:
+    python -m benchmarks.bench_analysis --rows 100000
+"""
+import argparse
+import random
+import time
+
+from data.folder_analysis import analizar_carpetas
+from data.google_sheets import SheetSnapshot
+
+
+def generate_data(rows, folders, seed=0):
+    """
+    Genera registros de planilla y un listado de carpetas FTP sintéticos.
+    """
+    rng = random.Random(seed)
+    sheet = {
+        "Carpeta": [f"CARPETA_{rng.randrange(rows * 2):07d}" for _ in range(rows)],
+        "Editor": [f"Editor {rng.randrange(50)}" for _ in range(rows)],
+    }
+    ftp_folders = [f"CARPETA_{i:07d}" for i in range(0, folders * 2, 2)]
+    return sheet, ftp_folders
+
+
+def legacy_join(sheet_data, used):
+    """
+    Reproduce el cálculo original de used_with_editor en analyze_folders.
+    """
+    return [
+        (folder, sheet_data.loc[sheet_data["Carpeta"] == folder, "Editor"].values[0]
+         if len(sheet_data.loc[sheet_data["Carpeta"] == folder, "Editor"].values) > 0
+         else "Sin Editor")
+        for folder in used
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="filas de la planilla")
+    parser.add_argument("--folders", type=int, default=100_000, help="carpetas en el FTP")
+    parser.add_argument("--legacy-sample", type=int, default=200, help="carpetas medidas con el método anterior")
+    args = parser.parse_args()
+
+    sheet, ftp_folders = generate_data(args.rows, args.folders)
+
+    start = time.perf_counter()
+    used, available, missing = analizar_carpetas(ftp_folders, sheet)
+    elapsed = time.perf_counter() - start
+    print(f"analizar_carpetas (dict): {elapsed * 1000:.1f} ms "
+          f"({len(used)} en uso, {len(available)} disponibles, {len(missing)} faltantes)")
+
+    start = time.perf_counter()
+    snapshot = SheetSnapshot.from_columns(sheet["Carpeta"], sheet["Editor"])
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    analizar_carpetas(ftp_folders, snapshot)
+    print(f"analizar_carpetas (SheetSnapshot): {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"+ {built * 1000:.1f} ms al cargar la planilla ({len(snapshot)} carpetas registradas)")
+
+    try:
+        import pandas as pd
+    except ImportError:
+        print("pandas no está instalado: se omite la comparación con el método anterior.")
+        return
+
+    frame = pd.DataFrame(sheet)
+    start = time.perf_counter()
+    used, _, _ = analizar_carpetas(ftp_folders, frame)
+    print(f"analizar_carpetas (DataFrame): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    sample = [folder for folder, _ in used[:args.legacy_sample]]
+    start = time.perf_counter()
+    legacy_join(frame, sample)
+    per_folder = (time.perf_counter() - start) / max(len(sample), 1)
+    print(f"método anterior: {per_folder * 1000:.2f} ms por carpeta, "
+          f"~{per_folder * len(used):.1f} s estimados para {len(used)} carpetas en uso")
+
+
+if __name__ == "__main__":
+    main()
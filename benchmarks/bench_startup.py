@@ -0,0 +1,173 @@
+"""
+Benchmark del tiempo de arranque de la aplicación.
+
+Mide, en procesos nuevos de Python:
+  - el tiempo de importación de ui.main_window (con python -X importtime),
+    y verifica que no se importen dependencias pesadas al arrancar;
+  - el tiempo hasta la primera ventana visible (Qt con la plataforma
+    "offscreen", así que no hace falta pantalla);
+  - el tiempo de arranque de la línea de comandos (cli.py --help).
+
+Termina con código 1 si algún valor supera su límite, para usarlo como
+control de regresiones:
+
+    python -m benchmarks.bench_startup --max-window 1.5 --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deben cargarse hasta el primer análisis o acceso a la planilla
+HEAVY_MODULES = ("pandas", "numpy", "gspread", "oauth2client", "googleapiclient")
+
+FIRST_WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+import sys
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication
+from ui.main_window import FolderManagerApp
+
+app = QApplication(sys.argv)
+window = FolderManagerApp()
+window.show()
+
+def shown():
+    print(f"FIRST_WINDOW {time.perf_counter() - start:.4f}")
+    window.sheet_queue.stop(timeout=0)
+    app.quit()
+
+QTimer.singleShot(0, shown)
+app.exec()
+"""
+
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def last_line(text):
+    lines = text.strip().splitlines()
+    return lines[-1] if lines else ""
+
+
+def run_python(args, env=None):
+    environment = dict(os.environ, **(env or {}))
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, env=environment, capture_output=True, text=True,
+    )
+
+
+def measure_imports(module):
+    """
+    Importa un módulo con -X importtime.
+
+    Returns:
+        Tupla (microsegundos_totales, top_10, pesados), donde top_10 es una
+        lista de (módulo, microsegundos acumulados) y pesados los módulos de
+        HEAVY_MODULES que se importaron.
+    """
+    result = run_python(["-X", "importtime", "-c", f"import {module}"])
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}: {last_line(result.stderr)}")
+
+    entries = []
+    total = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2))
+        name = match.group(4)
+        entries.append((name, cumulative))
+        if len(match.group(3)) == 1:  # Módulo de primer nivel
+            total += cumulative
+
+    heavy = sorted({name.split(".")[0] for name, _ in entries if name.split(".")[0] in HEAVY_MODULES})
+    top = sorted(entries, key=lambda entry: entry[1], reverse=True)[:10]
+    return total, top, heavy
+
+
+def measure_first_window(repeat):
+    """
+    Devuelve la mediana, en segundos, del tiempo hasta mostrar la ventana.
+    """
+    times = []
+    for _ in range(repeat):
+        result = run_python(["-c", FIRST_WINDOW_SCRIPT], env={"QT_QPA_PLATFORM": "offscreen"})
+        match = re.search(r"FIRST_WINDOW ([\d.]+)", result.stdout)
+        if result.returncode != 0 or not match:
+            raise RuntimeError(f"No se pudo abrir la ventana: {last_line(result.stderr)}")
+        times.append(float(match.group(1)))
+    return statistics.median(times)
+
+
+def measure_cli(repeat):
+    """
+    Devuelve la mediana, en segundos, de "python cli.py --help" (proceso completo).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run_python(["cli.py", "--help"])
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"cli.py --help falló: {last_line(result.stderr)}")
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por medición")
+    parser.add_argument("--max-import", type=float, default=0.8, help="límite de importación de la ventana (s)")
+    parser.add_argument("--max-window", type=float, default=1.5, help="límite hasta la primera ventana (s)")
+    parser.add_argument("--max-cli", type=float, default=0.5, help="límite de arranque de la CLI (s)")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+
+    cli_time = measure_cli(args.repeat)
+    results["cli_seconds"] = cli_time
+    print(f"CLI (--help): {cli_time * 1000:.0f} ms")
+    if cli_time > args.max_cli:
+        failures.append(f"la CLI tarda {cli_time:.2f} s (límite {args.max_cli} s)")
+
+    try:
+        import_us, top, heavy = measure_imports("ui.main_window")
+    except RuntimeError as e:
+        print(f"Se omiten las mediciones de la ventana: {e}")
+    else:
+        results["import_seconds"] = import_us / 1e6
+        results["heavy_modules"] = heavy
+        print(f"Importación de ui.main_window: {import_us / 1000:.0f} ms")
+        for name, cumulative in top:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        if heavy:
+            failures.append(f"se importan dependencias pesadas al arrancar: {', '.join(heavy)}")
+        if import_us / 1e6 > args.max_import:
+            failures.append(f"la importación tarda {import_us / 1e6:.2f} s (límite {args.max_import} s)")
+
+        window_time = measure_first_window(args.repeat)
+        results["first_window_seconds"] = window_time
+        print(f"Hasta la primera ventana: {window_time * 1000:.0f} ms")
+        if window_time > args.max_window:
+            failures.append(f"la ventana tarda {window_time:.2f} s (límite {args.max_window} s)")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    for failure in failures:
+        print(f"REGRESIÓN: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
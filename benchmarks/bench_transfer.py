@@ -0,0 +1,460 @@
+"""
+Benchmark de transferencia contra un servidor FTP local.
+
+Levanta un servidor pyftpdlib en 127.0.0.1 (opcionalmente con latencia
+agregada a cada orden), genera árboles de prueba y descarga cada uno con:
+  - worker: DownloadWorker (o DownloadEngine, el mismo motor, si PyQt6 no
+    está instalado);
+  - worker-z: el mismo motor con compresión MODE Z (el servidor de prueba
+    la anuncia en FEAT); se informa la aceleración respecto de worker;
+  - legacy: data.folder_analysis.download_directory (una sola conexión).
+
+Cada descarga corre en un proceso nuevo para medir su pico de memoria
+(RSS). Se informan archivos/s, MB/s, idas y vueltas (órdenes recibidas por
+el servidor) y pico de RSS, y se pueden guardar en JSON para comparar:
+
+    python -m benchmarks.bench_transfer --latency-ms 20 --output transfer.json
+    python -m benchmarks.bench_transfer --baseline transfer.json
+
+En 127.0.0.1 la red no es el cuello de botella y comprimir sólo agrega
+CPU; para ver el efecto de MODE Z conviene limitar la velocidad de envío
+del servidor, por ejemplo a un enlace de 20 Mbit/s:
+
+    python -m benchmarks.bench_transfer --scenarios text huge --server-mbps 20
+
+Con la velocidad limitada también se ve la cola de una carpeta con un
+archivo enorme al final del recorrido (los más grandes van primero):
+
+    python -m benchmarks.bench_transfer --scenarios skewed --targets worker --server-mbps 100
+
+Requiere pyftpdlib (pip install pyftpdlib); no es una dependencia de la
+aplicación.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER = "bench"
+PASSWORD = "bench"
+BLOCK = 1024 * 1024
+
+SCENARIOS = ("tiny", "huge", "deep", "text", "skewed")
+TARGETS = ("worker", "worker-z", "legacy")
+
+
+def write_file(path, size, block):
+    with open(path, "wb") as file:
+        remaining = size
+        while remaining > 0:
+            chunk = block[:min(len(block), remaining)]
+            file.write(chunk)
+            remaining -= len(chunk)
+
+
+def text_block():
+    """
+    Devuelve 1 MiB de texto parecido a un XML de edición, que se comprime bien.
+    """
+    rng = random.Random(0)
+    tracks = ("V1", "V2", "A1", "A2", "A3", "A4")
+    states = ("pendiente", "editado", "aprobado", "descartado")
+    lines = []
+    size = 0
+    while size < BLOCK:
+        line = (
+            f'<clip id="{rng.randrange(10 ** 6)}" pista="{rng.choice(tracks)}" '
+            f'entrada="{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}:{rng.randrange(25):02d}" '
+            f'duracion="{rng.randrange(1, 6000)}" estado="{rng.choice(states)}"/>\n'
+        )
+        lines.append(line)
+        size += len(line)
+    return "".join(lines).encode()[:BLOCK]
+
+
+def generate_tree(root, scenario, scale=1.0):
+    """
+    Genera un árbol de prueba y devuelve (archivos, bytes).
+
+    Salvo en text, los datos son aleatorios (un bloque de 1 MiB repetido),
+    así que no se comprimen: la medición no depende del contenido.
+
+      - tiny: muchos archivos de 1 KiB repartidos en 20 carpetas.
+      - huge: pocos archivos grandes.
+      - deep: carpetas anidadas 30 niveles, con unos pocos archivos por nivel.
+      - text: archivos XML de 2 MiB, comprimibles (para medir MODE Z).
+      - skewed: muchos archivos medianos y uno enorme en la última carpeta
+        del recorrido (para medir la cola que evita el plan LPT).
+    """
+    block = text_block() if scenario == "text" else os.urandom(BLOCK)
+    files = []
+    if scenario == "tiny":
+        for i in range(int(2000 * scale)):
+            files.append((os.path.join(f"dir_{i % 20:02d}", f"file_{i:05d}.txt"), 1024))
+    elif scenario == "huge":
+        for i in range(3):
+            files.append((f"video_{i}.mov", int(64 * scale) * BLOCK))
+    elif scenario == "deep":
+        path = ""
+        for level in range(30):
+            path = os.path.join(path, f"nivel_{level:02d}")
+            for i in range(max(1, int(5 * scale))):
+                files.append((os.path.join(path, f"file_{i}.bin"), 16 * 1024))
+    elif scenario == "text":
+        for i in range(max(1, int(40 * scale))):
+            files.append((os.path.join(f"proyecto_{i % 4}", f"timeline_{i:03d}.xml"), 2 * BLOCK))
+    elif scenario == "skewed":
+        for i in range(int(120 * scale)):
+            files.append((os.path.join(f"toma_{i % 6}", f"clip_{i:04d}.mxf"), BLOCK // 2))
+        files.append((os.path.join("z_master", "master.mov"), int(48 * scale) * BLOCK))
+    else:
+        raise ValueError(f"Escenario desconocido: {scenario}")
+
+    total = 0
+    for relative_path, size in files:
+        path = os.path.join(root, scenario, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_file(path, size, block)
+        total += size
+    return len(files), total
+
+
+class ServerFile:
+    """
+    Archivo de lectura del servidor de prueba.
+
+    Con compress entrega el contenido comprimido con zlib (MODE Z). Cada
+    lectura informa a on_read cuántos bytes saldrán por la red, para
+    contarlos o para limitar la velocidad de envío.
+    """
+
+    def __init__(self, file, compress=False, on_read=None):
+        self.file = file
+        self.name = file.name
+        self.on_read = on_read
+        # Nivel 1: el servidor no debe ser el cuello de botella de la prueba
+        self._compressor = zlib.compressobj(1) if compress else None
+        self._done = False
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def read(self, size=-1):
+        if self._compressor is None:
+            output = self.file.read(size)
+        else:
+            output = b""
+            while not output and not self._done:
+                data = self.file.read(size if size > 0 else BLOCK)
+                if data:
+                    output = self._compressor.compress(data)
+                else:
+                    output = self._compressor.flush()
+                    self._done = True
+        if self.on_read is not None:
+            self.on_read(len(output))
+        return output
+
+    def close(self):
+        self.file.close()
+
+
+class BenchServer:
+    """
+    Servidor pyftpdlib en un hilo, que cuenta las órdenes recibidas.
+
+    Cada conexión se atiende en su propio hilo, así que la latencia
+    agregada no frena a las demás conexiones. El servidor anuncia MODE Z
+    y, con server_mbps, limita la velocidad de envío de cada conexión
+    (sumando todos sus archivos) para simular un enlace real.
+    """
+
+    def __init__(self, root, latency=0.0, server_mbps=None):
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.filesystems import AbstractedFS
+        from pyftpdlib.handlers import FTPHandler
+        from pyftpdlib.servers import ThreadedFTPServer
+
+        self.commands = Counter()
+        self.compressed_bytes = 0
+        lock = threading.Lock()
+        commands = self.commands
+        server = self
+        byte_rate = server_mbps * 1000 * 1000 / 8 if server_mbps else None
+
+        class BenchFS(AbstractedFS):
+            def open(self, filename, mode):
+                file = super().open(filename, mode)
+                handler = self.cmd_channel
+                if "r" not in mode or not (handler.mode_z or byte_rate):
+                    return file
+                # Sin fileno pyftpdlib no usa sendfile y lee el archivo por bloques
+                return ServerFile(file, handler.mode_z, lambda count: handler.sent(count, handler.mode_z))
+
+        class CountingHandler(FTPHandler):
+            abstracted_fs = BenchFS
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.mode_z = False
+                self.send_until = 0.0
+                self._extra_feats.append("MODE Z")
+
+            def ftp_MODE(self, line):
+                mode = line.upper()
+                if mode in ("S", "Z"):
+                    self.mode_z = mode == "Z"
+                    self.respond(f"200 Transfer mode set to: {mode}")
+                else:
+                    super().ftp_MODE(line)
+
+            def sent(self, count, compressed):
+                if compressed:
+                    with lock:
+                        server.compressed_bytes += count
+                if byte_rate:
+                    # Cada conexión tiene su propio hilo: dormir sólo frena a esta
+                    now = time.monotonic()
+                    self.send_until = max(self.send_until, now) + count / byte_rate
+                    if self.send_until > now:
+                        time.sleep(self.send_until - now)
+
+            def pre_process_command(self, line, cmd, arg):
+                with lock:
+                    commands[cmd] += 1
+                if latency:
+                    time.sleep(latency)
+                super().pre_process_command(line, cmd, arg)
+
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USER, PASSWORD, root, perm="elr")
+        CountingHandler.authorizer = authorizer
+        CountingHandler.banner = "bench"
+
+        self.server = ThreadedFTPServer(("127.0.0.1", 0), CountingHandler)
+        self.port = self.server.socket.getsockname()[1]
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"handle_exit": False}, daemon=True
+        )
+
+    def __enter__(self):
+        import logging
+        from pyftpdlib.log import config_logging
+        # Sin esto pyftpdlib registra cada orden en stderr
+        config_logging(level=logging.WARNING)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.close_all()
+
+    def reset(self):
+        self.commands.clear()
+        self.compressed_bytes = 0
+
+
+def peak_rss_bytes():
+    """
+    Devuelve el pico de memoria residente del proceso actual, o None.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_client(target, port, remote_directory, local_directory, connections):
+    """
+    Descarga remote_directory en este proceso y devuelve la medición.
+    """
+    sys.path.insert(0, ROOT)
+    ftp_config = {"host": "127.0.0.1", "port": port, "user": USER, "password": PASSWORD}
+    used = target
+    if target == "worker-z":
+        ftp_config["mode_z"] = True
+
+    start = time.perf_counter()
+    if target in ("worker", "worker-z"):
+        try:
+            from download_worker import DownloadWorker
+        except ImportError:
+            from data.download_engine import DownloadEngine
+            used = target.replace("worker", "engine")
+            DownloadEngine(ftp_config, remote_directory, local_directory, max_connections=connections).run()
+        else:
+            # run() es síncrono: se llama directamente, sin QThread
+            worker = DownloadWorker(ftp_config, remote_directory, local_directory, max_connections=connections)
+            errors = []
+            worker.error.connect(errors.append)
+            worker.run()
+            if errors:
+                raise RuntimeError(errors[0])
+    else:
+        from data.folder_analysis import close_ftp_connection, connect_ftp, download_directory
+        ftp = connect_ftp(ftp_config["host"], USER, PASSWORD, port=port)
+        try:
+            download_directory(ftp, remote_directory, local_directory)
+        finally:
+            close_ftp_connection(ftp)
+    seconds = time.perf_counter() - start
+
+    return {"target": used, "seconds": seconds, "peak_rss_bytes": peak_rss_bytes()}
+
+
+def measure(server, target, scenario, files, total_bytes, connections, work_dir):
+    local_directory = os.path.join(work_dir, f"descarga_{scenario}_{target}")
+    shutil.rmtree(local_directory, ignore_errors=True)
+    os.makedirs(local_directory)
+
+    server.reset()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_transfer", "--client", target,
+         "--port", str(server.port), "--remote", f"/{scenario}", "--local", local_directory,
+         "--connections", str(connections)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    shutil.rmtree(local_directory, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "sin salida")
+
+    client = json.loads(result.stdout.strip().splitlines()[-1])
+    seconds = client["seconds"]
+    commands = dict(server.commands)
+    return {
+        "scenario": scenario,
+        "target": client["target"],
+        "files": files,
+        "bytes": total_bytes,
+        "seconds": seconds,
+        "files_per_second": files / seconds if seconds else None,
+        "mb_per_second": total_bytes / (1024 * 1024) / seconds if seconds else None,
+        "round_trips": sum(commands.values()),
+        "compressed_bytes": server.compressed_bytes,
+        "commands": commands,
+        "peak_rss_mb": client["peak_rss_bytes"] / (1024 * 1024) if client["peak_rss_bytes"] else None,
+    }
+
+
+def print_result(row, baseline=None):
+    line = (
+        f"{row['scenario']:5} {row['target']:8} {row['seconds']:8.2f} s "
+        f"{row['files_per_second']:9.1f} arch/s {row['mb_per_second']:8.1f} MB/s "
+        f"{row['round_trips']:7d} órdenes"
+    )
+    if row["peak_rss_mb"] is not None:
+        line += f" {row['peak_rss_mb']:7.1f} MB RSS"
+    if baseline:
+        previous = baseline.get((row["scenario"], row["target"]))
+        if previous and previous["seconds"]:
+            change = (row["seconds"] - previous["seconds"]) * 100 / previous["seconds"]
+            line += f"  ({change:+.0f}% tiempo)"
+    print(line)
+
+
+def print_mode_z_speedup(rows):
+    """
+    Compara la descarga con MODE Z con la descarga sin compresión del mismo escenario.
+    """
+    by_target = {row["target"].replace("engine", "worker"): row for row in rows}
+    plain = by_target.get("worker")
+    compressed = by_target.get("worker-z")
+    if not plain or not compressed or not compressed["seconds"]:
+        return
+    line = f"{plain['scenario']:5} MODE Z: {plain['seconds'] / compressed['seconds']:.2f}x"
+    if compressed["compressed_bytes"]:
+        ratio = compressed["compressed_bytes"] * 100 / compressed["bytes"]
+        line += f", datos comprimidos al {ratio:.0f}% del tamaño original"
+    else:
+        line += ", ningún archivo se envió comprimido"
+    print(line)
+
+
+def client_main(args):
+    result = run_client(args.client, args.port, args.remote, args.local, args.connections)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica la cantidad o el tamaño de los archivos")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latencia agregada a cada orden FTP")
+    parser.add_argument("--connections", type=int, default=4, help="conexiones del motor de descarga")
+    parser.add_argument("--server-mbps", type=float,
+                        help="velocidad máxima de envío del servidor por conexión, en Mbit/s")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior para comparar")
+    # Uso interno: ejecutar una descarga en un proceso nuevo
+    parser.add_argument("--client", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--remote", help=argparse.SUPPRESS)
+    parser.add_argument("--local", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        client_main(args)
+        return
+
+    try:
+        import pyftpdlib  # noqa: F401
+    except ImportError:
+        sys.exit("Este benchmark necesita pyftpdlib: pip install pyftpdlib")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = {(row["scenario"], row["target"]): row for row in json.load(file)["results"]}
+
+    work_dir = tempfile.mkdtemp(prefix="bench_transfer_")
+    server_root = os.path.join(work_dir, "servidor")
+    results = []
+    try:
+        trees = {scenario: generate_tree(server_root, scenario, args.scale) for scenario in args.scenarios}
+        with BenchServer(server_root, args.latency_ms / 1000, args.server_mbps) as server:
+            for scenario in args.scenarios:
+                files, total_bytes = trees[scenario]
+                rows = []
+                for target in args.targets:
+                    row = measure(server, target, scenario, files, total_bytes, args.connections, work_dir)
+                    rows.append(row)
+                    print_result(row, baseline)
+                print_mode_z_speedup(rows)
+                results.extend(rows)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "config": {
+                    "scale": args.scale,
+                    "latency_ms": args.latency_ms,
+                    "connections": args.connections,
+                    "server_mbps": args.server_mbps,
+                    "python": sys.version.split()[0],
+                    "platform": sys.platform,
+                },
+                "results": results,
+            }, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+Interfaz de línea de comandos, sin Qt, para análisis y descargas programadas.
+
+Ejemplos:
+    python cli.py analyze --format json
+    python cli.py analyze --format csv --output carpetas.csv
+    python cli.py download CARPETA_1 CARPETA_2 --editor "Ana" --dest ~/Descargas --jobs 2
+    python cli.py verify CARPETA_1 --dest ~/Descargas
+    python cli.py upload CARPETA_1 --dest ~/Descargas
+    python cli.py index
+    python cli.py analyze --index --format csv
+    python cli.py download CARPETA_1 --server archivo --editor "Ana" --no-sheet
+    python cli.py --trace-log trazas.jsonl --metrics gestor.prom --profile perfiles analyze
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config.utils import get_file_path
+from data.download_engine import DownloadEngine, summary_message
+from data.ftp_targets import ftp_targets, find_target
+from data.tracing import disable_tracing, enable_tracing, profile_thread, profiled
+from data.transfer_progress import format_bytes, format_duration
+
+DEFAULT_CONFIG_FILE = get_file_path("credentials/ftp_config.json")
+DEFAULT_CREDENTIALS_FILE = get_file_path("credentials/credentials.json")
+PROGRESS_INTERVAL = 2.0  # segundos entre líneas de avance por carpeta
+
+
+def load_cli_targets(config_path):
+    """
+    Carga la configuración y devuelve (destinos, google_sheet_url).
+
+    Acepta tanto el formato plano que guarda el diálogo de configuración como
+    uno con las credenciales anidadas bajo la clave "ftp". La lista "targets"
+    agrega otros servidores o directorios raíz (ver ftp_targets).
+    """
+    with open(config_path, "r") as file:
+        config = json.load(file)
+    targets = ftp_targets(config)
+    if not targets:
+        raise ValueError("Falta la clave de configuración: host")
+    for target in targets:
+        for key in ("host", "user", "password", "base_path"):
+            if not target.get(key):
+                raise ValueError(f"Falta la clave de configuración {key} en {target['name']}")
+    return targets, config.get("google_sheet_url")
+
+
+def load_cli_config(config_path, server=None):
+    """
+    Carga la configuración y devuelve (ftp_config, google_sheet_url) del
+    destino con ese nombre (por defecto, el principal).
+    """
+    targets, sheet_url = load_cli_targets(config_path)
+    if server is None:
+        return targets[0], sheet_url
+    try:
+        return find_target(targets, server), sheet_url
+    except KeyError as e:
+        raise ValueError(e.args[0])
+
+
+@profiled("analisis")
+def command_analyze(args):
+    """
+    Lista las carpetas de todos los destinos FTP en paralelo, las cruza con la
+    planilla e imprime el resultado.
+
+    Un destino que falla o no responde a tiempo se informa en stderr y el
+    resto se imprime igual (el código de salida es 1).
+    """
+    from data.folder_analysis import list_target_folders, analizar_destinos
+    from data.ftp_targets import list_targets
+    from data.google_sheets import load_excel_data
+
+    targets, sheet_url = load_cli_targets(args.config)
+    if not sheet_url:
+        raise ValueError("URL de Google Sheets no configurada.")
+
+    indexes = {}
+    if args.index:
+        from data.remote_index import RemoteIndex, server_key
+        # Un índice por servidor, compartido por sus directorios raíz
+        by_key = {}
+        for target in targets:
+            key = server_key(target)
+            if key not in by_key:
+                by_key[key] = RemoteIndex(key)
+            indexes[target["name"]] = by_key[key]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        sheet_future = executor.submit(profile_thread(load_excel_data), sheet_url, args.credentials)
+        results = list_targets(
+            targets, profile_thread(lambda target: list_target_folders(target, indexes.get(target["name"])))
+        )
+        errors = {result.target["name"]: result.error for result in results if result.error is not None}
+        for server, error in errors.items():
+            print(f"[{server}] Error: {error}", file=sys.stderr)
+        listed = {result.target["name"]: result.folders for result in results if result.error is None}
+        if not listed:
+            raise ConnectionError("No respondió ningún servidor FTP.")
+        used, available, missing = analizar_destinos(listed, sheet_future.result())
+
+    summaries = {
+        target["name"]: indexes[target["name"]].folder_summaries(target["base_path"])
+        for target in targets if target["name"] in indexes and target["name"] in listed
+    }
+    empty = (None, None, None)
+
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            data = {
+                "used": [{"carpeta": folder, "editor": editor, "servidor": server} for folder, editor, server in used],
+                "available": [{"carpeta": folder, "servidor": server} for folder, server in available],
+                "missing": missing,
+            }
+            if errors:
+                data["errors"] = errors
+            if indexes:
+                data["sizes"] = {
+                    server: {
+                        folder: {"archivos": summary.files, "bytes": summary.bytes}
+                        for folder, summary in folders.items()
+                    }
+                    for server, folders in summaries.items()
+                }
+            json.dump(data, output, ensure_ascii=False, indent=2)
+            output.write("\n")
+        else:
+            writer = csv.writer(output)
+            writer.writerow(["estado", "carpeta", "editor", "servidor", "archivos", "bytes"])
+            for state, rows in (("en_uso", used),
+                                ("disponible", [(folder, "", server) for folder, server in available]),
+                                ("faltante_en_ftp", [(folder, "", "") for folder in missing])):
+                for folder, editor, server in rows:
+                    files, size, _ = summaries.get(server, {}).get(folder, empty)
+                    writer.writerow((state, folder, editor, server,
+                                     "" if files is None else files, "" if size is None else size))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if errors else 0
+
+
+def command_index(args):
+    """
+    Actualiza el índice local del FTP e imprime el tamaño de cada carpeta.
+
+    Recorre todos los destinos configurados, o sólo el indicado con --server.
+    """
+    from data.folder_analysis import connect_ftp, close_ftp_connection
+    from data.remote_index import RemoteIndex, server_key
+
+    if args.server:
+        targets = [load_cli_config(args.config, args.server)[0]]
+    else:
+        targets, _ = load_cli_targets(args.config)
+
+    for target in targets:
+        index = RemoteIndex(server_key(target))
+        try:
+            ftp = connect_ftp(target["host"], target["user"], target["password"], port=target.get("port", 21))
+            try:
+                stats = index.refresh(ftp, target["base_path"], force=args.force)
+            finally:
+                close_ftp_connection(ftp)
+
+            for folder, summary in sorted(index.folder_summaries(target["base_path"]).items()):
+                print(f"{folder}\t{summary.files}\t{format_bytes(summary.bytes or 0)}\t{target['name']}")
+        finally:
+            index.close()
+        print(f"[{target['name']}] {stats.listed} directorios listados, {stats.skipped} sin cambios.",
+              file=sys.stderr)
+    return 0
+
+
+def print_progress(folder):
+    """
+    Devuelve un callback que imprime el avance de una carpeta en stderr.
+    """
+    last = [0.0]
+
+    def report(stats):
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL and stats.bytes_done < stats.bytes_total:
+            return
+        last[0] = now
+        percentage = stats.bytes_done * 100 / stats.bytes_total if stats.bytes_total else 100
+        print(
+            f"[{folder}] {percentage:5.1f}% {stats.files_done}/{stats.files_total} archivos, "
+            f"{format_bytes(stats.bytes_done)} - {stats.rate / (1024 * 1024):.1f} MB/s - "
+            f"ETA {format_duration(stats.eta)}",
+            file=sys.stderr,
+        )
+    return report
+
+
+def write_plan_report(path, folder, ftp_config, result):
+    """
+    Agrega a un archivo JSON-lines el plan de transferencia de una carpeta,
+    con la duración prevista y la real, para ajustar la estimación.
+    """
+    if not path or result.plan is None:
+        return
+    line = {"carpeta": folder, "servidor": ftp_config["name"], **result.plan.report()}
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def command_download(args):
+    """
+    Descarga una o varias carpetas en paralelo y registra las asignaciones.
+    """
+    ftp_config, sheet_url = load_cli_config(args.config, args.server)
+    update_sheet = not args.no_sheet
+    if update_sheet and not args.editor:
+        raise ValueError("Indica --editor o usa --no-sheet para no actualizar la planilla.")
+    if update_sheet and not sheet_url:
+        raise ValueError("URL de Google Sheets no configurada.")
+
+    from data.ftp_pool import close_pools, get_pool
+
+    if args.mode_z:
+        ftp_config = dict(ftp_config, mode_z=True)
+    if args.content_store:
+        ftp_config = dict(ftp_config, content_store=args.content_store)
+    dest = os.path.expanduser(args.dest)
+    # Un solo pool para todas las carpetas: respeta "pool_size" aunque --jobs x --connections sea mayor
+    pool = get_pool(ftp_config)
+
+    def download(folder):
+        local_directory = os.path.join(dest, folder)
+        engine = DownloadEngine(
+            ftp_config,
+            f"{ftp_config['base_path']}/{folder}",
+            local_directory,
+            max_connections=args.connections,
+            mirror=args.mirror,
+            delete_extraneous=args.delete_extraneous,
+            on_transfer_progress=None if args.quiet else print_progress(folder),
+            pool=pool,
+        )
+        return engine.run()
+
+    failed = 0
+    completed = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {executor.submit(download, folder): folder for folder in args.folders}
+        for future in as_completed(futures):
+            folder = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{folder}] Error: {e}", file=sys.stderr)
+                continue
+            print(f"[{folder}] {summary_message(result)}")
+            write_plan_report(args.plan_report, folder, ftp_config, result)
+            if result.failures:
+                failed += 1
+            else:
+                completed.append(folder)
+    close_pools()
+
+    if update_sheet and completed:
+        from data.google_sheets import append_rows_to_google_sheet
+        from data.sheet_queue import SheetWriteQueue
+
+        # Misma cola persistente que la interfaz: si la API falla, las filas
+        # quedan en disco y se envían en la próxima ejecución
+        sheet_queue = SheetWriteQueue(
+            lambda url, rows: append_rows_to_google_sheet(url, args.credentials, rows)
+        )
+        for folder in completed:
+            sheet_queue.enqueue(sheet_url, [folder, args.editor])
+        try:
+            while sheet_queue.flush():
+                pass
+        except Exception as e:
+            print(f"No se pudo actualizar la planilla, {sheet_queue.pending_count} filas quedan pendientes "
+                  f"y {sheet_queue.dead_count} descartadas: {e}", file=sys.stderr)
+            failed += 1
+
+    return 1 if failed else 0
+
+
+def command_upload(args):
+    """
+    Devuelve carpetas editadas al FTP subiendo sólo lo nuevo o modificado,
+    y marca la devolución en la fila de cada carpeta de la planilla.
+    """
+    from data.ftp_pool import close_pools, get_pool
+    from data.upload_engine import UploadEngine, upload_summary_message
+
+    ftp_config, sheet_url = load_cli_config(args.config, args.server)
+    update_sheet = not args.no_sheet
+    if update_sheet and not sheet_url:
+        raise ValueError("URL de Google Sheets no configurada.")
+
+    dest = os.path.expanduser(args.dest)
+    pool = get_pool(ftp_config)
+
+    def upload(folder):
+        engine = UploadEngine(
+            ftp_config,
+            os.path.join(dest, folder),
+            f"{ftp_config['base_path']}/{folder}",
+            max_connections=args.connections,
+            on_transfer_progress=None if args.quiet else print_progress(folder),
+            pool=pool,
+        )
+        return engine.run()
+
+    failed = 0
+    completed = []
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {executor.submit(upload, folder): folder for folder in args.folders}
+        for future in as_completed(futures):
+            folder = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{folder}] Error: {e}", file=sys.stderr)
+                continue
+            print(f"[{folder}] {upload_summary_message(result)}")
+            write_plan_report(args.plan_report, folder, ftp_config, result)
+            if result.failures:
+                failed += 1
+            else:
+                completed.append(folder)
+    close_pools()
+
+    if update_sheet and completed:
+        from data.google_sheets import RETURNED_HEADER, append_rows_to_google_sheet, update_rows_in_google_sheet
+        from data.sheet_queue import SheetWriteQueue
+
+        sheet_queue = SheetWriteQueue(
+            lambda url, rows: append_rows_to_google_sheet(url, args.credentials, rows),
+            updater=lambda url, updates: update_rows_in_google_sheet(url, args.credentials, updates),
+        )
+        returned_at = time.strftime("%Y-%m-%d %H:%M")
+        for folder in completed:
+            sheet_queue.enqueue_update(sheet_url, folder, {RETURNED_HEADER: returned_at})
+        try:
+            while sheet_queue.flush():
+                pass
+        except Exception as e:
+            print(f"No se pudo actualizar la planilla, {sheet_queue.pending_count} filas quedan pendientes "
+                  f"y {sheet_queue.dead_count} descartadas: {e}", file=sys.stderr)
+            failed += 1
+
+    return 1 if failed else 0
+
+
+def command_verify(args):
+    """
+    Verifica carpetas descargadas contra los hashes de su manifiesto.
+    """
+    from data.integrity import verify_directory, verify_message
+
+    dest = os.path.expanduser(args.dest)
+    failed = 0
+    for folder in args.folders:
+        local_directory = os.path.join(dest, folder)
+        try:
+            result = verify_directory(local_directory, args.workers, forget_mismatched=not args.keep_manifest)
+        except OSError as e:
+            failed += 1
+            print(f"[{folder}] Error: {e}", file=sys.stderr)
+            continue
+        print(f"[{folder}] {verify_message(result)}")
+        if result.mismatched or result.missing:
+            failed += 1
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Gestor de carpetas FTP y Google Sheets sin interfaz gráfica.",
+    )
+    parser.add_argument("--config", default=DEFAULT_CONFIG_FILE, help="archivo JSON con la configuración FTP")
+    parser.add_argument("--credentials", default=DEFAULT_CREDENTIALS_FILE, help="credenciales de Google")
+    parser.add_argument("--trace-log", metavar="ARCHIVO",
+                        help="agregar a este archivo JSON-lines la duración de cada fase (conexión, listado, RETR...)")
+    parser.add_argument("--metrics", metavar="ARCHIVO",
+                        help="escribir los tiempos por fase en formato de texto de Prometheus (.prom)")
+    parser.add_argument("--profile", metavar="CARPETA",
+                        help="guardar en esta carpeta un perfil de cProfile de cada análisis, descarga o subida")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze = subparsers.add_parser("analyze", help="listar carpetas en uso y disponibles")
+    analyze.add_argument("--format", choices=["json", "csv"], default="json")
+    analyze.add_argument("--output", help="archivo de salida (por defecto, la salida estándar)")
+    analyze.add_argument("--index", action="store_true",
+                         help="usar el índice local del FTP e incluir tamaños y cantidad de archivos")
+    analyze.set_defaults(func=command_analyze)
+
+    download = subparsers.add_parser("download", help="descargar carpetas y registrarlas en la planilla")
+    download.add_argument("folders", nargs="+", help="carpetas a descargar")
+    download.add_argument("--server", help="nombre del servidor de las carpetas (por defecto, el principal)")
+    download.add_argument("--editor", help="editor a registrar en la planilla")
+    download.add_argument("--dest", default="~/Downloads", help="carpeta local de destino")
+    download.add_argument("--jobs", type=int, default=2, help="carpetas descargadas a la vez")
+    download.add_argument("--connections", type=int, help="conexiones FTP por carpeta")
+    download.add_argument("--mirror", action="store_true", help="descargar sólo archivos nuevos o modificados")
+    download.add_argument("--delete-extraneous", action="store_true",
+                          help="con --mirror, borrar archivos locales que ya no están en el FTP")
+    download.add_argument("--mode-z", action="store_true",
+                          help="pedir compresión MODE Z si el servidor la ofrece (archivos no comprimidos)")
+    download.add_argument("--content-store", nargs="?", const=True, metavar="CARPETA",
+                          help="reutilizar archivos idénticos desde un almacén local en el mismo disco "
+                               "(por defecto ~/.gestor_carpetas/almacen)")
+    download.add_argument("--plan-report", metavar="ARCHIVO",
+                          help="agregar a este archivo JSON-lines el plan de cada carpeta (duración prevista y real)")
+    download.add_argument("--no-sheet", action="store_true", help="no actualizar la planilla")
+    download.add_argument("--quiet", action="store_true", help="no mostrar el avance")
+    download.set_defaults(func=command_download)
+
+    upload = subparsers.add_parser("upload", help="devolver carpetas editadas al FTP (sólo lo nuevo o modificado)")
+    upload.add_argument("folders", nargs="+", help="carpetas a subir")
+    upload.add_argument("--server", help="nombre del servidor de destino (por defecto, el principal)")
+    upload.add_argument("--dest", default="~/Downloads", help="carpeta local donde están las carpetas")
+    upload.add_argument("--jobs", type=int, default=2, help="carpetas subidas a la vez")
+    upload.add_argument("--connections", type=int, help="conexiones FTP por carpeta")
+    upload.add_argument("--plan-report", metavar="ARCHIVO",
+                        help="agregar a este archivo JSON-lines el plan de cada carpeta (duración prevista y real)")
+    upload.add_argument("--no-sheet", action="store_true", help="no marcar la devolución en la planilla")
+    upload.add_argument("--quiet", action="store_true", help="no mostrar el avance")
+    upload.set_defaults(func=command_upload)
+
+    index = subparsers.add_parser("index", help="actualizar el índice local del FTP (tamaños de carpetas)")
+    index.add_argument("--force", action="store_true", help="volver a listar todo el árbol")
+    index.add_argument("--server", help="recorrer sólo este servidor (por defecto, todos)")
+    index.set_defaults(func=command_index)
+
+    verify = subparsers.add_parser("verify", help="comprobar los hashes de carpetas descargadas")
+    verify.add_argument("folders", nargs="+", help="carpetas a verificar")
+    verify.add_argument("--dest", default="~/Downloads", help="carpeta local donde se descargaron")
+    verify.add_argument("--workers", type=int, help="procesos para calcular hashes (por defecto, uno por núcleo)")
+    verify.add_argument("--keep-manifest", action="store_true",
+                        help="no quitar del manifiesto los archivos dañados (no se descargarán al sincronizar)")
+    verify.set_defaults(func=command_verify)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace_log or args.metrics or args.profile:
+        enable_tracing(args.trace_log, args.metrics, args.profile)
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        disable_tracing()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
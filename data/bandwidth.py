@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador de ancho de banda compartido entre varios hilos.
+
+    Cada bloque recibido consume tantos tokens como bytes tiene. Si no hay
+    tokens suficientes el hilo que llama espera lo necesario, así que todas
+    las descargas que comparten el mismo TokenBucket suman, en conjunto, como
+    máximo "rate" bytes por segundo. Con rate en 0 o None no se limita.
+    """
+
+    def __init__(self, rate=None, burst_seconds=1.0):
+        """
+        Args:
+            rate: Bytes por segundo permitidos en total (None o 0 = sin límite).
+            burst_seconds: Segundos de tráfico que se pueden acumular como ráfaga.
+        """
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._rate = None
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        """
+        Cambia el límite en caliente (bytes por segundo; None o 0 = sin límite).
+        """
+        with self._lock:
+            self._rate = rate if rate and rate > 0 else None
+            self._tokens = min(self._tokens, self.capacity)
+            self._last = time.monotonic()
+
+    @property
+    def capacity(self):
+        return (self._rate or 0) * self.burst_seconds
+
+    def consume(self, amount):
+        """
+        Descuenta amount bytes, esperando si se excede el límite.
+        """
+        with self._lock:
+            if self._rate is None:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # Se permite quedar en negativo: la espera salda la deuda
+            self._tokens -= amount
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,91 @@
+import os
+import zlib
+from ftplib import error_perm, error_reply
+from data.ftp_listing import get_features
+
+# Bloques que se entregan al callback como máximo al descomprimir, para no
+# inflar de golpe en memoria un bloque muy comprimible
+INFLATE_BLOCK_SIZE = 256 * 1024
+
+# Formatos que ya vienen comprimidos: MODE Z no los achica y sólo gasta CPU
+COMPRESSED_EXTENSIONS = frozenset({
+    # Video y audio
+    ".mp4", ".m4v", ".mov", ".mkv", ".avi", ".mxf", ".mts", ".m2ts", ".webm", ".wmv", ".flv",
+    ".r3d", ".braw", ".mp3", ".aac", ".m4a", ".ogg", ".opus", ".flac", ".wma",
+    # Imágenes
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".avif", ".jp2",
+    # Archivos comprimidos y documentos que son ZIP por dentro
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".lz4",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub", ".apk", ".jar",
+    ".pdf",
+})
+
+
+def is_compressible(name):
+    """
+    Indica si vale la pena transferir el archivo con compresión, según su extensión.
+    """
+    return os.path.splitext(name)[1].lower() not in COMPRESSED_EXTENSIONS
+
+
+def supports_mode_z(ftp):
+    """
+    Indica si el servidor anuncia MODE Z en FEAT y no lo rechazó antes.
+    """
+    if getattr(ftp, "mode_z_supported", None) is False:
+        return False
+    return "Z" in get_features(ftp).get("MODE", "").upper().split()
+
+
+def set_mode_z(ftp, enabled):
+    """
+    Cambia el modo de transferencia de la conexión a MODE Z (comprimido) o MODE S.
+
+    El modo queda en ftp.mode_z para no repetir la orden en cada archivo.
+    Si el servidor rechaza MODE Z, se recuerda y la conexión sigue en MODE S.
+
+    Returns:
+        True si la conexión quedó en MODE Z.
+    """
+    if getattr(ftp, "mode_z", False) == enabled:
+        return enabled
+    try:
+        ftp.voidcmd("MODE Z" if enabled else "MODE S")
+    except (error_perm, error_reply):
+        if not enabled:
+            raise
+        ftp.mode_z_supported = False
+        return False
+    ftp.mode_z = enabled
+    return enabled
+
+
+def retrbinary_deflate(ftp, cmd, callback, blocksize=8192):
+    """
+    Como FTP.retrbinary, pero descomprimiendo el canal de datos de MODE Z.
+
+    El callback recibe los datos ya descomprimidos, a medida que llegan.
+    MODE Z no admite REST, así que siempre se transfiere el archivo completo.
+
+    Raises:
+        zlib.error: si los datos no son un flujo zlib válido.
+        EOFError: si el flujo comprimido terminó antes de tiempo.
+    """
+    inflater = zlib.decompressobj()
+    ftp.voidcmd("TYPE I")
+    with ftp.transfercmd(cmd) as connection:
+        while True:
+            data = connection.recv(blocksize)
+            if not data:
+                break
+            block = inflater.decompress(data, INFLATE_BLOCK_SIZE)
+            while block:
+                callback(block)
+                tail = inflater.unconsumed_tail
+                block = inflater.decompress(tail, INFLATE_BLOCK_SIZE) if tail else b""
+        block = inflater.flush()
+        if block:
+            callback(block)
+    if not inflater.eof:
+        raise EOFError("El flujo comprimido terminó antes de tiempo")
+    return ftp.voidresp()
@@ -0,0 +1,211 @@
+import os
+import shutil
+import sqlite3
+import threading
+from data.integrity import HASH_ALGORITHM
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".gestor_carpetas", "almacen")
+INDEX_FILE_NAME = "index.sqlite"
+
+# Hashes que identifican un contenido: con CRC32 (XCRC) dos archivos del
+# mismo tamaño pueden coincidir, así que no sirve para reutilizar objetos
+CONTENT_ID_ALGORITHMS = frozenset({"sha256", "sha1", "sha512", "md5"})
+
+# ioctl de Linux para clonar un archivo con copia al escribir (Btrfs, XFS)
+FICLONE = 0x40049409
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    algorithm TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (algorithm, digest, size)
+);
+CREATE INDEX IF NOT EXISTS objects_path ON objects (path);
+"""
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def reflink(source, destination):
+    """
+    Clona source en destination sin copiar los datos, si el sistema de archivos lo permite.
+
+    Raises:
+        OSError: si no se puede clonar (otro sistema operativo o sistema de archivos).
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("Clonado de archivos no disponible en este sistema.")
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destination)
+            raise
+
+
+class ContentStore:
+    """
+    Almacén local de archivos identificados por contenido (tamaño + hash).
+
+    Las carpetas comparten muchos archivos idénticos (logos, material de
+    archivo, plantillas). Cada archivo descargado se registra en el almacén
+    con su SHA-256 y, si se conoce, con el hash que usa el servidor (HASH o
+    XMD5). Antes de descargar un archivo se pide su hash al servidor: si el
+    almacén ya lo tiene, se enlaza en la carpeta nueva en lugar de
+    transferirlo.
+
+    Los objetos se enlazan con un clon (reflink, copia al escribir) cuando
+    el sistema de archivos lo permite y, si no, con un enlace duro, por lo
+    que el almacén debe estar en el mismo disco que las descargas. Un
+    enlace duro comparte el archivo: si se modifica en una carpeta cambia en
+    todas. Por eso cada objeto guarda su fecha de modificación y, si cambió,
+    se descarta en lugar de reutilizarlo.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, allow_copy=False):
+        """
+        Args:
+            root: Carpeta del almacén (en el mismo disco que las descargas).
+            allow_copy: Si no se puede clonar ni enlazar, copiar el objeto
+                (ahorra la transferencia, pero no espacio en disco).
+        """
+        self.root = root
+        self.allow_copy = allow_copy
+        self.objects_dir = os.path.join(root, "objetos")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(root, INDEX_FILE_NAME), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def object_path(self, sha256, size):
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}-{size}")
+
+    def lookup(self, algorithm, digest, size):
+        """
+        Busca un objeto por tamaño y hash.
+
+        Returns:
+            Tupla (ruta_del_objeto, sha256), o None si no está, cambió desde
+            que se registró o el algoritmo no identifica el contenido (CRC32).
+        """
+        if algorithm not in CONTENT_ID_ALGORITHMS:
+            return None
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, mtime_ns FROM objects WHERE algorithm = ? AND digest = ? AND size = ?",
+                (algorithm, digest.lower(), size),
+            ).fetchall()
+        if not rows:
+            return None
+        path, mtime_ns = rows[0]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            self._forget(path)
+            return None
+
+        if algorithm == HASH_ALGORITHM:
+            return path, digest.lower()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT digest FROM objects WHERE path = ? AND algorithm = ?", (path, HASH_ALGORITHM)
+            ).fetchall()
+        return (path, rows[0][0]) if rows else None
+
+    def materialize(self, object_path, destination):
+        """
+        Crea destination con el contenido del objeto, sin transferirlo.
+
+        Raises:
+            OSError: si no se pudo clonar ni enlazar (ni copiar, si allow_copy).
+        """
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            reflink(object_path, destination)
+            return
+        except OSError:
+            pass
+        try:
+            os.link(object_path, destination)
+        except OSError:
+            if not self.allow_copy:
+                raise
+            shutil.copyfile(object_path, destination)
+
+    def add(self, path, size, digests):
+        """
+        Registra en el almacén un archivo recién descargado.
+
+        Si el contenido ya estaba, el archivo se reemplaza por un enlace al
+        objeto existente (para no ocupar espacio dos veces); si no, se
+        enlaza en el almacén como objeto nuevo.
+
+        Args:
+            path: Archivo descargado.
+            size: Tamaño del archivo.
+            digests: Diccionario algoritmo -> hash; debe incluir el SHA-256.
+        """
+        sha256 = digests[HASH_ALGORITHM]
+        existing = self.lookup(HASH_ALGORITHM, sha256, size)
+        if existing is not None:
+            temp_path = f"{path}.almacen"
+            try:
+                self.materialize(existing[0], temp_path)
+                os.replace(temp_path, path)
+            except OSError:
+                pass
+            object_path = existing[0]
+        else:
+            object_path = self.object_path(sha256, size)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if os.path.exists(object_path):
+                os.remove(object_path)  # Objeto modificado o sin registrar
+            try:
+                reflink(path, object_path)
+            except OSError:
+                try:
+                    os.link(path, object_path)
+                except OSError as e:
+                    # Otro disco o sistema de archivos sin enlaces: no se guarda
+                    print(f"No se pudo agregar {path} al almacén local: {e}")
+                    return
+
+        mtime_ns = os.stat(object_path).st_mtime_ns
+        with self._lock, self._connection:
+            for algorithm, digest in digests.items():
+                if digest and algorithm in CONTENT_ID_ALGORITHMS:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)",
+                        (algorithm, digest.lower(), size, object_path, mtime_ns),
+                    )
+
+    def _forget(self, path):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM objects WHERE path = ?", (path,))
+
+
+def get_content_store(root=DEFAULT_STORE_DIR, allow_copy=False):
+    """
+    Devuelve el almacén de la aplicación en root, abriéndolo una sola vez.
+    """
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = ContentStore(root, allow_copy)
+            _stores[root] = store
+        return store
@@ -0,0 +1,767 @@
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import namedtuple
+from ftplib import FTP, error_perm, error_reply, error_temp
+from data.compression import is_compressible, retrbinary_deflate, set_mode_z, supports_mode_z
+from data.content_store import CONTENT_ID_ALGORITHMS, DEFAULT_STORE_DIR, get_content_store
+from data.download_journal import DownloadJournal
+from data.ftp_pool import PoolExhausted
+from data.ftp_listing import collect_files, fill_modify_times
+from data.integrity import IntegrityError, StreamHasher, get_server_hash, hashes_match, negotiate_server_hash
+from data.part_files import DEFAULT_BLOCK_SIZE, FolderSync, PartFile, part_path
+from data.sync_manifest import SyncManifest, delete_extraneous, plan_sync, relative_path_of
+from data.tracing import profile_thread, profiled, span, traced
+from data.transfer_plan import (
+    DEFAULT_CONNECTION_THROUGHPUT, DEFAULT_FILE_OVERHEAD, estimated_throughput, learn_throughput, plan_transfers,
+)
+from data.transfer_progress import ProgressTracker
+
+DEFAULT_MAX_CONNECTIONS = 4
+DEFAULT_PORT = 21
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 2.0  # segundos antes del primer reintento
+MAX_RETRY_DELAY = 60.0
+POOL_WAIT = 1.0  # segundos de espera por conexión del pool entre comprobaciones de cancelación
+
+# Errores que justifican reconectar y reintentar (tiempos de espera, cortes, 4xx)
+TRANSIENT_ERRORS = (error_temp, error_reply, EOFError, OSError)
+
+# Resultado de una descarga: listas de (ruta_remota, ruta_local, entrada),
+# salvo removed (rutas relativas borradas), failures (ruta_remota, error) y
+# reused (rutas remotas tomadas del almacén local en lugar de transferirse).
+# plan es el TransferPlan con la duración prevista y la real (None si no
+# hubo nada que transferir).
+DownloadResult = namedtuple(
+    "DownloadResult", ["files", "pending", "unchanged", "removed", "failures", "mirror", "reused", "plan"],
+    defaults=(None,),
+)
+
+
+class ConnectionLostError(ConnectionError):
+    """
+    Se perdió la conexión FTP durante una descarga y no se pudo recuperar.
+    """
+
+
+class DownloadCancelled(Exception):
+    """
+    La descarga fue cancelada por el usuario.
+    """
+
+
+class TransferControl:
+    """
+    Permite pausar, reanudar o cancelar una descarga desde otro hilo.
+
+    Las conexiones del motor consultan el control entre archivos y después de
+    cada bloque recibido, así que una pausa detiene la transferencia en
+    curso sin perder lo descargado.
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Despertar a los hilos en pausa para que terminen
+
+    def checkpoint(self):
+        """
+        Espera mientras la descarga esté en pausa.
+
+        Raises:
+            DownloadCancelled: si la descarga fue cancelada.
+        """
+        if self._cancelled.is_set():
+            raise DownloadCancelled("Descarga cancelada.")
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise DownloadCancelled("Descarga cancelada.")
+
+
+class DownloadEngine:
+    """
+    Motor de descarga de carpetas FTP, independiente de la interfaz.
+
+    Lo usan tanto DownloadWorker (interfaz Qt) como la línea de comandos. El
+    avance se informa mediante callbacks opcionales en lugar de señales.
+    """
+
+    # Sentido de la transferencia: la velocidad estimada del plan se mide por separado para cada uno
+    direction = "descarga"
+
+    def __init__(self, ftp_config, remote_directory, local_directory, max_connections=None,
+                 mirror=False, delete_extraneous=False, on_file_done=None, on_transfer_progress=None,
+                 rate_limiter=None, control=None, pool=None):
+        """
+        Args:
+            ftp_config: Diccionario con las credenciales de FTP.
+            remote_directory: Directorio remoto en el servidor FTP.
+            local_directory: Directorio local para descargar los archivos.
+            max_connections: Número de conexiones FTP simultáneas. Si no se indica,
+                se usa la clave "max_connections" de la configuración.
+            mirror: Si es True, sólo se descargan los archivos nuevos o
+                modificados respecto del manifiesto local.
+            delete_extraneous: En modo espejo, borra los archivos locales que
+                ya no existen en el servidor.
+            on_file_done: Función (descargados, total, nombre) llamada al
+                terminar cada archivo.
+            on_transfer_progress: Función que recibe un TransferStats, como
+                máximo unas pocas veces por segundo.
+            rate_limiter: TokenBucket compartido para limitar el ancho de banda.
+            control: TransferControl para pausar o cancelar la descarga.
+            pool: FTPPool compartido. Si se indica, las conexiones se piden
+                al pool (respetando su límite) y se devuelven al terminar.
+        """
+        self.remote_directory = remote_directory
+        self.local_directory = local_directory
+        self.ftp_config = ftp_config
+        if max_connections is None:
+            max_connections = ftp_config.get("max_connections", DEFAULT_MAX_CONNECTIONS)
+        self.max_connections = max(1, int(max_connections))
+        self.max_retries = ftp_config.get("max_retries", DEFAULT_MAX_RETRIES)
+        self.retry_backoff = ftp_config.get("retry_backoff", DEFAULT_RETRY_BACKOFF)
+        self.mirror = mirror
+        self.delete_extraneous = delete_extraneous
+        self.on_file_done = on_file_done
+        self.on_transfer_progress = on_transfer_progress
+        self.rate_limiter = rate_limiter
+        self.control = control or TransferControl()
+        self.pool = pool
+        self.verify_server_hash = ftp_config.get("verify_server_hash", True)
+        # Compresión MODE Z (opcional): sólo con servidores que la anuncian en FEAT
+        self.mode_z = ftp_config.get("mode_z", False)
+        self.block_size = ftp_config.get("block_size", DEFAULT_BLOCK_SIZE)
+        # Sincronizar con el disco los archivos terminados (por lotes, por carpeta)
+        self.fsync = ftp_config.get("fsync", True)
+        # Almacén local por contenido (opcional): True usa la carpeta por defecto
+        self.content_store = None
+        store_root = ftp_config.get("content_store")
+        if store_root:
+            store_root = DEFAULT_STORE_DIR if store_root is True else os.path.expanduser(store_root)
+            self.content_store = get_content_store(store_root, ftp_config.get("content_store_copy", False))
+        self.reused = []
+        self.plan = None
+
+    def connect(self):
+        """
+        Abre una nueva conexión FTP autenticada, o la pide al pool.
+
+        Con pool, si todas sus conexiones están en uso se espera a que se
+        libere una, atendiendo pausas y cancelaciones mientras tanto.
+
+        Returns:
+            Conexión FTP lista para usar.
+        """
+        if self.pool is not None:
+            while True:
+                self.control.checkpoint()
+                try:
+                    return self.pool.acquire(timeout=POOL_WAIT)
+                except PoolExhausted:
+                    continue
+
+        ftp = FTP()
+        with span("ftp.connect", host=self.ftp_config["host"]):
+            ftp.connect(
+                self.ftp_config["host"],
+                port=self.ftp_config.get("port", DEFAULT_PORT),
+                timeout=self.ftp_config.get("timeout", DEFAULT_TIMEOUT),
+            )
+        with span("ftp.login", host=self.ftp_config["host"]):
+            ftp.login(self.ftp_config["user"], self.ftp_config["password"])
+        return ftp
+
+    def connect_for_transfer(self):
+        """
+        Abre una conexión para descargar y negocia la verificación del servidor.
+
+        El resultado queda en ftp.server_hash (None si el servidor no ofrece
+        HASH, XMD5 ni XCRC o si la verificación está desactivada).
+        """
+        ftp = self.connect_with_retry()
+        if not self.verify_server_hash:
+            ftp.server_hash = None
+        elif not hasattr(ftp, "server_hash"):
+            # Una conexión reutilizada del pool ya tiene la verificación negociada
+            ftp.server_hash = negotiate_server_hash(ftp)
+        return ftp
+
+    @profiled("descarga")
+    @traced("download")
+    def run(self):
+        """
+        Descarga la carpeta completa (o sólo los cambios en modo espejo).
+
+        Returns:
+            DownloadResult con lo transferido, lo omitido y los errores por archivo.
+
+        Raises:
+            DownloadCancelled: si se canceló con el TransferControl.
+            Exception: si no se pudo conectar o listar la carpeta remota.
+        """
+        self.control.checkpoint()
+        self.reused = []
+        self.plan = None
+
+        # Conectar al servidor FTP para recorrer el árbol remoto
+        ftp = self.connect()
+        try:
+            # Crear el directorio local si no existe
+            os.makedirs(self.local_directory, exist_ok=True)
+
+            # Recorrer archivos y subdirectorios antes de descargar
+            with span("download.collect", folder=self.remote_directory) as current:
+                files = self.collect_files(ftp, self.remote_directory, self.local_directory)
+                current.set(files=len(files))
+            manifest = SyncManifest(self.local_directory)
+
+            # En modo espejo sólo se transfieren archivos nuevos o modificados
+            pending, unchanged, removed = files, [], []
+            if self.mirror:
+                files = fill_modify_times(ftp, files)
+                pending, unchanged = plan_sync(files, manifest, self.local_directory)
+                if self.delete_extraneous:
+                    removed = delete_extraneous(files, manifest, self.local_directory)
+        except Exception:
+            self.disconnect(ftp)
+            raise
+        self.release(ftp)
+
+        # Descargar los archivos con varias conexiones en paralelo
+        try:
+            with span("download.transfer", folder=self.remote_directory, files=len(pending)) as current:
+                failures = self.download_files(pending, manifest) if pending else []
+                if self.plan is not None:
+                    current.set(predicted_seconds=self.plan.predicted_seconds, actual_seconds=self.plan.actual_seconds)
+        finally:
+            manifest.save()
+
+        return DownloadResult(
+            files, pending, unchanged, removed, failures, self.mirror, list(self.reused), self.plan
+        )
+
+    def report_transfer(self, stats):
+        if self.on_transfer_progress is not None:
+            self.on_transfer_progress(stats)
+
+    def collect_files(self, ftp, remote_directory, local_directory):
+        """
+        Recorre el directorio remoto y crea la estructura local de carpetas.
+
+        Cada directorio se lista con una sola orden (MLSD o LIST), sin cambiar
+        de directorio para distinguir archivos de carpetas.
+
+        Returns:
+            Lista de tuplas (ruta_remota, ruta_local, entrada) con los archivos a descargar.
+        """
+        return collect_files(ftp, remote_directory, local_directory)
+
+    def plan_transfers(self, items, size_of, name_of=str):
+        """
+        Arma el TransferPlan de la lista de trabajo: los archivos más grandes primero.
+
+        La velocidad por conexión es la medida en las transferencias
+        anteriores con el mismo servidor o, hasta entonces, la clave
+        "plan_throughput_mbps" de la configuración; con límite de ancho de
+        banda, no más de la parte que le toca a cada conexión. El costo fijo
+        por archivo es la clave "plan_file_overhead" (segundos).
+        """
+        connections = min(self.max_connections, max(len(items), 1))
+        configured = self.ftp_config.get("plan_throughput_mbps")
+        throughput = estimated_throughput(
+            (self.ftp_config.get("host"), self.direction), configured * 1024 * 1024 if configured else DEFAULT_CONNECTION_THROUGHPUT
+        )
+        if self.rate_limiter is not None and self.rate_limiter.rate:
+            throughput = min(throughput, self.rate_limiter.rate / connections)
+        file_overhead = self.ftp_config.get("plan_file_overhead", DEFAULT_FILE_OVERHEAD)
+        self.plan = plan_transfers(items, connections, size_of, throughput, file_overhead, name_of)
+        return self.plan
+
+    def finish_plan(self, plan, failures):
+        """
+        Cierra el plan y ajusta la velocidad estimada del servidor si la
+        transferencia terminó bien y sin límite de ancho de banda. Lo previsto
+        y lo real quedan en el resultado (campo plan) y en el tramo de trazado.
+        """
+        plan.finish()
+        limited = self.rate_limiter is not None and self.rate_limiter.rate
+        if not failures and not limited and not self.control.cancelled:
+            learn_throughput((self.ftp_config.get("host"), self.direction), plan)
+
+    def download_files(self, files, manifest=None):
+        """
+        Descarga una lista de archivos usando un pool de conexiones FTP.
+
+        Cada conexión toma archivos de una cola compartida hasta vaciarla. La
+        cola sigue el TransferPlan (los más grandes primero), así que un
+        archivo enorme no queda para el final. Un error en un archivo se
+        registra y no interrumpe el resto de la descarga. Los archivos ya
+        completos según el registro se saltan y los parciales se reanudan
+        desde donde quedaron.
+
+        Cada archivo se descarga en un temporal .part; los terminados se
+        renombran a su nombre final por lotes de carpeta (ver FolderSync), y
+        recién entonces se cuentan como descargados.
+
+        Args:
+            files: Lista de tuplas (ruta_remota, ruta_local, entrada).
+            manifest: SyncManifest donde registrar los archivos completados.
+
+        Returns:
+            Lista de tuplas (ruta_remota, mensaje_de_error) con los archivos fallidos.
+        """
+        journal = DownloadJournal(self.local_directory)
+
+        plan = self.plan_transfers(files, lambda item: item[2].size, lambda item: item[0])
+        work = queue.Queue()
+        for item in plan.order:
+            work.put(item)
+
+        total_files = len(files)
+        total_bytes = sum(entry.size or 0 for _, _, entry in files)
+        tracker = ProgressTracker(total_bytes, total_files, self.report_transfer)
+        state = {"downloaded": 0}
+        failures = []
+        connection_errors = []
+        lock = threading.Lock()
+
+        def finish(relative_path, entry, sha256, local_path):
+            if manifest is not None:
+                manifest.update(relative_path, entry, sha256, local_path)
+            with lock:
+                state["downloaded"] += 1
+                downloaded = state["downloaded"]
+            tracker.file_done(entry.name)
+            if self.on_file_done is not None:
+                self.on_file_done(downloaded, total_files, entry.name)
+
+        def on_commit(local_path, data):
+            relative_path, entry, sha256, _ = data
+            journal.record(relative_path, entry, "complete", entry.size, sha256)
+            finish(relative_path, entry, sha256, local_path)
+
+        def on_commit_error(local_path, data, error):
+            with lock:
+                failures.append((data[3], f"No se pudo guardar el archivo: {error}"))
+
+        folder_sync = FolderSync(
+            [local_path for _, local_path, _ in files], on_commit, on_commit_error, fsync=self.fsync
+        )
+
+        def worker():
+            try:
+                ftp = self.connect_for_transfer()
+            except Exception as e:
+                with lock:
+                    connection_errors.append(str(e))
+                return
+
+            try:
+                while True:
+                    try:
+                        self.control.checkpoint()
+                    except DownloadCancelled:
+                        break
+                    try:
+                        remote_path, local_path, entry = work.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    relative_path = relative_path_of(local_path, self.local_directory)
+                    if journal.is_complete(relative_path, entry, local_path):
+                        tracker.add_bytes(entry.size or 0, entry.name)
+                        folder_sync.skip(local_path)
+                        finish(relative_path, entry, journal.completed_hash(relative_path), local_path)
+                        continue
+
+                    try:
+                        ftp, sha256 = self.download_file(
+                            ftp, remote_path, local_path, entry, journal, relative_path, tracker
+                        )
+                    except DownloadCancelled:
+                        # La transferencia quedó a medias: la conexión no se reutiliza
+                        self.disconnect(ftp)
+                        ftp = None
+                        break
+                    except ConnectionLostError as e:
+                        # No se pudo reconectar: dejar el resto a las demás conexiones
+                        ftp = None
+                        with lock:
+                            failures.append((remote_path, str(e)))
+                        folder_sync.skip(local_path)
+                        break
+                    except Exception as e:
+                        with lock:
+                            failures.append((remote_path, str(e)))
+                        folder_sync.skip(local_path)
+                        if isinstance(e, TRANSIENT_ERRORS):
+                            # Se agotaron los reintentos: seguir con una conexión nueva
+                            self.disconnect(ftp)
+                            ftp = None
+                            try:
+                                ftp = self.connect_for_transfer()
+                            except Exception:
+                                break
+                        continue
+
+                    folder_sync.add(local_path, (relative_path, entry, sha256, remote_path))
+            finally:
+                plan.connection_finished()
+                if ftp is not None:
+                    self.release(ftp)
+
+        threads = [threading.Thread(target=profile_thread(worker), daemon=True) for _ in range(plan.connections)]
+        plan.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.finish_plan(plan, failures)
+        # Confirmar también lo terminado en carpetas incompletas (cancelación o errores)
+        folder_sync.flush()
+        tracker.finish()
+
+        # Lo descargado queda en el registro para reanudar más tarde
+        if self.control.cancelled:
+            raise DownloadCancelled("Descarga cancelada.")
+
+        if connection_errors and len(connection_errors) == len(threads):
+            raise ConnectionError(f"No se pudo conectar al servidor FTP: {connection_errors[0]}")
+
+        # Si las conexiones se perdieron, los archivos pendientes cuentan como errores
+        while not work.empty():
+            remote_path, _, _ = work.get_nowait()
+            failures.append((remote_path, "No se pudo descargar: sin conexiones disponibles."))
+
+        if not failures:
+            journal.remove()
+
+        return failures
+
+    def download_file(self, ftp, remote_path, local_path, entry, journal, relative_path, tracker=None):
+        """
+        Descarga un archivo, reanudando con REST y reintentando errores transitorios.
+
+        Ante un error transitorio (tiempo de espera, conexión cortada, respuesta
+        4xx) se espera con retroceso exponencial, se reconecta y se continúa
+        desde el último byte escrito. Los errores permanentes (5xx) no se
+        reintentan.
+
+        El archivo se escribe en local_path + ".part" y queda ahí: lo renombra
+        FolderSync al confirmar la carpeta. Con almacén local, si el servidor
+        informa un hash que ya está en el almacén, el archivo se enlaza desde
+        ahí sin transferirlo; los archivos descargados se agregan al almacén.
+        El hash se calcula mientras llegan los datos. Al terminar se comprueba
+        el tamaño y, si el servidor lo permite, se compara con su hash; si no
+        coincide, el archivo se descarga de nuevo desde el principio.
+
+        Si se pasa un ProgressTracker, se le informan los bytes recibidos
+        desde el callback de retrbinary.
+
+        Returns:
+            Tupla (conexión FTP a seguir usando, que puede ser una nueva; SHA-256 del archivo).
+
+        Raises:
+            IntegrityError: si el archivo sigue sin coincidir tras los reintentos.
+            ConnectionLostError: si se perdió la conexión y no se pudo reconectar.
+        """
+        counted = [0]  # bytes de este archivo ya informados al tracker
+
+        def on_data(count):
+            counted[0] += count
+            if tracker is not None:
+                tracker.add_bytes(count, entry.name)
+
+        temp_path = part_path(local_path)
+
+        def checkpoint(position):
+            journal.record(relative_path, entry, "partial", position)
+
+        expected = None
+        if self.content_store is not None:
+            expected = self.server_digest(ftp, remote_path, entry)
+            sha256 = self.reuse_from_store(ftp, remote_path, entry, expected, temp_path)
+            if sha256 is not None:
+                on_data((entry.size or 0) - counted[0])
+                return ftp, sha256
+
+        hasher = None
+        attempt = 0
+        while True:
+            offset = journal.resume_offset(relative_path, entry, temp_path)
+            server_hash = getattr(ftp, "server_hash", None)
+            server_algorithm = server_hash.algorithm if server_hash else None
+            # Sólo se vuelve a leer del disco la parte ya descargada si el
+            # hash en memoria no corresponde a ella (por ejemplo, al reanudar)
+            if hasher is None or hasher.size != offset or hasher.server_algorithm != server_algorithm:
+                if offset:
+                    hasher = StreamHasher.from_file(temp_path, offset, server_algorithm)
+                else:
+                    hasher = StreamHasher(server_algorithm)
+            journal.record(relative_path, entry, "started", offset)
+            # Ajustar el avance a los bytes que realmente hay en disco
+            on_data(offset - counted[0])
+            try:
+                with span("ftp.retr", path=remote_path, offset=offset, size=entry.size, attempt=attempt):
+                    self.retrieve(ftp, remote_path, local_path, offset, on_data, hasher, entry.size, checkpoint)
+                sha256 = self.check_download(ftp, remote_path, entry, hasher, expected)
+                self.add_to_store(temp_path, entry, hasher)
+                return ftp, sha256
+            except IntegrityError as e:
+                # Lo descargado no sirve para reanudar: empezar de cero
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                journal.record(relative_path, entry, "partial", 0)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"{e}, reintento {attempt}/{self.max_retries}")
+            except TRANSIENT_ERRORS as e:
+                # Al cerrarse, el temporal se recorta a lo realmente escrito
+                written = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+                journal.record(relative_path, entry, "partial", written)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"Error transitorio en {remote_path} ({e}), reintento {attempt}/{self.max_retries}")
+
+                self.disconnect(ftp)
+                time.sleep(min(self.retry_backoff * 2 ** (attempt - 1), MAX_RETRY_DELAY))
+                try:
+                    ftp = self.connect_for_transfer()
+                except Exception as reconnect_error:
+                    raise ConnectionLostError(f"Conexión perdida: {reconnect_error}") from e
+
+    def server_digest(self, ftp, remote_path, entry):
+        """
+        Pide al servidor el hash de un archivo, si ofrece alguna verificación.
+        """
+        server_hash = getattr(ftp, "server_hash", None)
+        if server_hash is None or entry.size is None:
+            return None
+        return get_server_hash(ftp, server_hash, remote_path)
+
+    def reuse_from_store(self, ftp, remote_path, entry, server_digest, temp_path):
+        """
+        Enlaza el archivo desde el almacén local si ya tiene ese contenido.
+
+        Sólo se reutiliza con un hash del servidor que identifique el
+        contenido (SHA o MD5); con CRC32 el archivo se descarga siempre y,
+        si ya estaba, add lo deduplica después por su SHA-256.
+
+        Returns:
+            SHA-256 del archivo reutilizado, o None si hay que descargarlo.
+        """
+        if server_digest is None or ftp.server_hash.algorithm not in CONTENT_ID_ALGORITHMS:
+            return None
+        found = self.content_store.lookup(ftp.server_hash.algorithm, server_digest, entry.size)
+        if found is None:
+            return None
+        object_path, sha256 = found
+        try:
+            self.content_store.materialize(object_path, temp_path)
+        except OSError as e:
+            print(f"No se pudo reutilizar {remote_path} del almacén local ({e}), se descarga")
+            return None
+        self.reused.append(remote_path)
+        return sha256
+
+    def add_to_store(self, temp_path, entry, hasher):
+        """
+        Registra un archivo recién descargado en el almacén local, si está activado.
+        """
+        if self.content_store is None or entry.size is None:
+            return
+        digests = {algorithm: digest.hexdigest() for algorithm, digest in hasher.digests.items()}
+        try:
+            self.content_store.add(temp_path, entry.size, digests)
+        except Exception as e:
+            # El almacén es sólo una optimización: la descarga ya está completa
+            print(f"No se pudo agregar {temp_path} al almacén local: {e}")
+
+    def check_download(self, ftp, remote_path, entry, hasher, expected=None):
+        """
+        Comprueba un archivo recién descargado y devuelve su SHA-256.
+
+        Args:
+            expected: Hash del servidor, si ya se pidió antes de descargar.
+
+        Raises:
+            EOFError: si llegaron menos bytes de los esperados (se reanuda).
+            IntegrityError: si sobran bytes o el hash del servidor no coincide.
+        """
+        if entry.size is not None:
+            if hasher.size < entry.size:
+                raise EOFError(f"Transferencia incompleta: {hasher.size} de {entry.size} bytes")
+            if hasher.size > entry.size:
+                raise IntegrityError(f"Tamaño incorrecto en {remote_path}: {hasher.size} de {entry.size} bytes")
+
+        server_hash = getattr(ftp, "server_hash", None)
+        if server_hash is not None:
+            if expected is None:
+                expected = get_server_hash(ftp, server_hash, remote_path)
+            actual = hasher.hexdigest(server_hash.algorithm)
+            if expected is not None and not hashes_match(expected, actual, server_hash.algorithm):
+                raise IntegrityError(
+                    f"El hash de {remote_path} no coincide con el del servidor "
+                    f"({server_hash.algorithm}: {actual} en lugar de {expected})"
+                )
+        return hasher.hexdigest()
+
+    def retrieve(self, ftp, remote_path, local_path, offset=0, on_data=None, hasher=None, size=None,
+                 on_checkpoint=None):
+        """
+        Ejecuta RETR sobre el temporal local_path + ".part", continuando desde offset si es mayor que cero.
+
+        Los datos se leen del socket en bloques de block_size y se escriben
+        sin buffer intermedio; si se conoce el tamaño, el espacio se reserva
+        al empezar (ver PartFile).
+
+        Con la opción mode_z, los archivos que se descargan desde el principio
+        y no están ya comprimidos (video, imágenes, ZIP...) se piden en MODE Z
+        si el servidor lo anuncia. Las reanudaciones usan MODE S, porque REST
+        no se puede combinar con la compresión. El límite de ancho de banda y
+        el avance se cuentan en bytes descomprimidos.
+
+        Args:
+            on_data: Función opcional que recibe la cantidad de bytes de cada
+                bloque escrito (negativa si se descarta lo ya descargado).
+            hasher: StreamHasher opcional que recibe cada bloque escrito. Si
+                se reanuda, ya debe contener los primeros offset bytes.
+            size: Tamaño final del archivo, si se conoce.
+            on_checkpoint: Función opcional que recibe los bytes ya escritos
+                y sincronizados, cada tanto durante la transferencia.
+        """
+        def writer(part):
+            def write(block):
+                part.write(block)
+                if hasher is not None:
+                    hasher.update(block)
+                if on_data is not None:
+                    on_data(len(block))
+                self.throttle(len(block))
+            return write
+
+        use_mode_z = self.mode_z and not offset and is_compressible(remote_path) and supports_mode_z(ftp)
+        # Volver a MODE S si la conexión quedó comprimida por el archivo anterior
+        use_mode_z = set_mode_z(ftp, use_mode_z)
+
+        if offset:
+            try:
+                with PartFile(local_path, offset, size, on_checkpoint) as part:
+                    ftp.retrbinary(f"RETR {remote_path}", writer(part), self.block_size, rest=offset)
+                return
+            except error_perm as e:
+                # El servidor no soporta REST: descargar desde el principio
+                if not str(e).startswith(("500", "501", "502", "504")):
+                    raise
+                if on_data is not None:
+                    on_data(-offset)
+                if hasher is not None:
+                    hasher.reset()
+
+        with PartFile(local_path, 0, size, on_checkpoint) as part:
+            if not use_mode_z:
+                ftp.retrbinary(f"RETR {remote_path}", writer(part), self.block_size)
+                return
+            try:
+                retrbinary_deflate(ftp, f"RETR {remote_path}", writer(part), self.block_size)
+            except zlib.error as e:
+                # El servidor anunció MODE Z pero no envió un flujo válido:
+                # se reanuda lo escrito sin compresión, con una conexión nueva
+                print(f"Compresión MODE Z inválida en {remote_path} ({e}), se desactiva")
+                self.mode_z = False
+                raise EOFError(f"Flujo MODE Z inválido: {e}") from e
+
+    def throttle(self, count):
+        """
+        Aplica el límite de ancho de banda y atiende pausas y cancelaciones.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.consume(count)
+        self.control.checkpoint()
+
+    def connect_with_retry(self):
+        """
+        Abre una conexión, reintentando con retroceso exponencial.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.connect()
+            except TRANSIENT_ERRORS:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                time.sleep(min(self.retry_backoff * 2 ** (attempt - 1), MAX_RETRY_DELAY))
+
+    def release(self, ftp):
+        """
+        Devuelve una conexión sana al pool, o la cierra si no hay pool.
+
+        Antes de devolverla se vuelve a MODE S, porque el análisis y el
+        índice listan carpetas con las conexiones del pool.
+        """
+        if self.pool is not None:
+            try:
+                set_mode_z(ftp, False)
+            except Exception:
+                self.disconnect(ftp)
+                return
+            self.pool.release(ftp)
+        else:
+            self.disconnect(ftp)
+
+    def disconnect(self, ftp):
+        """
+        Cierra una conexión FTP sin propagar errores (con pool, la descarta).
+        """
+        if self.pool is not None:
+            self.pool.release(ftp, discard=True)
+            return
+        try:
+            ftp.quit()
+        except Exception:
+            ftp.close()
+
+
+def summary_message(result):
+    """
+    Arma el mensaje para el usuario a partir de un DownloadResult.
+    """
+    summary = ""
+    if result.mirror:
+        summary = f" {len(result.pending)} archivos transferidos, {len(result.unchanged)} sin cambios"
+        if result.removed:
+            summary += f", {len(result.removed)} eliminados"
+        summary += "."
+    if result.reused:
+        summary += f" {len(result.reused)} archivos tomados del almacén local."
+    if result.failures:
+        details = "\n".join(f"{path}: {error}" for path, error in result.failures[:10])
+        return (
+            f"Descarga completada con {len(result.failures)} errores de {len(result.pending)} archivos."
+            f"{summary}\n{details}"
+        )
+    return f"Descarga completada.{summary}"
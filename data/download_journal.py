@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+
+JOURNAL_FILE_NAME = ".download_journal.jsonl"
+
+
+class DownloadJournal:
+    """
+    Registro en disco del avance de una descarga, para poder reanudarla.
+
+    El registro es un archivo JSON-lines dentro de la carpeta local: cada
+    línea indica que un archivo empezó, quedó a medias (con el desplazamiento
+    alcanzado) o se completó. Como sólo se agregan líneas, escribirlo es
+    barato incluso con miles de archivos.
+    """
+
+    def __init__(self, local_directory):
+        self.path = os.path.join(local_directory, JOURNAL_FILE_NAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        Lee el registro existente, ignorando líneas dañadas por un corte.
+        """
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.entries[record["path"]] = record
+
+    def _matches(self, record, entry):
+        return record.get("size") == entry.size and record.get("modify") == entry.modify
+
+    def is_complete(self, relative_path, entry, local_path):
+        """
+        Indica si el archivo ya se descargó completo y no cambió en el servidor.
+        """
+        record = self.entries.get(relative_path)
+        if record is None or record.get("state") != "complete" or not self._matches(record, entry):
+            return False
+        if not os.path.exists(local_path):
+            return False
+        return entry.size is None or os.path.getsize(local_path) == entry.size
+
+    def resume_offset(self, relative_path, entry, part_path):
+        """
+        Devuelve desde qué byte se puede reanudar un archivo parcial.
+
+        Sólo se reanuda si el registro corresponde a la misma versión remota
+        (mismo tamaño y fecha); en cualquier otro caso se empieza de cero.
+        El avance es el último registrado, no el tamaño del temporal: si el
+        espacio se reservó al empezar, el temporal ya tiene el tamaño final.
+
+        Args:
+            part_path: Archivo temporal (.part) donde se estaba descargando.
+        """
+        record = self.entries.get(relative_path)
+        if record is None or not self._matches(record, entry) or not os.path.exists(part_path):
+            return 0
+
+        offset = min(record.get("offset") or 0, os.path.getsize(part_path))
+        if entry.size is not None and offset > entry.size:
+            return 0
+        return offset
+
+    def completed_hash(self, relative_path):
+        """
+        Devuelve el SHA-256 registrado al completar el archivo, o None.
+        """
+        record = self.entries.get(relative_path)
+        return record.get("sha256") if record else None
+
+    def record(self, relative_path, entry, state, offset=None, sha256=None):
+        """
+        Agrega una línea al registro.
+
+        Args:
+            relative_path: Ruta del archivo relativa a la carpeta descargada.
+            entry: RemoteEntry del archivo.
+            state: "started", "partial" o "complete".
+            offset: Bytes descargados hasta el momento, si se conocen.
+            sha256: Hash del archivo completo.
+        """
+        record = {"path": relative_path, "size": entry.size, "modify": entry.modify, "state": state}
+        if offset is not None:
+            record["offset"] = offset
+        if sha256:
+            record["sha256"] = sha256
+
+        with self._lock:
+            self.entries[relative_path] = record
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+
+    def remove(self):
+        """
+        Elimina el registro cuando la descarga terminó sin errores.
+        """
+        with self._lock:
+            self.entries = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -1,7 +1,9 @@
-import os
 from ftplib import FTP, error_perm
+from data.ftp_listing import collect_files
+from data.google_sheets import SheetSnapshot
+from data.tracing import span, traced
 
-def connect_ftp(host, username, password, timeout=30):
+def connect_ftp(host, username, password, timeout=30, port=21):
     """
     Conecta al servidor FTP y retorna el objeto FTP.
     """
@@ -11,8 +13,10 @@ def connect_ftp(host, username, password, timeout=30):
     print(f"Intentando conectar al servidor FTP: {host}")
     try:
         ftp = FTP()
-        ftp.connect(host, timeout=timeout)
-        ftp.login(user=username, passwd=password)
+        with span("ftp.connect", host=host):
+            ftp.connect(host, port=port, timeout=timeout)
+        with span("ftp.login", host=host):
+            ftp.login(user=username, passwd=password)
         ftp.set_pasv(True)
         print("Conexión FTP establecida.")
         return ftp
@@ -31,46 +35,152 @@ def list_folders_ftp(ftp, base_path):
     Lista las carpetas en el directorio especificado en el servidor FTP.
     """
     try:
-        ftp.cwd(base_path)
-        return ftp.nlst()
+        with span("ftp.nlst", path=base_path) as current:
+            ftp.cwd(base_path)
+            folders = ftp.nlst()
+            current.set(entries=len(folders))
+            return folders
     except Exception as e:
         raise IOError(f"Error al listar carpetas en {base_path}: {e}")
 
 
+def list_target_folders(target, index=None, pool=None):
+    """
+    Lista las carpetas del directorio raíz de un destino FTP (ver ftp_targets).
+
+    Con un RemoteIndex, la raíz se lista con una sola orden y las carpetas
+    nuevas quedan registradas en el índice. Si se pasa un FTPPool se usa una
+    de sus conexiones; si no, se abre una propia.
+    """
+    def list_root(ftp):
+        if index is not None:
+            index.refresh(ftp, target["base_path"], max_depth=0)
+            return index.folders(target["base_path"])
+        return list_folders_ftp(ftp, target["base_path"])
+
+    if pool is not None:
+        with pool.connection() as ftp:
+            return list_root(ftp)
+
+    ftp = connect_ftp(
+        target["host"], target["user"], target["password"],
+        timeout=target.get("timeout", 30), port=target.get("port", 21),
+    )
+    try:
+        return list_root(ftp)
+    finally:
+        close_ftp_connection(ftp)
+
+
 def verificar_carpetas_ftp(ftp, base_path, excel_data, column_folder_name):
     """
     Verifica cuáles carpetas están en uso y cuáles están disponibles en el servidor FTP.
     """
     try:
-        # Listar carpetas desde el servidor FTP
-        folders_in_directory = set(list_folders_ftp(ftp, base_path))
-        # Carpetas en uso según el archivo Excel
-        folders_in_use = set(excel_data[column_folder_name])
-        
-        # Comparar carpetas
-        used_folders = folders_in_directory.intersection(folders_in_use)
-        available_folders = folders_in_directory.difference(folders_in_use)
-        
-        return used_folders, available_folders
+        # Listar carpetas desde el servidor FTP y cruzarlas con la planilla
+        folders_in_directory = list_folders_ftp(ftp, base_path)
+        used, available, _ = analizar_carpetas(folders_in_directory, excel_data, column_folder_name)
+
+        return {folder for folder, _ in used}, set(available)
     except Exception as e:
         raise RuntimeError(f"Error al verificar carpetas: {e}")
-    
+
+
+def _sheet_snapshot(sheet_data, column_folder_name, column_editor_name):
+    if isinstance(sheet_data, SheetSnapshot):
+        return sheet_data
+    return SheetSnapshot.from_columns(
+        list(sheet_data[column_folder_name]),
+        list(sheet_data[column_editor_name]) if column_editor_name in sheet_data else None,
+    )
+
+@traced("analysis.join")
+def analizar_carpetas(ftp_folders, sheet_data, column_folder_name="Carpeta", column_editor_name="Editor",
+                      default_editor="Sin Editor"):
+    """
+    Cruza las carpetas del FTP con los registros de la planilla en una sola pasada.
+
+    La planilla se usa como SheetSnapshot (carpetas registradas y editor de
+    cada una); si se pasan columnas, se construye recorriéndolas una vez, así
+    que el costo es lineal en carpetas + filas en lugar de carpetas x filas.
+
+    Args:
+        ftp_folders: Nombres de las carpetas en el servidor FTP.
+        sheet_data: SheetSnapshot, o DataFrame o diccionario de columnas con los registros.
+        column_folder_name: Columna con el nombre de la carpeta (si sheet_data son columnas).
+        column_editor_name: Columna con el nombre del editor (si sheet_data son columnas).
+        default_editor: Texto para carpetas en uso sin editor registrado.
+
+    Returns:
+        Tupla (en_uso, disponibles, faltantes): en_uso es una lista de
+        (carpeta, editor); disponibles son las carpetas del FTP sin registro;
+        faltantes son las carpetas de la planilla que no existen en el FTP.
+    """
+    snapshot = _sheet_snapshot(sheet_data, column_folder_name, column_editor_name)
+
+    ftp_folders = {str(folder) for folder in ftp_folders}
+
+    used = []
+    available = []
+    for folder in sorted(ftp_folders):
+        if folder in snapshot.folders:
+            used.append((folder, snapshot.editor(folder, default_editor)))
+        else:
+            available.append(folder)
+
+    missing = sorted(snapshot.folders - ftp_folders)
+
+    return used, available, missing
+
+@traced("analysis.join_targets")
+def analizar_destinos(folders_by_server, sheet_data, column_folder_name="Carpeta", column_editor_name="Editor",
+                      default_editor="Sin Editor"):
+    """
+    Cruza con la planilla las carpetas de varios destinos FTP y une el resultado.
+
+    La planilla identifica las carpetas sólo por nombre, así que una carpeta
+    registrada figura en uso en cada servidor donde exista.
+
+    Args:
+        folders_by_server: Diccionario nombre del destino -> carpetas listadas.
+        sheet_data: SheetSnapshot, o columnas con los registros (ver analizar_carpetas).
+
+    Returns:
+        Tupla (en_uso, disponibles, faltantes): en_uso es una lista de
+        (carpeta, editor, servidor); disponibles, de (carpeta, servidor);
+        faltantes son las carpetas de la planilla que no existen en ningún destino.
+    """
+    snapshot = _sheet_snapshot(sheet_data, column_folder_name, column_editor_name)
+
+    used = []
+    available = []
+    missing = set(snapshot.folders)
+    for server, folders in folders_by_server.items():
+        server_used, server_available, server_missing = analizar_carpetas(
+            folders, snapshot, default_editor=default_editor
+        )
+        used.extend((folder, editor, server) for folder, editor in server_used)
+        available.extend((folder, server) for folder in server_available)
+        missing.intersection_update(server_missing)
+
+    used.sort(key=lambda row: (row[0], row[2]))
+    available.sort()
+    return used, available, sorted(missing)
+
 def download_directory(ftp, remote_directory, local_directory, progress_callback=None):
     """
     Descarga un directorio completo desde el servidor FTP.
     """
-    os.makedirs(local_directory, exist_ok=True)
-    ftp.cwd(remote_directory)
-    files = ftp.nlst()
-    
+    # Listar todo el árbol primero (una orden por directorio) para conocer el total
+    files = collect_files(ftp, remote_directory, local_directory)
+
     total_files = len(files)
-    for i, file in enumerate(files, start=1):
-        local_path = os.path.join(local_directory, file)
+    for i, (remote_path, local_path, _) in enumerate(files, start=1):
         try:
-            with open(local_path, "wb") as f:
-                ftp.retrbinary(f"RETR {file}", f.write)
+            with open(local_path, "wb") as f, span("ftp.retr", path=remote_path):
+                ftp.retrbinary(f"RETR {remote_path}", f.write)
         except Exception as e:
-            print(f"Error al descargar {file}: {e}")
+            print(f"Error al descargar {remote_path}: {e}")
         
         # Actualizar la barra de progreso
         if progress_callback is not None:
@@ -0,0 +1,358 @@
+import os
+import posixpath
+from collections import namedtuple
+from datetime import datetime, timezone
+from ftplib import error_perm, error_reply, error_temp
+from data.tracing import span
+
+# Entrada de un listado remoto. "type" es "file", "dir" o "link"; "size" y
+# "modify" (formato YYYYMMDDHHMMSS, UTC) pueden ser None si el servidor no
+# los informa.
+RemoteEntry = namedtuple("RemoteEntry", ["name", "type", "size", "modify"])
+
+MLSD_FACTS = ["type", "size", "modify"]
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+
+def join_remote(directory, name):
+    """
+    Une una ruta remota con un nombre de archivo o carpeta.
+    """
+    return f"{directory.rstrip('/')}/{name}" if directory not in ("", "/") else f"/{name}"
+
+
+def get_features(ftp):
+    """
+    Devuelve las extensiones que anuncia el servidor con FEAT.
+
+    El resultado es un diccionario orden -> parámetros (por ejemplo
+    {"MLST": "type*;size*;modify*;", "MODE": "Z"}) y se guarda en la conexión
+    para no repetir la consulta. Si el servidor no soporta FEAT, queda vacío.
+    """
+    features = getattr(ftp, "features", None)
+    if features is not None:
+        return features
+
+    features = {}
+    try:
+        response = ftp.sendcmd("FEAT")
+    except (error_perm, error_reply, error_temp):
+        response = ""
+    for line in response.splitlines()[1:-1]:
+        name, _, parameters = line.strip().partition(" ")
+        if name:
+            name = name.upper()
+            # Una misma orden puede aparecer en varias líneas (p. ej. "MODE Z")
+            features[name] = f"{features[name]} {parameters}".strip() if name in features else parameters
+    ftp.features = features
+    return features
+
+
+def list_directory(ftp, remote_directory):
+    """
+    Lista un directorio remoto en una sola orden, con tipo, tamaño y fecha.
+
+    Usa MLSD cuando el servidor lo soporta y, si no, interpreta la salida de
+    LIST. El resultado de la negociación se recuerda en la conexión para no
+    volver a intentar MLSD en cada directorio.
+
+    Args:
+        ftp: Conexión FTP.
+        remote_directory: Ruta del directorio en el servidor FTP.
+
+    Returns:
+        Lista de RemoteEntry (sin "." ni "..").
+    """
+    with span("ftp.list", path=remote_directory) as current:
+        if getattr(ftp, "mlsd_supported", True):
+            try:
+                entries = _list_mlsd(ftp, remote_directory)
+                current.set(command="MLSD", entries=len(entries))
+                return entries
+            except error_perm as e:
+                # 500/501/502: orden no reconocida o no implementada
+                if not str(e).startswith("50"):
+                    raise
+                ftp.mlsd_supported = False
+
+        entries = _list_list(ftp, remote_directory)
+        current.set(command="LIST", entries=len(entries))
+        return entries
+
+
+def _list_mlsd(ftp, remote_directory):
+    entries = []
+    for name, facts in ftp.mlsd(remote_directory, facts=MLSD_FACTS):
+        entry_type = facts.get("type", "file").lower()
+        if entry_type in ("cdir", "pdir") or name in (".", ".."):
+            continue
+        if entry_type == "dir":
+            kind = "dir"
+        elif entry_type == "file":
+            kind = "file"
+        elif "link" in entry_type:
+            kind = "link"
+        else:
+            kind = "file"
+
+        size = facts.get("size")
+        modify = facts.get("modify")
+        entries.append(RemoteEntry(
+            posixpath.basename(name.rstrip("/")) or name,
+            kind,
+            int(size) if size and size.isdigit() else None,
+            modify[:14] if modify else None,
+        ))
+    return entries
+
+
+def _list_list(ftp, remote_directory):
+    lines = []
+    ftp.retrlines(f"LIST {remote_directory}", lines.append)
+    entries = []
+    for line in lines:
+        entry = parse_list_line(line)
+        if entry is not None and entry.name not in (".", ".."):
+            entries.append(entry)
+    return entries
+
+
+def parse_list_line(line, now=None):
+    """
+    Interpreta una línea de LIST en formato Unix o DOS/IIS.
+
+    Returns:
+        RemoteEntry, o None si la línea no es una entrada (por ejemplo "total 12").
+    """
+    line = line.rstrip("\r\n")
+    if not line or line.lower().startswith("total "):
+        return None
+
+    if line[0] in "-dlbcps":
+        return _parse_unix_line(line, now or datetime.now(timezone.utc))
+    if line[0].isdigit():
+        return _parse_dos_line(line)
+    return None
+
+
+def _parse_unix_line(line, now):
+    parts = line.split(None, 8)
+    if len(parts) < 9:
+        return None
+
+    mode, _, _, _, size, month, day, year_or_time, name = parts
+    if mode[0] == "d":
+        kind = "dir"
+    elif mode[0] == "l":
+        kind = "link"
+        name = name.split(" -> ", 1)[0]
+    else:
+        kind = "file"
+
+    modify = None
+    month_number = _MONTHS.get(month[:3].lower())
+    if month_number and day.isdigit():
+        try:
+            if ":" in year_or_time:
+                hour, minute = (int(v) for v in year_or_time.split(":", 1))
+                year = now.year
+                # Sin año, la fecha es de los últimos 12 meses
+                if (month_number, int(day)) > (now.month, now.day):
+                    year -= 1
+                stamp = datetime(year, month_number, int(day), hour, minute)
+            else:
+                stamp = datetime(int(year_or_time), month_number, int(day))
+            modify = stamp.strftime("%Y%m%d%H%M%S")
+        except ValueError:
+            modify = None
+
+    return RemoteEntry(name, kind, int(size) if size.isdigit() else None, modify)
+
+
+def _parse_dos_line(line):
+    parts = line.split(None, 3)
+    if len(parts) < 4:
+        return None
+
+    date, time, size_or_dir, name = parts
+    modify = None
+    for fmt in ("%m-%d-%y %I:%M%p", "%m-%d-%Y %I:%M%p", "%m-%d-%y %H:%M", "%m-%d-%Y %H:%M"):
+        try:
+            modify = datetime.strptime(f"{date} {time}", fmt).strftime("%Y%m%d%H%M%S")
+            break
+        except ValueError:
+            continue
+
+    if size_or_dir.upper() == "<DIR>":
+        return RemoteEntry(name, "dir", None, modify)
+    return RemoteEntry(name, "file", int(size_or_dir) if size_or_dir.isdigit() else None, modify)
+
+
+def resolve_link(ftp, remote_path):
+    """
+    Averigua si un enlace simbólico apunta a un archivo o a un directorio.
+
+    El listado (sobre todo LIST en servidores como vsftpd) sólo dice que la
+    entrada es un enlace. Se prueba con una orden por enlace: MLST si el
+    servidor lo soporta, si no SIZE (sólo responde para archivos) y, como
+    último recurso, un CWD al enlace, volviendo después al directorio de
+    trabajo anterior.
+
+    Returns:
+        Tupla (tipo, tamaño): tipo es "file" o "dir", o None si el enlace no
+        se pudo resolver (por ejemplo, porque apunta a algo que ya no
+        existe); tamaño es None si no se conoce.
+    """
+    with span("ftp.resolve_link", path=remote_path) as current:
+        if "MLST" in get_features(ftp):
+            try:
+                response = ftp.sendcmd(f"MLST {remote_path}")
+            except (error_perm, error_reply):
+                response = ""
+            # 250-Listing ... / " type=file;size=55; /ruta" / 250 End
+            for line in response.splitlines()[1:-1]:
+                facts = {}
+                for fact in line.strip().partition(" ")[0].split(";"):
+                    key, _, value = fact.partition("=")
+                    facts[key.lower()] = value
+                kind = facts.get("type", "").lower()
+                size = facts.get("size")
+                if kind in ("file", "dir"):
+                    current.set(command="MLST", type=kind)
+                    return kind, int(size) if size and size.isdigit() else None
+
+        try:
+            # Varios servidores (vsftpd, pyftpdlib) rechazan SIZE en modo ASCII
+            ftp.voidcmd("TYPE I")
+            size = ftp.size(remote_path)
+            current.set(command="SIZE", type="file")
+            return "file", size
+        except (error_perm, error_reply, ValueError):
+            pass
+
+        try:
+            previous = ftp.pwd()
+            ftp.cwd(remote_path)
+        except (error_perm, error_reply):
+            current.set(command="CWD", type=None)
+            return None, None
+        ftp.cwd(previous)
+        current.set(command="CWD", type="dir")
+        return "dir", None
+
+
+def walk_directory(ftp, remote_directory, follow_links=True):
+    """
+    Recorre un árbol remoto de arriba hacia abajo, como os.walk.
+
+    Cada directorio se lista con una sola orden. Los enlaces simbólicos se
+    resuelven con resolve_link y se devuelven como archivo o directorio
+    según a qué apunten; los que no se pueden resolver se informan y se
+    omiten. Dentro de un directorio al que se llegó por un enlace no se
+    siguen otros enlaces, para no entrar en ciclos (por ejemplo
+    "actual -> .").
+
+    Yields:
+        Tuplas (directorio_remoto, directorios, archivos), donde directorios y
+        archivos son listas de RemoteEntry.
+    """
+    entries = list_directory(ftp, remote_directory)
+    dirs = []
+    files = []
+    linked_dirs = set()
+    for entry in entries:
+        if entry.type == "link":
+            remote_path = join_remote(remote_directory, entry.name)
+            if not follow_links:
+                print(f"Se omite el enlace {remote_path}: está dentro de un directorio enlazado.")
+                continue
+            kind, size = resolve_link(ftp, remote_path)
+            if kind is None:
+                print(f"Se omite el enlace {remote_path}: no se pudo saber a qué apunta.")
+                continue
+            # El tamaño del listado es el del enlace, no el de su destino
+            entry = entry._replace(type=kind, size=size)
+            if kind == "dir":
+                linked_dirs.add(entry.name)
+        if entry.type == "dir":
+            dirs.append(entry)
+        else:
+            files.append(entry)
+
+    yield remote_directory, dirs, files
+
+    for entry in dirs:
+        yield from walk_directory(
+            ftp, join_remote(remote_directory, entry.name), follow_links and entry.name not in linked_dirs
+        )
+
+
+def collect_files(ftp, remote_directory, local_directory):
+    """
+    Recorre el árbol remoto y crea la estructura local de carpetas.
+
+    Los directorios locales se crean de arriba hacia abajo antes de devolver
+    la lista, de modo que los archivos pueden descargarse luego en cualquier
+    orden.
+
+    Args:
+        ftp: Conexión FTP.
+        remote_directory: Ruta del directorio en el servidor FTP.
+        local_directory: Ruta local donde se guardarán los archivos.
+
+    Returns:
+        Lista de tuplas (ruta_remota, ruta_local, entrada) con los archivos a descargar.
+    """
+    os.makedirs(local_directory, exist_ok=True)
+
+    files = []
+    for remote_dir, dirs, entries in walk_directory(ftp, remote_directory):
+        relative = remote_dir[len(remote_directory):].strip("/")
+        local_dir = os.path.join(local_directory, *relative.split("/")) if relative else local_directory
+
+        for entry in dirs:
+            os.makedirs(os.path.join(local_dir, entry.name), exist_ok=True)
+        for entry in entries:
+            files.append((join_remote(remote_dir, entry.name), os.path.join(local_dir, entry.name), entry))
+
+    return files
+
+
+def get_modify_time(ftp, remote_path):
+    """
+    Consulta la fecha de modificación de un archivo con MDTM.
+
+    Returns:
+        Fecha en formato YYYYMMDDHHMMSS, o None si el servidor no la informa.
+    """
+    try:
+        response = ftp.sendcmd(f"MDTM {remote_path}")
+    except error_perm:
+        return None
+    parts = response.split()
+    if len(parts) >= 2 and parts[0] == "213":
+        return parts[1][:14]
+    return None
+
+
+def fill_modify_times(ftp, files):
+    """
+    Completa con MDTM la fecha de los archivos cuyo listado no la trajo.
+
+    Args:
+        ftp: Conexión FTP.
+        files: Lista de tuplas (ruta_remota, ruta_local, entrada).
+
+    Returns:
+        Nueva lista con las entradas completadas.
+    """
+    completed = []
+    for remote_path, local_path, entry in files:
+        if entry.modify is None:
+            entry = entry._replace(modify=get_modify_time(ftp, remote_path))
+        completed.append((remote_path, local_path, entry))
+    return completed
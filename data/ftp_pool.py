@@ -0,0 +1,257 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from ftplib import FTP, error_reply, error_temp
+from data.tracing import span
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 30
+DEFAULT_KEEPALIVE_INTERVAL = 30.0  # segundos entre NOOP a las conexiones ociosas
+DEFAULT_IDLE_TIMEOUT = 300.0  # segundos antes de cerrar una conexión sin uso
+HEALTH_CHECK_AFTER = 10.0  # segundos de inactividad tras los que se comprueba la conexión al entregarla
+
+# Errores que indican que la conexión ya no sirve y hay que descartarla
+BROKEN_CONNECTION_ERRORS = (error_temp, error_reply, EOFError, OSError)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolExhausted(Exception):
+    """
+    No se liberó ninguna conexión dentro del tiempo de espera.
+    """
+
+
+def open_connection(ftp_config):
+    """
+    Abre una conexión FTP autenticada con la configuración dada.
+    """
+    ftp = FTP()
+    with span("ftp.connect", host=ftp_config["host"]):
+        ftp.connect(
+            ftp_config["host"],
+            port=ftp_config.get("port", 21),
+            timeout=ftp_config.get("timeout", DEFAULT_TIMEOUT),
+        )
+    with span("ftp.login", host=ftp_config["host"]):
+        ftp.login(ftp_config["user"], ftp_config["password"])
+    return ftp
+
+
+def close_connection(ftp):
+    """
+    Cierra una conexión FTP sin propagar errores.
+    """
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
+
+
+class FTPPool:
+    """
+    Pool de conexiones FTP autenticadas, compartido por toda la aplicación.
+
+    El inicio de sesión es lento y el servidor limita las conexiones por IP,
+    así que las conexiones se reutilizan entre el análisis, el índice y las
+    descargas. El pool:
+      - nunca tiene abiertas más de max_connections (en uso + ociosas); al
+        llegar al límite, acquire espera a que se libere una;
+      - mantiene vivas las conexiones ociosas con NOOP y cierra las que
+        llevan más de idle_timeout sin usarse;
+      - comprueba con NOOP una conexión ociosa antes de entregarla y, si el
+        servidor la cerró, abre otra en su lugar.
+    """
+
+    def __init__(self, ftp_config, max_connections=None, keepalive_interval=None, idle_timeout=None,
+                 connect=None):
+        """
+        Args:
+            ftp_config: Diccionario con las credenciales de FTP.
+            max_connections: Conexiones simultáneas permitidas (por defecto,
+                la clave "pool_size" de la configuración).
+            keepalive_interval: Segundos entre NOOP a las conexiones ociosas.
+            idle_timeout: Segundos sin uso tras los que se cierra una conexión.
+            connect: Función sin argumentos que abre una conexión (por
+                defecto, open_connection con ftp_config).
+        """
+        self.ftp_config = ftp_config
+        if max_connections is None:
+            max_connections = ftp_config.get("pool_size", DEFAULT_POOL_SIZE)
+        self.max_connections = max(1, int(max_connections))
+        self.keepalive_interval = keepalive_interval or ftp_config.get(
+            "keepalive_interval", DEFAULT_KEEPALIVE_INTERVAL
+        )
+        self.idle_timeout = idle_timeout or ftp_config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)
+        self._connect = connect or (lambda: open_connection(ftp_config))
+        self._idle = deque()  # (conexión, último uso, última actividad incluyendo NOOP)
+        self._open = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._keepalive_thread = None
+
+    @property
+    def open_count(self):
+        return self._open
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        """
+        Entrega una conexión autenticada, reutilizando una ociosa si la hay.
+
+        Args:
+            timeout: Segundos máximos de espera si el pool está lleno (None = sin límite).
+
+        Raises:
+            PoolExhausted: si no se liberó ninguna conexión a tiempo.
+            Exception: si hubo que abrir una conexión nueva y falló.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("El pool de conexiones FTP está cerrado.")
+                if self._idle:
+                    ftp, _, last_activity = self._idle.pop()  # La más reciente: la más probable de seguir viva
+                    break
+                if self._open < self.max_connections:
+                    self._open += 1
+                    ftp, last_activity = None, None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhausted(f"Las {self.max_connections} conexiones FTP están en uso.")
+                self._condition.wait(remaining)
+
+        if ftp is not None and time.monotonic() - last_activity > HEALTH_CHECK_AFTER and not self._is_alive(ftp):
+            close_connection(ftp)
+            ftp = None
+
+        if ftp is None:
+            try:
+                ftp = self._connect()
+            except Exception:
+                self._forget()
+                raise
+        self.start_keepalive()
+        return ftp
+
+    def release(self, ftp, discard=False):
+        """
+        Devuelve una conexión al pool.
+
+        Args:
+            discard: Si es True (por ejemplo, tras un error de red), la
+                conexión se cierra en lugar de reutilizarse.
+        """
+        if discard or self._closed or getattr(ftp, "sock", True) is None:
+            close_connection(ftp)
+            self._forget()
+            return
+        now = time.monotonic()
+        with self._condition:
+            self._idle.append((ftp, now, now))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Conexión para usar en un bloque with; se descarta si hubo un error de red.
+        """
+        ftp = self.acquire(timeout)
+        try:
+            yield ftp
+        except BROKEN_CONNECTION_ERRORS:
+            self.release(ftp, discard=True)
+            raise
+        except BaseException:
+            self.release(ftp)
+            raise
+        else:
+            self.release(ftp)
+
+    def close(self):
+        """
+        Cierra las conexiones ociosas; las que están en uso se cierran al devolverlas.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [item[0] for item in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for ftp in idle:
+            close_connection(ftp)
+
+    def start_keepalive(self):
+        if self._keepalive_thread is None:
+            with self._condition:
+                if self._keepalive_thread is None:
+                    self._keepalive_thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+                    self._keepalive_thread.start()
+
+    def keepalive(self):
+        """
+        Envía NOOP a las conexiones ociosas y cierra las vencidas o caídas.
+        """
+        now = time.monotonic()
+        with self._condition:
+            due = [item for item in self._idle if now - item[2] >= self.keepalive_interval]
+            for item in due:
+                self._idle.remove(item)
+
+        for ftp, last_used, _ in due:
+            if now - last_used >= self.idle_timeout or not self._is_alive(ftp):
+                close_connection(ftp)
+                self._forget()
+                continue
+            with self._condition:
+                # Se conserva la hora de último uso: el NOOP no cuenta para idle_timeout
+                self._idle.appendleft((ftp, last_used, time.monotonic()))
+                self._condition.notify()
+
+    def _keepalive_loop(self):
+        while not self._closed:
+            time.sleep(min(self.keepalive_interval, HEALTH_CHECK_AFTER))
+            self.keepalive()
+
+    def _is_alive(self, ftp):
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except Exception:
+            return False
+
+    def _forget(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+
+def get_pool(ftp_config):
+    """
+    Devuelve el pool de la aplicación para el servidor y usuario dados.
+    """
+    key = (ftp_config["host"], ftp_config.get("port", 21), ftp_config["user"], ftp_config["password"])
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = FTPPool(ftp_config)
+            _pools[key] = pool
+        return pool
+
+
+def close_pools():
+    """
+    Cierra y descarta todos los pools (al cambiar la configuración o al salir).
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,110 @@
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_TARGET_TIMEOUT = 60.0  # segundos que se espera a cada servidor durante el análisis
+
+# Claves que no son de un servidor FTP sino de la aplicación
+_APPLICATION_KEYS = ("targets", "google_sheet_url")
+
+# Resultado de listar un destino: folders es None si falló (ver error)
+TargetResult = namedtuple("TargetResult", ["target", "folders", "error"])
+
+
+def target_name(ftp_config):
+    """
+    Nombre con el que se muestra un destino: el configurado o host + directorio raíz.
+    """
+    if ftp_config.get("name"):
+        return ftp_config["name"]
+    return f"{ftp_config.get('host', '')}{ftp_config.get('base_path', '')}"
+
+
+def ftp_targets(config):
+    """
+    Devuelve la lista de destinos FTP (servidor + directorio raíz) de la configuración.
+
+    El destino principal son las claves host, user, password y base_path
+    (en el nivel superior, como las guarda el diálogo, o bajo "ftp"). La
+    lista "targets" agrega otros destinos; cada uno hereda del principal las
+    claves que no indique, así que para otro directorio del mismo servidor
+    alcanza con {"base_path": "/otro"}.
+
+    Cada destino es un diccionario completo (con "name") que se puede pasar
+    a connect_ftp, get_pool o DownloadEngine.
+    """
+    primary = {key: value for key, value in (config.get("ftp") or config).items() if key not in _APPLICATION_KEYS}
+    extra = config.get("targets") or (config.get("ftp") or {}).get("targets") or []
+
+    targets = [primary] if primary.get("host") else []
+    targets.extend({**primary, "name": None, **target} for target in extra)
+    for target in targets:
+        target["name"] = target_name(target)
+    return targets
+
+
+def find_target(targets, name):
+    """
+    Devuelve el destino con ese nombre.
+
+    Raises:
+        KeyError: si no hay ningún destino con ese nombre.
+    """
+    for target in targets:
+        if target["name"] == name:
+            return target
+    raise KeyError(f"No hay un servidor configurado con el nombre {name}.")
+
+
+def list_targets(targets, list_folders, on_result=None):
+    """
+    Lista las carpetas de todos los destinos en paralelo.
+
+    Cada destino tiene su propio plazo (clave "analysis_timeout", por
+    defecto DEFAULT_TARGET_TIMEOUT segundos): si no responde a tiempo se
+    informa como error y no se lo sigue esperando, así que un servidor lento
+    no demora el resultado de los demás. El hilo del destino vencido
+    termina solo, al expirar el timeout de su conexión.
+
+    Args:
+        targets: Destinos a listar (ver ftp_targets).
+        list_folders: Función (destino) -> lista de carpetas; se ejecuta en otro hilo.
+        on_result: Función opcional que recibe cada TargetResult apenas está listo.
+
+    Returns:
+        Lista de TargetResult, en el orden de targets.
+    """
+    if not targets:
+        return []
+    results = {}
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=len(targets))
+    try:
+        futures = {executor.submit(list_folders, target): position for position, target in enumerate(targets)}
+        deadlines = {
+            future: start + targets[position].get("analysis_timeout", DEFAULT_TARGET_TIMEOUT)
+            for future, position in futures.items()
+        }
+        pending = set(futures)
+        while pending:
+            timeout = max(0.0, min(deadlines[future] for future in pending) - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            expired = {future for future in pending if deadlines[future] <= now}
+            pending -= expired
+
+            for future in done | expired:
+                target = targets[futures[future]]
+                if future in expired:
+                    timeout_seconds = target.get("analysis_timeout", DEFAULT_TARGET_TIMEOUT)
+                    result = TargetResult(target, None, f"Sin respuesta después de {timeout_seconds:g} s.")
+                elif future.exception() is not None:
+                    result = TargetResult(target, None, str(future.exception()))
+                else:
+                    result = TargetResult(target, list(future.result()), None)
+                results[futures[future]] = result
+                if on_result is not None:
+                    on_result(result)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [results[position] for position in range(len(targets))]
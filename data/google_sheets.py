@@ -1,47 +1,364 @@
-import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
+import threading
+import time
+from data.tracing import span, traced
 
-def connect_to_google_sheet(sheet_url, credentials_file):
+# gspread y oauth2client tardan en importarse: se cargan recién al primer
+# acceso a la planilla para no demorar la apertura de la ventana.
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+EXPECTED_HEADERS = ["Carpeta", "Editor"]
+# Columna con la fecha en que una carpeta se devolvió al FTP (se agrega si falta)
+RETURNED_HEADER = "Devuelta"
+# Filas pedidas por rango en cada lectura de la planilla
+SHEET_CHUNK_ROWS = 10000
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/{}"
+
+# Si no se puede consultar la fecha de modificación en Drive, la copia
+# local de la hoja se considera válida durante este tiempo (segundos).
+DEFAULT_SNAPSHOT_TTL = 300
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_sheet_id(sheet_url):
     """
-    Conecta a un Google Sheet utilizando la URL y credenciales de la API.
+    Extrae el identificador del documento a partir de su URL.
     """
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, scope)
-    client = gspread.authorize(credentials)
-    
     try:
-        sheet_id = sheet_url.split('/d/')[1].split('/')[0]
+        return sheet_url.split('/d/')[1].split('/')[0]
     except IndexError:
         raise ValueError("La URL proporcionada no es valida.")
-    
-    sheet = client.open_by_key(sheet_id).sheet1
-    
-    expected_headers = ["Carpeta", "Editor"]
-    records = sheet.get_all_records(expected_headers=expected_headers)
-    
-    return pd.DataFrame(records)
+
+
+class SheetSnapshot:
+    """
+    Copia compacta de la planilla: sólo lo que usa el análisis.
+
+    Guarda el conjunto de carpetas registradas y, aparte, el editor de las
+    que lo tienen. Si una carpeta aparece en varias filas se conserva la
+    primera, como al cruzar la planilla completa.
+    """
+
+    __slots__ = ("folders", "editors")
+
+    def __init__(self, folders=(), editors=None):
+        self.folders = set(folders)
+        self.editors = editors or {}
+
+    @classmethod
+    def from_columns(cls, folders, editors=None):
+        """
+        Construye la copia a partir de las columnas de carpeta y editor.
+
+        Las celdas de carpeta vacías se ignoran; los editores vacíos (o NaN,
+        si las columnas vienen de pandas) se tratan como sin editor.
+        """
+        snapshot = cls()
+        if editors is None:
+            editors = [None] * len(folders)
+        for folder, editor in zip(folders, editors):
+            if folder is None or folder == "":
+                continue
+            folder = str(folder)
+            if folder in snapshot.folders:
+                continue
+            snapshot.folders.add(folder)
+            # NaN no es igual a sí mismo
+            if editor is not None and editor == editor and str(editor).strip():
+                snapshot.editors[folder] = str(editor)
+        return snapshot
+
+    def editor(self, folder, default=None):
+        return self.editors.get(folder, default)
+
+    def __contains__(self, folder):
+        return folder in self.folders
+
+    def __len__(self):
+        return len(self.folders)
+
+
+@traced("sheets.read_columns")
+def read_columns(worksheet, headers, chunk_rows=SHEET_CHUNK_ROWS):
+    """
+    Lee sólo las columnas indicadas de una hoja, por tramos de chunk_rows filas.
+
+    Se pide primero la fila de encabezados para ubicar las columnas y
+    después, en cada tramo, un rango por columna en una sola llamada a
+    batch_get. Así no se descargan las demás columnas ni se arma la hoja
+    entera en memoria.
+
+    El último tramo es abierto (por ejemplo "A1001:A"): worksheet.row_count
+    es el tamaño de la hoja cuando se abrió, y las filas que otros usuarios
+    agreguen después quedan fuera de ese tamaño.
+
+    Returns:
+        Diccionario encabezado -> lista de valores (cadenas, "" si la celda
+        está vacía), todas las listas del mismo largo.
+
+    Raises:
+        ValueError: si falta el primer encabezado (el de la carpeta).
+    """
+    from gspread.utils import rowcol_to_a1
+
+    header_row = worksheet.row_values(1)
+    columns = {header: header_row.index(header) + 1 for header in headers if header in header_row}
+    if headers[0] not in columns:
+        raise ValueError(f"La planilla no tiene la columna {headers[0]!r}.")
+
+    values = {header: [] for header in columns}
+    rows = 0  # filas de datos hasta la última con algún valor
+    last_row = worksheet.row_count
+    start = 2
+    while True:
+        end = start + chunk_rows - 1
+        open_ended = end >= last_row
+        if open_ended:
+            # rowcol_to_a1(1, columna) es la letra de la columna seguida de "1"
+            ranges = [f"{rowcol_to_a1(start, column)}:{rowcol_to_a1(1, column)[:-1]}" for column in columns.values()]
+        else:
+            ranges = [f"{rowcol_to_a1(start, column)}:{rowcol_to_a1(end, column)}" for column in columns.values()]
+        results = worksheet.batch_get(ranges, major_dimension="COLUMNS")
+        chunk = [result[0] if result else [] for result in results]
+        if open_ended:
+            end = start - 1 + max((len(column) for column in chunk), default=0)
+        for header, column in zip(columns, chunk):
+            # La API omite las celdas vacías del final de cada rango
+            if column:
+                rows = max(rows, start - 2 + len(column))
+            values[header].extend(column)
+            values[header].extend([""] * (end - start + 1 - len(column)))
+        if open_ended:
+            break
+        start = end + 1
+
+    result = {header: column[:rows] for header, column in values.items()}
+    for header in headers:
+        result.setdefault(header, [""] * rows)
+    return result
+
+
+class SheetSession:
+    """
+    Conexión reutilizable a un Google Sheet.
+
+    Mantiene el cliente autorizado, la hoja abierta y una copia local de los
+    registros. La copia sólo se vuelve a descargar cuando la fecha de
+    modificación del archivo en Drive cambia (o, si no se puede consultar,
+    cuando vence el TTL).
+    """
+
+    def __init__(self, sheet_url, credentials_file, snapshot_ttl=DEFAULT_SNAPSHOT_TTL):
+        self.sheet_id = get_sheet_id(sheet_url)
+        self.credentials_file = credentials_file
+        self.snapshot_ttl = snapshot_ttl
+        self._client = None
+        self._worksheet = None
+        self._snapshot = None
+        self._snapshot_modified = None
+        self._snapshot_time = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        """
+        Cliente de gspread, autorizado una sola vez por sesión.
+        """
+        with self._lock:
+            if self._client is None:
+                from oauth2client.service_account import ServiceAccountCredentials
+                import gspread
+
+                with span("sheets.auth"):
+                    credentials = ServiceAccountCredentials.from_json_keyfile_name(self.credentials_file, SCOPE)
+                    self._client = gspread.authorize(credentials)
+            return self._client
+
+    @property
+    def worksheet(self):
+        """
+        Primera hoja del documento, abierta una sola vez por sesión.
+        """
+        with self._lock:
+            if self._worksheet is None:
+                client = self.client
+                with span("sheets.open"):
+                    self._worksheet = client.open_by_key(self.sheet_id).sheet1
+            return self._worksheet
+
+    @traced("sheets.modified_time")
+    def get_modified_time(self):
+        """
+        Consulta en Drive la fecha de última modificación del documento.
+
+        Returns:
+            Cadena con la fecha (RFC 3339), o None si no se pudo consultar.
+        """
+        client = self.client
+        http = getattr(client, "http_client", client)  # gspread 6 / gspread 5
+        try:
+            response = http.request(
+                "get",
+                DRIVE_FILES_URL.format(self.sheet_id),
+                params={"fields": "modifiedTime,version", "supportsAllDrives": True},
+            )
+            metadata = response.json()
+        except Exception as e:
+            print(f"No se pudo consultar la fecha de modificación del Google Sheet: {e}")
+            return None
+        return metadata.get("version") or metadata.get("modifiedTime")
+
+    @traced("sheets.records")
+    def records(self, force=False):
+        """
+        Devuelve la hoja como SheetSnapshot, usando la copia local si la hoja
+        no cambió desde la última descarga.
+
+        Sólo se leen las columnas de EXPECTED_HEADERS.
+        """
+        with self._lock:
+            if self._snapshot is not None and not force:
+                modified = self.get_modified_time()
+                if modified is not None:
+                    if modified == self._snapshot_modified:
+                        return self._snapshot
+                elif time.monotonic() - self._snapshot_time < self.snapshot_ttl:
+                    return self._snapshot
+            else:
+                modified = self.get_modified_time()
+
+            columns = read_columns(self.worksheet, EXPECTED_HEADERS)
+            self._snapshot = SheetSnapshot.from_columns(*(columns[header] for header in EXPECTED_HEADERS))
+            self._snapshot_modified = modified
+            self._snapshot_time = time.monotonic()
+            return self._snapshot
+
+    def append_row(self, row_data):
+        """
+        Agrega una fila a la hoja y descarta la copia local.
+        """
+        with self._lock, span("sheets.append", rows=1):
+            self.worksheet.append_row(row_data)
+            self.invalidate()
+
+    def append_rows(self, rows):
+        """
+        Agrega varias filas en una sola llamada a la API y descarta la copia local.
+        """
+        with self._lock, span("sheets.append", rows=len(rows)):
+            self.worksheet.append_rows(rows)
+            self.invalidate()
+
+    @traced("sheets.update")
+    def update_rows(self, updates):
+        """
+        Modifica las filas de varias carpetas con una sola llamada a la API.
+
+        Cada actualización es {"folder": carpeta, "values": {encabezado: valor}}.
+        Las columnas que no existen se agregan a los encabezados y las
+        carpetas que no están en la hoja se agregan como filas nuevas.
+        """
+        from gspread.utils import rowcol_to_a1
+
+        with self._lock:
+            worksheet = self.worksheet
+            headers = worksheet.row_values(1)
+            cells = []
+            for update in updates:
+                for header in update["values"]:
+                    if header not in headers:
+                        headers.append(header)
+                        cells.append({"range": rowcol_to_a1(1, len(headers)), "values": [[header]]})
+            if len(headers) > worksheet.col_count:
+                worksheet.add_cols(len(headers) - worksheet.col_count)
+
+            # Fila de cada carpeta (la primera, como en SheetSnapshot)
+            folder_column = read_columns(worksheet, EXPECTED_HEADERS[:1])[EXPECTED_HEADERS[0]]
+            rows = {}
+            for position, folder in enumerate(folder_column):
+                rows.setdefault(folder, position + 2)
+
+            new_rows = []
+            for update in updates:
+                row = rows.get(update["folder"])
+                if row is None:
+                    values = [""] * len(headers)
+                    values[headers.index(EXPECTED_HEADERS[0])] = update["folder"]
+                    for header, value in update["values"].items():
+                        values[headers.index(header)] = value
+                    new_rows.append(values)
+                    continue
+                for header, value in update["values"].items():
+                    cells.append({"range": rowcol_to_a1(row, headers.index(header) + 1), "values": [[value]]})
+
+            if cells:
+                worksheet.batch_update(cells)
+            if new_rows:
+                worksheet.append_rows(new_rows)
+            self.invalidate()
+
+    def invalidate(self):
+        """
+        Descarta la copia local para forzar una nueva descarga.
+        """
+        with self._lock:
+            self._snapshot = None
+            self._snapshot_modified = None
+
+
+def get_sheet_session(sheet_url, credentials_file):
+    """
+    Devuelve la sesión en caché para el documento y las credenciales dadas.
+    """
+    key = (get_sheet_id(sheet_url), credentials_file)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = SheetSession(sheet_url, credentials_file)
+            _sessions[key] = session
+        return session
+
+
+def clear_sheet_sessions():
+    """
+    Descarta todas las sesiones (por ejemplo, al cambiar la configuración).
+    """
+    with _sessions_lock:
+        _sessions.clear()
+
+
+def connect_to_google_sheet(sheet_url, credentials_file):
+    """
+    Conecta a un Google Sheet utilizando la URL y credenciales de la API.
+    """
+    return get_sheet_session(sheet_url, credentials_file).records()
 
 def load_excel_data(sheet_url, credentials_file):
     """
-    Carga los datos desde un Google Sheet y asigna nombres a las columnas.
+    Carga las carpetas y editores registrados en un Google Sheet.
+
+    Returns:
+        SheetSnapshot.
     """
-    df = connect_to_google_sheet(sheet_url, credentials_file)
-    return df
+    return connect_to_google_sheet(sheet_url, credentials_file)
 
 def append_row_to_google_sheet(sheet_url, credentials_file, row_data):
     """
     Agrega una fila a un Google Sheet utilizando la URL y credenciales de la API.
     """
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, scope)
-    client = gspread.authorize(credentials)
-    
-    try:
-        sheet_id = sheet_url.split('/d/')[1].split('/')[0]
-    except IndexError:
-        raise ValueError("La URL proporcionada no es valida.")
-    
-    sheet = client.open_by_key(sheet_id).sheet1
-    
-    sheet.append_row(row_data)
\ No newline at end of file
+    get_sheet_session(sheet_url, credentials_file).append_row(row_data)
+
+
+def append_rows_to_google_sheet(sheet_url, credentials_file, rows):
+    """
+    Agrega varias filas a un Google Sheet en una sola petición.
+    """
+    get_sheet_session(sheet_url, credentials_file).append_rows(rows)
+
+
+def update_rows_in_google_sheet(sheet_url, credentials_file, updates):
+    """
+    Actualiza las filas de varias carpetas de un Google Sheet en una sola petición.
+    """
+    get_sheet_session(sheet_url, credentials_file).update_rows(updates)
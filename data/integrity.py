@@ -0,0 +1,247 @@
+import hashlib
+import os
+import re
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ftplib import error_perm, error_reply
+from data.ftp_listing import get_features
+from data.sync_manifest import SyncManifest
+
+# Algoritmo con el que se guardan los archivos en el manifiesto local
+HASH_ALGORITHM = "sha256"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Algoritmos de la orden HASH en orden de preferencia, con su nombre en hashlib
+SERVER_HASH_ALGORITHMS = (("SHA-256", "sha256"), ("SHA-1", "sha1"), ("MD5", "md5"), ("CRC32", "crc32"))
+
+# Verificación que ofrece el servidor: orden FTP ("HASH", "XMD5" o "XCRC") y algoritmo
+ServerHash = namedtuple("ServerHash", ["command", "algorithm"])
+
+# Resultado de verificar una carpeta: listas de rutas relativas
+VerifyResult = namedtuple("VerifyResult", ["ok", "mismatched", "missing", "unhashed"])
+
+HEX_PATTERN = re.compile(r"^[0-9a-fA-F]+$")
+
+
+class IntegrityError(Exception):
+    """
+    El archivo descargado no coincide con el del servidor.
+    """
+
+
+class _Crc32:
+    """
+    CRC32 con la misma interfaz que los objetos de hashlib.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+
+def new_hash(algorithm):
+    if algorithm == "crc32":
+        return _Crc32()
+    return hashlib.new(algorithm)
+
+
+class StreamHasher:
+    """
+    Calcula el hash de un archivo a medida que llegan sus bloques.
+
+    Además del algoritmo del manifiesto puede calcular, en la misma pasada,
+    el que usa el servidor para comparar ambos sin volver a leer el archivo.
+    """
+
+    def __init__(self, server_algorithm=None):
+        self.server_algorithm = server_algorithm
+        self.reset()
+
+    def reset(self):
+        """
+        Descarta lo calculado, para volver a empezar el archivo desde cero.
+        """
+        self.digests = {HASH_ALGORITHM: new_hash(HASH_ALGORITHM)}
+        if self.server_algorithm and self.server_algorithm != HASH_ALGORITHM:
+            self.digests[self.server_algorithm] = new_hash(self.server_algorithm)
+        self.size = 0
+
+    def update(self, block):
+        for digest in self.digests.values():
+            digest.update(block)
+        self.size += len(block)
+
+    def hexdigest(self, algorithm=HASH_ALGORITHM):
+        return self.digests[algorithm].hexdigest()
+
+    @classmethod
+    def from_file(cls, path, length, server_algorithm=None):
+        """
+        Crea un hasher con los primeros length bytes de un archivo ya en disco.
+
+        Se usa al reanudar una descarga: sólo se lee la parte ya descargada.
+        """
+        hasher = cls(server_algorithm)
+        remaining = length
+        with open(path, "rb") as file:
+            while remaining > 0:
+                block = file.read(min(HASH_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+
+def hash_file(path, algorithm=HASH_ALGORITHM):
+    """
+    Calcula el hash de un archivo completo.
+
+    Es una función de módulo para poder ejecutarla en otro proceso.
+    """
+    digest = new_hash(algorithm)
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def negotiate_server_hash(ftp):
+    """
+    Consulta FEAT y elige la mejor verificación que ofrece el servidor.
+
+    Prefiere la orden HASH (seleccionando el algoritmo con OPTS HASH) y,
+    si no está, las órdenes XMD5 o XCRC.
+
+    Returns:
+        ServerHash, o None si el servidor no ofrece ninguna.
+    """
+    features = get_features(ftp)
+    if "HASH" in features:
+        offered = {name.rstrip("*").upper() for name in features["HASH"].split(";")}
+        for name, algorithm in SERVER_HASH_ALGORITHMS:
+            if name not in offered:
+                continue
+            try:
+                ftp.sendcmd(f"OPTS HASH {name}")
+            except (error_perm, error_reply):
+                continue
+            return ServerHash("HASH", algorithm)
+    if "XMD5" in features:
+        return ServerHash("XMD5", "md5")
+    if "XCRC" in features:
+        return ServerHash("XCRC", "crc32")
+    return None
+
+
+def get_server_hash(ftp, server_hash, remote_path):
+    """
+    Pide al servidor el hash de un archivo.
+
+    Returns:
+        El hash en hexadecimal y minúsculas, o None si el servidor no lo devolvió.
+    """
+    try:
+        response = ftp.sendcmd(f"{server_hash.command} {remote_path}")
+    except (error_perm, error_reply):
+        return None
+
+    # HASH: "213 SHA-256 0-49 <hash> <archivo>"; XMD5/XCRC: "250 <hash>"
+    tokens = response.split()[1:]
+    if server_hash.command == "HASH":
+        tokens = tokens[2:3]
+    for token in tokens:
+        token = token.strip('"')
+        if HEX_PATTERN.match(token):
+            return token.lower()
+    return None
+
+
+def hashes_match(server_value, local_value, algorithm):
+    if algorithm == "crc32":
+        # Algunos servidores omiten los ceros a la izquierda
+        return int(server_value, 16) == int(local_value, 16)
+    return server_value == local_value
+
+
+def verify_directory(local_directory, max_workers=None, on_progress=None, forget_mismatched=False):
+    """
+    Comprueba una carpeta descargada contra su manifiesto.
+
+    Primero compara tamaños (sin leer los archivos) y después calcula los
+    hashes en paralelo, en varios procesos, para usar todos los núcleos.
+
+    Args:
+        local_directory: Carpeta descargada con su manifiesto.
+        max_workers: Procesos a usar (por defecto, uno por núcleo).
+        on_progress: Función opcional (verificados, total, ruta_relativa).
+        forget_mismatched: Quita del manifiesto los archivos dañados para que
+            la próxima sincronización los descargue de nuevo.
+
+    Returns:
+        VerifyResult.
+    """
+    manifest = SyncManifest(local_directory)
+    if not os.path.exists(manifest.path):
+        raise FileNotFoundError(f"No hay un manifiesto de descarga en {local_directory}.")
+    ok, mismatched, missing, unhashed = [], [], [], []
+
+    to_hash = {}
+    for relative_path, record in sorted(manifest.files.items()):
+        local_path = os.path.join(local_directory, *relative_path.split("/"))
+        if not os.path.exists(local_path):
+            missing.append(relative_path)
+        elif record.get("size") is not None and os.path.getsize(local_path) != record["size"]:
+            mismatched.append(relative_path)
+        elif not record.get(HASH_ALGORITHM):
+            unhashed.append(relative_path)
+        else:
+            to_hash[relative_path] = local_path
+
+    total = len(to_hash)
+    if to_hash:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(hash_file, local_path): relative_path
+                for relative_path, local_path in to_hash.items()
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                relative_path = futures[future]
+                try:
+                    matches = future.result() == manifest.files[relative_path][HASH_ALGORITHM]
+                except OSError:
+                    matches = False
+                (ok if matches else mismatched).append(relative_path)
+                if on_progress is not None:
+                    on_progress(done, total, relative_path)
+
+    if forget_mismatched and mismatched:
+        for relative_path in mismatched:
+            manifest.remove(relative_path)
+        manifest.save()
+
+    return VerifyResult(sorted(ok), sorted(mismatched), missing, unhashed)
+
+
+def verify_message(result):
+    """
+    Arma el mensaje para el usuario a partir de un VerifyResult.
+    """
+    message = f"{len(result.ok)} archivos correctos."
+    if result.mismatched:
+        message += f"\n{len(result.mismatched)} archivos dañados o incompletos:\n"
+        message += "\n".join(result.mismatched[:10])
+    if result.missing:
+        message += f"\n{len(result.missing)} archivos faltantes:\n" + "\n".join(result.missing[:10])
+    if result.unhashed:
+        message += f"\n{len(result.unhashed)} archivos sin hash registrado (descargados con una versión anterior)."
+    return message
@@ -0,0 +1,202 @@
+import os
+import threading
+from collections import Counter, defaultdict
+
+PART_SUFFIX = ".part"
+DEFAULT_BLOCK_SIZE = 256 * 1024  # bytes pedidos al socket en cada lectura de RETR
+CHECKPOINT_BYTES = 64 * 1024 * 1024  # cada cuántos bytes se sincroniza y se registra el avance
+SYNC_BATCH_FILES = 64  # archivos terminados de una carpeta que se confirman juntos
+
+# fdatasync no sincroniza metadatos como la fecha de acceso; no existe en Windows ni macOS
+_datasync = getattr(os, "fdatasync", os.fsync)
+
+
+def part_path(local_path):
+    """
+    Devuelve la ruta del archivo temporal donde se descarga local_path.
+    """
+    return local_path + PART_SUFFIX
+
+
+def preallocate(file, size):
+    """
+    Reserva size bytes en disco para el archivo, si el sistema lo permite.
+
+    Evita que el archivo se fragmente al crecer de a bloques. Es sólo una
+    optimización: si el sistema de archivos no lo soporta, se sigue sin reservar.
+    """
+    if not size or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(file.fileno(), 0, size)
+    except OSError:
+        pass
+
+
+def fsync_path(path, directory=False):
+    """
+    Sincroniza con el disco un archivo o, con directory=True, un directorio.
+
+    En Windows no se pueden abrir directorios: ahí se omite.
+    """
+    if directory and os.name == "nt":
+        return
+    if directory:
+        fd = os.open(path, os.O_RDONLY)
+        sync = os.fsync
+    else:
+        # En Windows, fsync necesita un descriptor abierto para escritura
+        fd = os.open(path, os.O_RDWR)
+        sync = _datasync
+    try:
+        sync(fd)
+    finally:
+        os.close(fd)
+
+
+class PartFile:
+    """
+    Archivo temporal (.part) en el que se escribe una descarga en curso.
+
+    Se abre sin buffer de Python, así que cada bloque recibido se escribe
+    directamente, sin copiarlo a un buffer intermedio. Si se conoce el
+    tamaño final, el espacio se reserva al abrir. Como el archivo reservado
+    ya tiene el tamaño final, el avance real no se deduce de su tamaño: se
+    informa con on_checkpoint (tras sincronizar lo escrito) cada
+    checkpoint_bytes, y al cerrar se recorta el archivo a lo escrito.
+    """
+
+    def __init__(self, local_path, offset=0, size=None, on_checkpoint=None, checkpoint_bytes=CHECKPOINT_BYTES):
+        """
+        Args:
+            local_path: Ruta final del archivo (el temporal es local_path + ".part").
+            offset: Bytes ya descargados en el temporal, desde donde se continúa.
+            size: Tamaño final, si se conoce, para reservar el espacio.
+            on_checkpoint: Función opcional que recibe los bytes escritos y ya sincronizados.
+            checkpoint_bytes: Bytes entre llamadas a on_checkpoint.
+        """
+        self.path = part_path(local_path)
+        self.offset = offset
+        self.size = size
+        self.position = offset
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_bytes = checkpoint_bytes
+        self._last_checkpoint = offset
+        self._file = None
+
+    def __enter__(self):
+        if self.offset:
+            self._file = open(self.path, "r+b", buffering=0)
+            self._file.seek(self.offset)
+        else:
+            self._file = open(self.path, "wb", buffering=0)
+        preallocate(self._file, self.size)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            # Quitar el espacio reservado que no se llegó a escribir
+            self._file.truncate(self.position)
+        finally:
+            self._file.close()
+
+    def write(self, block):
+        view = memoryview(block)
+        while view:
+            written = self._file.write(view)
+            view = view[written:]
+        self.position += len(block)
+        if self.on_checkpoint is not None and self.position - self._last_checkpoint >= self.checkpoint_bytes:
+            _datasync(self._file.fileno())
+            self._last_checkpoint = self.position
+            self.on_checkpoint(self.position)
+
+
+class FolderSync:
+    """
+    Confirma por carpeta los archivos .part ya descargados y verificados.
+
+    Un archivo terminado no se sincroniza ni se renombra en el momento: se
+    acumula con los demás de su carpeta. Cuando la carpeta no tiene más
+    archivos pendientes (o el lote llega a batch_size) se hace fsync de cada
+    temporal, se renombran todos a su nombre final y se sincroniza el
+    directorio una sola vez. Un corte nunca deja un archivo incompleto con
+    su nombre real, y el disco no se detiene a sincronizar tras cada archivo.
+    """
+
+    def __init__(self, local_paths, on_commit, on_error=None, batch_size=SYNC_BATCH_FILES, fsync=True):
+        """
+        Args:
+            local_paths: Rutas finales de todos los archivos a descargar.
+            on_commit: Función (ruta_local, datos) llamada tras confirmar cada archivo.
+            on_error: Función opcional (ruta_local, datos, error) si no se pudo confirmar.
+            batch_size: Archivos terminados de una carpeta que se confirman juntos.
+            fsync: Si es False, sólo se renombra (más rápido, sin garantías ante un corte de luz).
+        """
+        self.on_commit = on_commit
+        self.on_error = on_error
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+        self._remaining = Counter(os.path.dirname(path) for path in local_paths)
+        self._pending = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, local_path, data=None):
+        """
+        Registra un archivo terminado; confirma su carpeta si corresponde.
+        """
+        folder = os.path.dirname(local_path)
+        with self._lock:
+            self._pending[folder].append((local_path, data))
+            self._remaining[folder] -= 1
+            batch = self._take(folder, len(self._pending[folder]) >= self.batch_size)
+        self._commit(folder, batch)
+
+    def skip(self, local_path):
+        """
+        Descuenta un archivo que no se va a confirmar (ya estaba completo o falló).
+        """
+        folder = os.path.dirname(local_path)
+        with self._lock:
+            self._remaining[folder] -= 1
+            batch = self._take(folder)
+        self._commit(folder, batch)
+
+    def flush(self):
+        """
+        Confirma todos los archivos terminados (al finalizar o cancelar).
+        """
+        with self._lock:
+            batches = list(self._pending.items())
+            self._pending.clear()
+        for folder, batch in batches:
+            self._commit(folder, batch)
+
+    def _take(self, folder, force=False):
+        # Se llama con el lock tomado
+        if not self._pending.get(folder) or not (force or self._remaining[folder] <= 0):
+            return []
+        return self._pending.pop(folder)
+
+    def _commit(self, folder, batch):
+        if not batch:
+            return
+        committed = []
+        for local_path, data in batch:
+            try:
+                if self.fsync:
+                    fsync_path(part_path(local_path))
+                os.replace(part_path(local_path), local_path)
+            except OSError as e:
+                if self.on_error is not None:
+                    self.on_error(local_path, data, e)
+                continue
+            committed.append((local_path, data))
+
+        if self.fsync and committed:
+            try:
+                fsync_path(folder, directory=True)
+            except OSError as e:
+                print(f"No se pudo sincronizar la carpeta {folder}: {e}")
+        for local_path, data in committed:
+            self.on_commit(local_path, data)
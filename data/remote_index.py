@@ -0,0 +1,226 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from data.ftp_listing import join_remote, list_directory
+
+DEFAULT_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".gestor_carpetas", "remote_index.sqlite")
+DEFAULT_MAX_AGE = 24 * 3600  # segundos antes de volver a listar una carpeta aunque su fecha no cambie
+
+# Resumen de una carpeta del índice; files y bytes son None si todavía no se recorrió
+FolderSummary = namedtuple("FolderSummary", ["files", "bytes", "modify"])
+
+# Resultado de una actualización: directorios listados y subárboles sin cambios
+RefreshStats = namedtuple("RefreshStats", ["listed", "skipped"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    server TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT,
+    modify TEXT,
+    file_count INTEGER,
+    total_bytes INTEGER,
+    listed_at REAL,
+    PRIMARY KEY (server, path)
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (server, parent);
+"""
+
+
+def server_key(ftp_config):
+    """
+    Identifica un servidor en el índice (usuario, host y puerto).
+    """
+    return f"{ftp_config.get('user', '')}@{ftp_config['host']}:{ftp_config.get('port', 21)}"
+
+
+def normalize_path(path):
+    path = "/" + path.strip("/")
+    return path
+
+
+def subtree_prefix(path):
+    return "/" if path == "/" else f"{path}/"
+
+
+class RemoteIndex:
+    """
+    Índice local (SQLite) del árbol de carpetas del FTP.
+
+    Por cada directorio guarda la fecha de modificación informada por su
+    carpeta padre, la cantidad de archivos y los bytes que contiene
+    directamente. El tamaño de una carpeta es la suma de su subárbol.
+
+    La actualización es incremental: un directorio cuya fecha no cambió
+    desde el último recorrido (y que se listó hace menos de max_age) no se
+    vuelve a listar, y se conserva su subárbol. Como muchos servidores sólo
+    cambian la fecha de la carpeta que contiene el archivo modificado, un
+    cambio profundo puede tardar hasta max_age en verse; force=True recorre
+    todo de nuevo.
+    """
+
+    def __init__(self, server, path=DEFAULT_INDEX_FILE):
+        """
+        Args:
+            server: Clave del servidor (ver server_key).
+            path: Archivo SQLite donde se guarda el índice.
+        """
+        self.server = server
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def has_directory(self, path):
+        """
+        Indica si el directorio ya se listó al menos una vez.
+        """
+        rows = self._query(
+            "SELECT listed_at FROM directories WHERE server = ? AND path = ?",
+            (self.server, normalize_path(path)),
+        )
+        return bool(rows) and rows[0][0] is not None
+
+    def folders(self, base_path):
+        """
+        Devuelve los nombres de las carpetas dentro de base_path según el índice.
+        """
+        base_path = normalize_path(base_path)
+        rows = self._query(
+            "SELECT path FROM directories WHERE server = ? AND parent = ?",
+            (self.server, base_path),
+        )
+        return sorted(path[len(subtree_prefix(base_path)):] for path, in rows)
+
+    def folder_summaries(self, base_path):
+        """
+        Devuelve un diccionario carpeta -> FolderSummary con el total de su subárbol.
+
+        Las carpetas que todavía no se recorrieron tienen files y bytes en None.
+        """
+        base_path = normalize_path(base_path)
+        prefix = subtree_prefix(base_path)
+        rows = self._query(
+            "SELECT path, modify, file_count, total_bytes FROM directories "
+            "WHERE server = ? AND substr(path, 1, ?) = ?",
+            (self.server, len(prefix), prefix),
+        )
+
+        totals = {}
+        for path, modify, file_count, total_bytes in rows:
+            name, _, rest = path[len(prefix):].partition("/")
+            files, size, folder_modify = totals.get(name, (0, 0, None))
+            if not rest:
+                folder_modify = modify
+                if file_count is None:
+                    files = size = None
+            if files is not None and file_count is not None:
+                files += file_count
+                size += total_bytes or 0
+            totals[name] = (files, size, folder_modify)
+        return {name: FolderSummary(*values) for name, values in totals.items()}
+
+    def refresh(self, ftp, base_path, force=False, max_depth=None, max_age=DEFAULT_MAX_AGE, on_directory=None):
+        """
+        Actualiza el índice recorriendo el árbol remoto desde base_path.
+
+        Args:
+            ftp: Conexión FTP.
+            base_path: Directorio raíz a indexar (siempre se vuelve a listar).
+            force: Si es True, lista todos los directorios aunque no hayan cambiado.
+            max_depth: Profundidad máxima a listar. Con 0 sólo se lista
+                base_path (una orden), y las carpetas nuevas quedan pendientes
+                de recorrer.
+            max_age: Segundos tras los cuales un directorio se lista aunque
+                su fecha no haya cambiado.
+            on_directory: Función opcional (directorios_listados, ruta).
+
+        Returns:
+            RefreshStats.
+        """
+        base_path = normalize_path(base_path)
+        now = time.time()
+        listed = 0
+        skipped = 0
+
+        # Recorrido en profundidad con una pila: (ruta, fecha, padre, profundidad)
+        stack = [(base_path, self._stored_modify(base_path), None, 0)]
+        while stack:
+            path, modify, parent, depth = stack.pop()
+            entries = list_directory(ftp, path)
+            listed += 1
+            if on_directory is not None:
+                on_directory(listed, path)
+
+            files = [entry for entry in entries if entry.type == "file"]
+            directories = {join_remote(path, entry.name): entry for entry in entries if entry.type == "dir"}
+            stored_children = self._children(path)
+
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.server, path, parent, modify, len(files),
+                     sum(entry.size or 0 for entry in files), now),
+                )
+                for child in stored_children:
+                    if child not in directories:
+                        self._delete_subtree(child)
+
+            for child, entry in sorted(directories.items(), reverse=True):
+                stored = stored_children.get(child)
+                if max_depth is not None and depth >= max_depth:
+                    if stored is None:
+                        # Carpeta nueva: se registra sin contenido hasta recorrerla
+                        with self._lock, self._connection:
+                            self._connection.execute(
+                                "INSERT INTO directories (server, path, parent) VALUES (?, ?, ?)",
+                                (self.server, child, path),
+                            )
+                    continue
+
+                modify_known = entry.modify is not None and stored is not None
+                if (not force and modify_known and stored[0] == entry.modify
+                        and stored[1] is not None and now - stored[1] < max_age):
+                    skipped += 1
+                    continue
+                stack.append((child, entry.modify, path, depth + 1))
+
+        return RefreshStats(listed, skipped)
+
+    def _stored_modify(self, path):
+        rows = self._query(
+            "SELECT modify FROM directories WHERE server = ? AND path = ?", (self.server, path)
+        )
+        return rows[0][0] if rows else None
+
+    def _children(self, path):
+        """
+        Devuelve {ruta: (fecha, listado_en)} de los subdirectorios registrados.
+        """
+        rows = self._query(
+            "SELECT path, modify, listed_at FROM directories WHERE server = ? AND parent = ?",
+            (self.server, path),
+        )
+        return {child: (modify, listed_at) for child, modify, listed_at in rows}
+
+    def _delete_subtree(self, path):
+        # Se llama con el lock tomado
+        prefix = subtree_prefix(path)
+        self._connection.execute(
+            "DELETE FROM directories WHERE server = ? AND (path = ? OR substr(path, 1, ?) = ?)",
+            (self.server, path, len(prefix), prefix),
+        )
@@ -0,0 +1,306 @@
+import json
+import os
+import random
+import threading
+import time
+
+DEFAULT_QUEUE_FILE = os.path.join(os.path.expanduser("~"), ".gestor_carpetas", "sheet_queue.json")
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_DELAY = 2.0  # segundos para juntar varias filas en un mismo envío
+INITIAL_BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+
+
+def is_retryable(error):
+    """
+    Indica si un error de escritura es transitorio.
+
+    Se reintentan las cuotas excedidas (429), los errores del servidor (5xx)
+    y los fallos de red. Los demás errores de la API (400, 403, 404) se
+    consideran permanentes.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        return True
+    return status == 429 or status >= 500
+
+
+class SheetWriteQueue:
+    """
+    Cola de escritura diferida hacia Google Sheets.
+
+    Las filas se guardan primero en un archivo JSON local, de modo que una
+    asignación no se pierde si la API está lenta, sin cuota o si se cierra la
+    aplicación. Un hilo en segundo plano agrupa las filas pendientes por hoja
+    y las envía con un solo append_rows, reintentando con retroceso
+    exponencial cuando la API devuelve un error transitorio.
+
+    El retroceso es por hoja: mientras una hoja espera su reintento, se
+    siguen enviando las de las demás. Lo que falla con un error permanente
+    (por ejemplo, 404 porque se borró la hoja o 403 sin permisos) pasa a la
+    lista de descartados (dead_letters), que se guarda en el mismo archivo
+    y se puede volver a encolar con retry_dead_letters tras corregir el
+    problema; así no bloquea al resto de la cola.
+
+    Además de filas nuevas, la cola guarda actualizaciones de la fila de una
+    carpeta (por ejemplo, al devolverla al FTP). Un lote puede mezclar
+    ambas: primero se agregan las filas y después se aplican las
+    actualizaciones, cada grupo con una sola llamada a la API.
+
+    La escritura real se delega en writer(sheet_url, rows) y
+    updater(sheet_url, updates), lo que permite probar la cola con una hoja
+    falsa en memoria:
+
+        queue = SheetWriteQueue(lambda url, rows: fake_worksheet.append_rows(rows), path)
+    """
+
+    def __init__(self, writer, path=DEFAULT_QUEUE_FILE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_delay=DEFAULT_FLUSH_DELAY, on_error=None, updater=None):
+        """
+        Args:
+            writer: Función (sheet_url, filas) que agrega filas a la hoja.
+            updater: Función opcional (sheet_url, actualizaciones) que
+                modifica filas existentes; cada actualización es un
+                diccionario {"folder": carpeta, "values": {encabezado: valor}}.
+        """
+        self.writer = writer
+        self.updater = updater
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+        self.on_error = on_error
+        self.last_error = None
+        self._pending = []
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._dead = []
+        self._backoffs = {}  # hoja -> segundos del último retroceso
+        self._retry_at = {}  # hoja -> momento (time.monotonic) desde el que se puede reintentar
+        self.load()
+
+    def load(self):
+        """
+        Recupera las filas que quedaron pendientes en disco.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            self._pending = data.get("pending", [])
+            self._dead = data.get("dead", [])
+        except (json.JSONDecodeError, AttributeError) as e:
+            print(f"No se pudo leer la cola de la planilla {self.path}: {e}")
+            self._pending = []
+            self._dead = []
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"pending": self._pending, "dead": self._dead}, file, indent=1)
+        os.replace(temp_path, self.path)
+
+    @property
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    @property
+    def dead_count(self):
+        with self._condition:
+            return len(self._dead)
+
+    @property
+    def dead_letters(self):
+        """
+        Operaciones descartadas por un error permanente, cada una con "error" y "failed_at".
+        """
+        with self._condition:
+            return [dict(item) for item in self._dead]
+
+    def retry_dead_letters(self):
+        """
+        Vuelve a encolar las operaciones descartadas (por ejemplo, tras corregir los permisos).
+
+        Returns:
+            Cantidad de operaciones encoladas de nuevo.
+        """
+        with self._condition:
+            items = [
+                {key: value for key, value in item.items() if key not in ("error", "failed_at")}
+                for item in self._dead
+            ]
+            self._dead = []
+            self._pending.extend(items)
+            for item in items:
+                self._backoffs.pop(item["sheet_url"], None)
+                self._retry_at.pop(item["sheet_url"], None)
+            self._save()
+            self._condition.notify()
+            return len(items)
+
+    def retry_delay(self):
+        """
+        Segundos hasta que alguna hoja con operaciones pendientes se pueda
+        reintentar (0 si ya hay una lista), o None si la cola está vacía.
+        """
+        with self._condition:
+            if not self._pending:
+                return None
+            now = time.monotonic()
+            return max(0.0, min(self._retry_at.get(item["sheet_url"], now) for item in self._pending) - now)
+
+    def enqueue(self, sheet_url, row):
+        """
+        Agrega una fila a la cola y la guarda en disco antes de volver.
+        """
+        with self._condition:
+            self._pending.append({"sheet_url": sheet_url, "row": list(row)})
+            self._save()
+            self._condition.notify()
+
+    def enqueue_update(self, sheet_url, folder, values):
+        """
+        Agrega a la cola la actualización de la fila de una carpeta y la guarda en disco.
+
+        Args:
+            values: Diccionario encabezado de columna -> nuevo valor.
+        """
+        if self.updater is None:
+            raise ValueError("La cola no tiene una función para actualizar filas.")
+        with self._condition:
+            self._pending.append({"sheet_url": sheet_url, "update": {"folder": folder, "values": dict(values)}})
+            self._save()
+            self._condition.notify()
+
+    def flush(self):
+        """
+        Envía un lote de filas y actualizaciones pendientes de una misma hoja.
+
+        Se toma la primera hoja que no esté esperando un reintento. Si el
+        envío falla con un error transitorio, esa hoja se deja de lado
+        durante su retroceso; si el error es permanente, lo que falló pasa a
+        dead_letters. En los dos casos la próxima llamada sigue con las
+        demás hojas.
+
+        Returns:
+            Cantidad de operaciones enviadas (0 si no había ninguna lista para enviar).
+
+        Raises:
+            Exception: el error de la API si el envío falló.
+        """
+        with self._condition:
+            now = time.monotonic()
+            sheet_url = next(
+                (item["sheet_url"] for item in self._pending if self._retry_at.get(item["sheet_url"], now) <= now),
+                None,
+            )
+            if sheet_url is None:
+                return 0
+            batch = [item for item in self._pending if item["sheet_url"] == sheet_url][:self.batch_size]
+
+        rows = [item for item in batch if "row" in item]
+        updates = [item for item in batch if "update" in item]
+        for items, send in ((rows, self._send_rows), (updates, self._send_updates)):
+            if not items:
+                continue
+            try:
+                send(sheet_url, items)
+            except Exception as e:
+                self._failed(sheet_url, items, e)
+                raise
+            # Se quitan antes de actualizar: si eso falla, las filas no se agregan dos veces
+            self._discard(items)
+
+        with self._condition:
+            self._backoffs.pop(sheet_url, None)
+            self._retry_at.pop(sheet_url, None)
+        return len(batch)
+
+    def _send_rows(self, sheet_url, items):
+        self.writer(sheet_url, [item["row"] for item in items])
+
+    def _send_updates(self, sheet_url, items):
+        self.updater(sheet_url, [item["update"] for item in items])
+
+    def _failed(self, sheet_url, items, error):
+        """
+        Registra un envío fallido: retroceso de la hoja o, si es permanente, descarte.
+        """
+        with self._condition:
+            if is_retryable(error):
+                backoff = min(max(self._backoffs.get(sheet_url, 0.0) * 2, INITIAL_BACKOFF), MAX_BACKOFF)
+                self._backoffs[sheet_url] = backoff
+                self._retry_at[sheet_url] = time.monotonic() + backoff * random.uniform(0.8, 1.2)
+                return
+            failed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            sent = {id(item) for item in items}
+            self._pending = [item for item in self._pending if id(item) not in sent]
+            self._dead.extend(dict(item, error=str(error), failed_at=failed_at) for item in items)
+            self._save()
+
+    def _discard(self, items):
+        with self._condition:
+            sent = {id(item) for item in items}
+            self._pending = [item for item in self._pending if id(item) not in sent]
+            self._save()
+
+    def start(self):
+        """
+        Inicia el hilo que vacía la cola en segundo plano.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Detiene el hilo tras un último intento de envío. Lo que no se envíe
+        queda en disco para la próxima ejecución.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping and not self._pending:
+                    return
+                stopping = self._stopping
+
+            # Esperar un poco para juntar varias filas en un solo envío
+            if not stopping:
+                time.sleep(self.flush_delay)
+
+            # Enviar todas las hojas listas; las que fallan quedan esperando su reintento
+            while True:
+                try:
+                    if not self.flush():
+                        break
+                except Exception as e:
+                    self.last_error = e
+                    if self.on_error is not None:
+                        self.on_error(e)
+                    retryable = is_retryable(e)
+                    print(f"Error al escribir en la planilla ({'se reintentará' if retryable else 'descartado'}): {e}")
+            with self._condition:
+                if not self._retry_at:
+                    self.last_error = None
+                if self._stopping:
+                    return
+                # Esperar al próximo reintento o a una operación nueva
+                delay = self.retry_delay()
+                if delay:
+                    self._condition.wait(delay)
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+
+MANIFEST_FILE_NAME = ".ftp_manifest.json"
+
+
+class SyncManifest:
+    """
+    Manifiesto local de una carpeta descargada.
+
+    Guarda, para cada archivo, el tamaño y la fecha de modificación remotos
+    que tenía cuando se descargó, y el SHA-256 calculado durante la
+    descarga. En modo espejo se compara con el listado del servidor para
+    transferir sólo los archivos nuevos o modificados; el hash permite
+    verificar más tarde que los archivos locales siguen intactos.
+    """
+
+    def __init__(self, local_directory):
+        self.local_directory = local_directory
+        self.path = os.path.join(local_directory, MANIFEST_FILE_NAME)
+        self.files = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        Lee el manifiesto desde disco, si existe.
+        """
+        self.files = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.files = json.load(file).get("files", {})
+        except (json.JSONDecodeError, AttributeError):
+            print(f"Manifiesto dañado en {self.path}, se descargará todo de nuevo.")
+            self.files = {}
+
+    def save(self):
+        """
+        Guarda el manifiesto de forma atómica (archivo temporal y renombrado).
+        """
+        with self._lock:
+            data = {"files": dict(self.files)}
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def is_unchanged(self, relative_path, entry):
+        """
+        Indica si el archivo local coincide con la versión remota registrada.
+        """
+        record = self.files.get(relative_path)
+        if record is None or entry.size is None or entry.modify is None:
+            return False
+        if record.get("size") != entry.size or record.get("modify") != entry.modify:
+            return False
+
+        local_path = os.path.join(self.local_directory, *relative_path.split("/"))
+        return os.path.exists(local_path) and os.path.getsize(local_path) == entry.size
+
+    def update(self, relative_path, entry, sha256=None, local_path=None):
+        """
+        Registra un archivo recién descargado (o subido), con su hash si se conoce.
+
+        Si se indica local_path se guarda también la fecha de modificación
+        del archivo local, para saber después si se editó sin volver a leerlo.
+        """
+        record = {"size": entry.size, "modify": entry.modify}
+        if sha256:
+            record["sha256"] = sha256
+        if local_path is not None:
+            try:
+                record["local_mtime_ns"] = os.stat(local_path).st_mtime_ns
+            except OSError:
+                pass
+        with self._lock:
+            self.files[relative_path] = record
+
+    def remove(self, relative_path):
+        with self._lock:
+            self.files.pop(relative_path, None)
+
+
+def relative_path_of(local_path, local_directory):
+    """
+    Devuelve la ruta relativa con "/" como separador, usada como clave.
+    """
+    return os.path.relpath(local_path, local_directory).replace(os.sep, "/")
+
+
+def plan_sync(files, manifest, local_directory):
+    """
+    Separa los archivos remotos en pendientes y sin cambios.
+
+    Args:
+        files: Lista de tuplas (ruta_remota, ruta_local, entrada).
+        manifest: SyncManifest de la carpeta local.
+        local_directory: Carpeta local descargada.
+
+    Returns:
+        Tupla (pendientes, sin_cambios), ambas listas con el formato de files.
+    """
+    pending = []
+    unchanged = []
+    for item in files:
+        relative_path = relative_path_of(item[1], local_directory)
+        if manifest.is_unchanged(relative_path, item[2]):
+            unchanged.append(item)
+        else:
+            pending.append(item)
+    return pending, unchanged
+
+
+def delete_extraneous(files, manifest, local_directory):
+    """
+    Borra los archivos locales que ya no existen en el servidor.
+
+    Sólo se borran archivos registrados en el manifiesto, nunca archivos
+    creados a mano en la carpeta local.
+
+    Returns:
+        Lista de rutas relativas eliminadas.
+    """
+    remote_paths = {relative_path_of(item[1], local_directory) for item in files}
+    removed = []
+    for relative_path in list(manifest.files):
+        if relative_path in remote_paths:
+            continue
+        local_path = os.path.join(local_directory, *relative_path.split("/"))
+        try:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+        except OSError as e:
+            print(f"No se pudo eliminar {local_path}: {e}")
+            continue
+        manifest.remove(relative_path)
+        removed.append(relative_path)
+    return removed
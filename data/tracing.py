@@ -0,0 +1,364 @@
+import cProfile
+import functools
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "gestor_carpetas"
+METRICS_INTERVAL = 10.0  # segundos mínimos entre escrituras del archivo de métricas
+
+_tracer = None
+_local = threading.local()
+
+
+class _NullSpan:
+    """
+    Tramo que no mide nada: es lo que devuelve span() con el trazado desactivado.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Tramo medido de una fase (conexión, listado, RETR, planilla...).
+
+    Se usa como context manager; al salir se registra en el Tracer con su
+    duración, el hilo, el tramo que lo contiene y, si terminó con una
+    excepción, el error.
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.id = None
+        self.parent = None
+        self.start = None
+        self.duration = None
+        self._started = None
+
+    def set(self, **attributes):
+        """
+        Agrega atributos conocidos durante el tramo (por ejemplo, los bytes transferidos).
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = _span_stack()
+        self.parent = stack[-1].id if stack else None
+        self.id = next(self.tracer.ids)
+        stack.append(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self._started
+        stack = _span_stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        error = f"{exc_type.__name__}: {exc_value}" if exc_type is not None else None
+        self.tracer.record(self, error)
+        return False
+
+
+class Tracer:
+    """
+    Registra los tramos medidos y los exporta.
+
+    Cada tramo terminado se agrega como una línea JSON a log_path. Además se
+    acumulan por fase la cantidad, el tiempo total, el máximo y los errores,
+    que se escriben en metrics_path en el formato de texto de Prometheus
+    (para el textfile collector de node_exporter). El archivo de métricas se
+    reescribe entero, con un temporal y un renombrado, a lo sumo cada
+    METRICS_INTERVAL segundos y al cerrar.
+    """
+
+    def __init__(self, log_path=None, metrics_path=None, profile_dir=None):
+        """
+        Args:
+            log_path: Archivo JSON-lines donde se agregan los tramos.
+            metrics_path: Archivo .prom con las métricas acumuladas.
+            profile_dir: Carpeta donde se guardan los perfiles de cProfile de
+                cada análisis o descarga (ver profiled).
+        """
+        self.log_path = log_path
+        self.metrics_path = metrics_path
+        self.profile_dir = profile_dir
+        self.ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._log = None
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            self._log = open(log_path, "a", encoding="utf-8")
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self._metrics = {}  # fase -> [cantidad, segundos, máximo, errores]
+        self._metrics_written = 0.0
+
+    def record(self, span, error=None):
+        line = {
+            "name": span.name,
+            "start": round(span.start, 6),
+            "duration_ms": round(span.duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "id": span.id,
+            "parent": span.parent,
+        }
+        if span.attributes:
+            line["attributes"] = span.attributes
+        if error is not None:
+            line["error"] = error
+
+        with self._lock:
+            metric = self._metrics.setdefault(span.name, [0, 0.0, 0.0, 0])
+            metric[0] += 1
+            metric[1] += span.duration
+            metric[2] = max(metric[2], span.duration)
+            if error is not None:
+                metric[3] += 1
+            if self._log is not None:
+                self._log.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+                self._log.flush()
+            write_metrics = (
+                self.metrics_path is not None and time.monotonic() - self._metrics_written >= METRICS_INTERVAL
+            )
+        if write_metrics:
+            self.write_metrics()
+
+    def metrics_text(self):
+        """
+        Devuelve las métricas acumuladas en el formato de texto de Prometheus.
+        """
+        with self._lock:
+            metrics = {name: list(values) for name, values in self._metrics.items()}
+
+        def label(name):
+            escaped = name.replace("\\", "\\\\").replace('"', '\\"')
+            return f'{{span="{escaped}"}}'
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_seconds Duración de cada fase medida.",
+            f"# TYPE {METRIC_PREFIX}_span_seconds summary",
+        ]
+        for name in sorted(metrics):
+            count, total, _, _ = metrics[name]
+            lines.append(f"{METRIC_PREFIX}_span_seconds_count{label(name)} {count}")
+            lines.append(f"{METRIC_PREFIX}_span_seconds_sum{label(name)} {total:.6f}")
+        lines += [
+            f"# HELP {METRIC_PREFIX}_span_max_seconds Duración máxima de cada fase.",
+            f"# TYPE {METRIC_PREFIX}_span_max_seconds gauge",
+        ]
+        lines += [f"{METRIC_PREFIX}_span_max_seconds{label(name)} {metrics[name][2]:.6f}" for name in sorted(metrics)]
+        lines += [
+            f"# HELP {METRIC_PREFIX}_span_errors_total Fases que terminaron con un error.",
+            f"# TYPE {METRIC_PREFIX}_span_errors_total counter",
+        ]
+        lines += [f"{METRIC_PREFIX}_span_errors_total{label(name)} {metrics[name][3]}" for name in sorted(metrics)]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self):
+        """
+        Reescribe el archivo de métricas (de una vez, para que nunca se lea a medias).
+        """
+        if self.metrics_path is None:
+            return
+        with self._lock:
+            self._metrics_written = time.monotonic()
+        temp_path = f"{self.metrics_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.metrics_path)), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(self.metrics_text())
+            os.replace(temp_path, self.metrics_path)
+        except OSError as e:
+            print(f"No se pudieron escribir las métricas en {self.metrics_path}: {e}")
+
+    def close(self):
+        self.write_metrics()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def _span_stack():
+    stack = getattr(_local, "spans", None)
+    if stack is None:
+        stack = _local.spans = []
+    return stack
+
+
+def enable_tracing(log_path=None, metrics_path=None, profile_dir=None):
+    """
+    Activa el trazado para toda la aplicación (reemplaza al anterior, si había).
+
+    Returns:
+        El Tracer activo.
+    """
+    global _tracer
+    disable_tracing()
+    _tracer = Tracer(log_path, metrics_path, profile_dir)
+    return _tracer
+
+
+def disable_tracing():
+    """
+    Desactiva el trazado, escribiendo las métricas pendientes.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+
+def configure_tracing(config):
+    """
+    Activa el trazado según las claves trace_log, trace_metrics y profile_dir
+    de la configuración; si no hay ninguna, lo deja desactivado.
+    """
+    paths = [config.get(key) for key in ("trace_log", "trace_metrics", "profile_dir")]
+    if not any(paths):
+        disable_tracing()
+        return None
+    return enable_tracing(*(os.path.expanduser(path) if path else None for path in paths))
+
+
+def tracing_enabled():
+    return _tracer is not None
+
+
+def span(name, **attributes):
+    """
+    Mide una fase:
+
+        with span("ftp.connect", host=host):
+            ...
+
+    Con el trazado desactivado devuelve un tramo vacío compartido, así que
+    el costo es una llamada a función.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, attributes)
+
+
+def traced(name):
+    """
+    Decorador que mide cada llamada a la función como un tramo con ese nombre.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            with Span(tracer, name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _ProfileSession:
+    """
+    Perfil de una ejecución completa, incluidos los hilos que la ayudan.
+
+    cProfile sólo mide el hilo donde se activa, así que cada hilo de
+    transferencia usa su propio Profile y al terminar lo suma a la sesión.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = None
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def dump(self):
+        with self._lock:
+            if self.stats is not None:
+                self.stats.dump_stats(self.path)
+
+
+def _start_profile():
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError as e:
+        # Desde Python 3.12 sólo puede haber un perfilador activo a la vez
+        print(f"No se pudo activar cProfile: {e}")
+        return None
+    return profile
+
+
+@contextmanager
+def profiled(kind):
+    """
+    Guarda un perfil de cProfile de lo que se ejecuta dentro del bloque.
+
+    Sólo actúa si el trazado está activo con profile_dir; el perfil se
+    guarda como <profile_dir>/<kind>-<fecha>.prof y se puede ver con
+    "python -m pstats" o snakeviz. Los hilos lanzados con profile_thread
+    dentro del bloque se suman al mismo perfil.
+    """
+    tracer = _tracer
+    if tracer is None or not tracer.profile_dir or getattr(_local, "profile", None) is not None:
+        yield
+        return
+
+    path = os.path.join(tracer.profile_dir, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+    session = _ProfileSession(path)
+    profile = _start_profile()
+    _local.profile = session
+    try:
+        yield
+    finally:
+        _local.profile = None
+        if profile is not None:
+            profile.disable()
+            session.add(profile)
+        session.dump()
+        print(f"Perfil guardado en {path}")
+
+
+def profile_thread(function):
+    """
+    Envuelve la función de un hilo para que se sume al perfil en curso (ver profiled).
+
+    Sin perfil activo en el hilo que la llama, devuelve la función sin cambios.
+    """
+    session = getattr(_local, "profile", None)
+    if session is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = _start_profile()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+                session.add(profile)
+    return wrapper
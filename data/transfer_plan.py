@@ -0,0 +1,184 @@
+import heapq
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_CONNECTION_THROUGHPUT = 4 * 1024 * 1024  # bytes/s por conexión hasta medir una transferencia
+DEFAULT_FILE_OVERHEAD = 0.05  # segundos fijos por archivo (orden, conexión de datos, respuesta final)
+MIN_LEARN_BYTES = 1024 * 1024  # transferencias más chicas no alcanzan para medir la velocidad
+LEARNING_RATE = 0.5  # peso de la última medición en la velocidad estimada
+
+# Archivo del plan: item es el elemento original de la lista de trabajo;
+# start y end son los segundos previstos desde el inicio en su conexión.
+PlannedFile = namedtuple("PlannedFile", ["item", "size", "cost", "connection", "start", "end"])
+
+_throughputs = {}  # servidor -> bytes/s por conexión medidos en transferencias anteriores
+_throughputs_lock = threading.Lock()
+
+
+def estimated_throughput(key, default=DEFAULT_CONNECTION_THROUGHPUT):
+    """
+    Velocidad por conexión medida con ese servidor, o default si todavía no hay medición.
+    """
+    with _throughputs_lock:
+        return _throughputs.get(key, default)
+
+
+def learn_throughput(key, plan):
+    """
+    Ajusta la velocidad estimada del servidor con lo que tardó un plan ya terminado.
+
+    Del tiempo de cada conexión se descuenta el costo fijo por archivo; lo
+    que queda se considera tiempo de transferencia de datos.
+    """
+    if plan.actual_seconds is None or plan.total_bytes < MIN_LEARN_BYTES:
+        return
+    busy = sum(plan.connection_seconds) - len(plan.files) * plan.file_overhead
+    if busy <= 0:
+        return
+    measured = plan.total_bytes / busy
+    with _throughputs_lock:
+        previous = _throughputs.get(key)
+        _throughputs[key] = measured if previous is None else previous + LEARNING_RATE * (measured - previous)
+
+
+class TransferPlan:
+    """
+    Orden de transferencia de una carpeta y su duración prevista.
+
+    Se arma con plan_transfers: los archivos más grandes van primero y cada
+    uno se asigna a la conexión que queda libre antes (LPT, "longest
+    processing time first"). Las conexiones del motor toman los archivos de
+    una cola en ese orden, así que el reparto real es el mismo aunque las
+    duraciones no sean exactas: los archivos chicos quedan al final y
+    rellenan las conexiones que terminan antes, en lugar de que un archivo
+    enorme encontrado último demore toda la carpeta.
+
+    Al ejecutarse se registran el inicio, el fin de cada conexión y el fin
+    total, para comparar lo previsto con lo real (report y summary).
+    """
+
+    def __init__(self, files, connections, throughput, file_overhead, name_of=str):
+        self.files = files
+        self.name_of = name_of
+        self.connections = connections
+        self.throughput = throughput
+        self.file_overhead = file_overhead
+        self.loads = [0.0] * connections  # segundos previstos por conexión
+        for planned in files:
+            self.loads[planned.connection] = max(self.loads[planned.connection], planned.end)
+        self.predicted_seconds = max(self.loads, default=0.0)
+        self.started = None
+        self.finished = None
+        self.connection_seconds = []  # segundos reales de cada conexión, en el orden en que terminaron
+        self._lock = threading.Lock()
+
+    @property
+    def order(self):
+        """
+        Elementos de la lista de trabajo en el orden en que conviene transferirlos.
+        """
+        return [planned.item for planned in self.files]
+
+    @property
+    def total_bytes(self):
+        return sum(planned.size for planned in self.files)
+
+    @property
+    def actual_seconds(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def start(self):
+        self.started = time.monotonic()
+
+    def connection_finished(self):
+        """
+        Registra que una conexión se quedó sin archivos (se llama desde su hilo).
+        """
+        if self.started is None:
+            return
+        with self._lock:
+            self.connection_seconds.append(time.monotonic() - self.started)
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def report(self):
+        """
+        Devuelve el plan y su resultado como diccionario (para registrar o ajustar la estimación).
+
+        Incluye la cola (tail): cuánto tardó la última conexión en terminar
+        después de la primera. Una cola larga indica archivos mal repartidos
+        o una velocidad estimada muy distinta de la real.
+        """
+        report = {
+            "files": len(self.files),
+            "bytes": self.total_bytes,
+            "connections": self.connections,
+            "throughput": round(self.throughput),
+            "file_overhead": self.file_overhead,
+            "predicted_seconds": round(self.predicted_seconds, 3),
+            "predicted_loads": [round(load, 3) for load in self.loads],
+            "largest": [(self.name_of(planned.item), planned.size) for planned in self.files[:5]],
+        }
+        actual = self.actual_seconds
+        if actual is not None:
+            report["actual_seconds"] = round(actual, 3)
+            if self.connection_seconds:
+                report["tail_seconds"] = round(max(self.connection_seconds) - min(self.connection_seconds), 3)
+        return report
+
+    def summary(self):
+        """
+        Resumen de una línea con la duración prevista y la real.
+        """
+        summary = (
+            f"Plan: {len(self.files)} archivos en {self.connections} conexiones, "
+            f"previsto {self.predicted_seconds:.1f} s"
+        )
+        actual = self.actual_seconds
+        if actual is not None:
+            summary += f", real {actual:.1f} s"
+            if self.connection_seconds:
+                summary += f" (cola {max(self.connection_seconds) - min(self.connection_seconds):.1f} s)"
+        return summary + "."
+
+
+def plan_transfers(items, connections, size_of, throughput=DEFAULT_CONNECTION_THROUGHPUT,
+                   file_overhead=DEFAULT_FILE_OVERHEAD, name_of=str):
+    """
+    Reparte una lista de archivos entre varias conexiones, los más grandes primero.
+
+    El costo de cada archivo es file_overhead + tamaño / throughput. Los
+    archivos de tamaño desconocido se cuentan con el tamaño promedio de los
+    demás. A igual costo se respeta el orden original.
+
+    Args:
+        items: Lista de trabajo (por ejemplo, tuplas (ruta_remota, ruta_local, entrada)).
+        connections: Conexiones que se usarán en paralelo.
+        size_of: Función (item) -> tamaño en bytes, o None si no se conoce.
+        throughput: Bytes por segundo que se esperan de cada conexión.
+        file_overhead: Segundos fijos por archivo.
+        name_of: Función (item) -> nombre con el que se muestra en el reporte.
+
+    Returns:
+        TransferPlan.
+    """
+    sizes = [size_of(item) for item in items]
+    known = [size for size in sizes if size is not None]
+    default_size = sum(known) // len(known) if known else 0
+    sizes = [default_size if size is None else size for size in sizes]
+    throughput = max(float(throughput), 1.0)
+    costs = [file_overhead + size / throughput for size in sizes]
+
+    connections = max(1, min(connections, len(items)))
+    free = [(0.0, connection) for connection in range(connections)]
+    files = []
+    for position in sorted(range(len(items)), key=lambda position: -costs[position]):
+        start, connection = heapq.heappop(free)
+        end = start + costs[position]
+        heapq.heappush(free, (end, connection))
+        files.append(PlannedFile(items[position], sizes[position], costs[position], connection, start, end))
+    return TransferPlan(files, connections, throughput, file_overhead, name_of)
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# Estado de una transferencia en un momento dado. "rate" en bytes/s y "eta"
+# en segundos (None mientras no haya datos suficientes).
+TransferStats = namedtuple(
+    "TransferStats",
+    ["bytes_done", "bytes_total", "files_done", "files_total", "rate", "eta", "current_file"],
+)
+
+DEFAULT_UPDATE_INTERVAL = 0.25  # segundos entre actualizaciones (4 por segundo)
+RATE_WINDOW = 5.0  # segundos usados para calcular la velocidad actual
+
+
+class ProgressTracker:
+    """
+    Acumula el avance en bytes de una descarga y lo informa con moderación.
+
+    Se puede llamar desde varios hilos a la vez. El callback recibe un
+    TransferStats como máximo cada update_interval segundos, para no saturar
+    el bucle de eventos de Qt con miles de señales por segundo.
+    """
+
+    def __init__(self, bytes_total, files_total, callback, update_interval=DEFAULT_UPDATE_INTERVAL):
+        self.bytes_total = bytes_total
+        self.files_total = files_total
+        self.bytes_done = 0
+        self.files_done = 0
+        self.current_file = ""
+        self.callback = callback
+        self.update_interval = update_interval
+        self.started_at = time.monotonic()
+        self._last_update = 0.0
+        self._samples = deque([(self.started_at, 0)])
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count, name=None):
+        """
+        Suma bytes recibidos (o resta, con count negativo, si un archivo se reinicia).
+        """
+        with self._lock:
+            self.bytes_done += count
+            if name:
+                self.current_file = name
+        self._maybe_report()
+
+    def file_done(self, name=None):
+        """
+        Marca un archivo como terminado.
+        """
+        with self._lock:
+            self.files_done += 1
+            if name:
+                self.current_file = name
+        self._maybe_report()
+
+    def finish(self):
+        """
+        Informa el estado final sin respetar el intervalo mínimo.
+        """
+        self._maybe_report(force=True)
+
+    def snapshot(self):
+        """
+        Devuelve el estado actual como TransferStats.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, self.bytes_done))
+            while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW:
+                self._samples.popleft()
+
+            first_time, first_bytes = self._samples[0]
+            elapsed = now - first_time
+            rate = (self.bytes_done - first_bytes) / elapsed if elapsed > 0 else 0.0
+
+            remaining = max(self.bytes_total - self.bytes_done, 0)
+            eta = remaining / rate if rate > 0 else None
+
+            return TransferStats(
+                self.bytes_done, self.bytes_total, self.files_done, self.files_total,
+                rate, eta, self.current_file,
+            )
+
+    def _maybe_report(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_update < self.update_interval:
+                return
+            self._last_update = now
+        self.callback(self.snapshot())
+
+
+def format_bytes(count):
+    """
+    Formatea una cantidad de bytes en la unidad más legible.
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(count) < 1024:
+            return f"{count:.1f} {unit}" if unit != "B" else f"{count} B"
+        count /= 1024
+    return f"{count:.1f} TB"
+
+
+def format_duration(seconds):
+    """
+    Formatea una duración en segundos como "1h 02m", "3m 20s" o "45s".
+    """
+    if seconds is None:
+        return "--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
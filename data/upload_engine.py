@@ -0,0 +1,498 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from ftplib import error_perm
+from data.download_engine import (
+    MAX_RETRY_DELAY, TRANSIENT_ERRORS, ConnectionLostError, DownloadCancelled, DownloadEngine,
+)
+from data.download_journal import JOURNAL_FILE_NAME
+from data.ftp_listing import RemoteEntry, get_modify_time, join_remote, walk_directory
+from data.integrity import IntegrityError, StreamHasher, get_server_hash, hash_file, hashes_match
+from data.part_files import PART_SUFFIX
+from data.sync_manifest import MANIFEST_FILE_NAME, SyncManifest
+from data.tracing import profile_thread, profiled, span, traced
+from data.transfer_progress import ProgressTracker
+
+# Archivos de trabajo de la aplicación que nunca se suben
+LOCAL_ONLY_FILES = frozenset({MANIFEST_FILE_NAME, f"{MANIFEST_FILE_NAME}.tmp", JOURNAL_FILE_NAME})
+
+# Archivo local de una carpeta: ruta relativa (con "/"), ruta local, tamaño y fecha de modificación
+LocalFile = namedtuple("LocalFile", ["relative_path", "local_path", "size", "mtime_ns"])
+
+# Resultado de una subida: files, pending y unchanged son listas de
+# (LocalFile, ruta_remota, entrada_remota o None); created son los
+# directorios remotos creados y failures, tuplas (ruta_remota, error);
+# plan es el TransferPlan (None si no hubo nada que subir).
+UploadResult = namedtuple(
+    "UploadResult", ["files", "pending", "unchanged", "created", "failures", "plan"], defaults=(None,)
+)
+
+
+def collect_local_files(local_directory):
+    """
+    Recorre la carpeta local y devuelve sus archivos y subdirectorios.
+
+    Se omiten el manifiesto, el registro de descargas y los temporales .part.
+
+    Returns:
+        Tupla (archivos, directorios): lista de LocalFile y conjunto de rutas
+        relativas de los subdirectorios.
+    """
+    files = []
+    directories = set()
+    for root, dirs, names in os.walk(local_directory):
+        relative_root = os.path.relpath(root, local_directory).replace(os.sep, "/")
+        relative_root = "" if relative_root == "." else relative_root
+        for name in dirs:
+            directories.add(f"{relative_root}/{name}" if relative_root else name)
+        for name in names:
+            if name in LOCAL_ONLY_FILES or name.endswith(PART_SUFFIX):
+                continue
+            local_path = os.path.join(root, name)
+            try:
+                stat = os.stat(local_path)
+            except OSError:
+                continue
+            relative_path = f"{relative_root}/{name}" if relative_root else name
+            files.append(LocalFile(relative_path, local_path, stat.st_size, stat.st_mtime_ns))
+    files.sort()
+    return files, directories
+
+
+def collect_remote_files(ftp, remote_directory):
+    """
+    Lista el árbol remoto de una carpeta, si existe.
+
+    Returns:
+        Tupla (archivos, directorios, existe): diccionario ruta relativa ->
+        RemoteEntry, conjunto de rutas relativas de los subdirectorios e
+        indicación de si la carpeta remota existe.
+    """
+    files = {}
+    directories = set()
+    try:
+        for remote_dir, dirs, entries in walk_directory(ftp, remote_directory):
+            relative = remote_dir[len(remote_directory):].strip("/")
+            prefix = f"{relative}/" if relative else ""
+            directories.update(prefix + entry.name for entry in dirs)
+            for entry in entries:
+                if not entry.name.endswith(PART_SUFFIX):
+                    files[prefix + entry.name] = entry
+    except error_perm as e:
+        # 550: la carpeta todavía no existe en el servidor
+        if not str(e).startswith("550") or files or directories:
+            raise
+        return {}, set(), False
+    return files, directories, True
+
+
+def local_modify(mtime_ns):
+    """
+    Convierte la fecha de un archivo local al formato de MLSD/MDTM (YYYYMMDDHHMMSS, UTC).
+    """
+    return time.strftime("%Y%m%d%H%M%S", time.gmtime(mtime_ns / 1e9))
+
+
+def plan_upload(local_files, remote_files, manifest):
+    """
+    Separa los archivos locales en pendientes de subir y sin cambios.
+
+    Un archivo se sube si no está en el servidor, si el tamaño difiere o si
+    la copia local es más nueva que la remota. Los archivos que vinieron de
+    una descarga se comparan con el manifiesto: si el servidor sigue
+    teniendo la versión descargada y el archivo local no se modificó desde
+    entonces (misma fecha local o, con manifiestos anteriores, mismo
+    SHA-256), no se vuelven a subir aunque su fecha local sea posterior.
+
+    Returns:
+        Tupla (pendientes, sin_cambios): listas de (LocalFile, entrada_remota o None).
+    """
+    pending = []
+    unchanged = []
+    for local in local_files:
+        remote = remote_files.get(local.relative_path)
+        if remote is None or (remote.size is not None and remote.size != local.size):
+            pending.append((local, remote))
+            continue
+
+        record = manifest.files.get(local.relative_path)
+        if record is not None and record.get("size") == remote.size and record.get("modify") == remote.modify:
+            if record.get("local_mtime_ns") == local.mtime_ns:
+                unchanged.append((local, remote))
+                continue
+            if record.get("sha256") and record.get("size") == local.size:
+                same = hash_file(local.local_path) == record["sha256"]
+                if same:
+                    # Registrar la fecha local para no volver a leerlo la próxima vez
+                    manifest.update(local.relative_path, remote, record["sha256"], local.local_path)
+                (unchanged if same else pending).append((local, remote))
+                continue
+
+        if remote.modify is not None and local_modify(local.mtime_ns) <= remote.modify:
+            unchanged.append((local, remote))
+        else:
+            pending.append((local, remote))
+    return pending, unchanged
+
+
+class UploadEngine(DownloadEngine):
+    """
+    Motor de subida de carpetas al FTP ("devolver" una carpeta editada).
+
+    Usa el mismo diseño que la descarga: compara el árbol local con el
+    listado remoto (tamaño y fecha) y sube sólo los archivos nuevos o
+    modificados, repartiéndolos entre varias conexiones que toman archivos
+    de una cola común. Hereda del DownloadEngine la conexión (o el pool),
+    los reintentos con retroceso, el límite de ancho de banda y el control
+    de pausa y cancelación.
+
+    Cada archivo se sube con STOR a un nombre temporal (nombre + ".part"),
+    se verifica (hash del servidor o, si no lo ofrece, SIZE) y recién
+    entonces se renombra con RNFR/RNTO sobre el definitivo, así que nadie
+    ve nunca un archivo a medio subir. Los directorios que faltan se crean
+    con MKD antes de empezar.
+    """
+
+    direction = "subida"
+
+    def __init__(self, ftp_config, local_directory, remote_directory, max_connections=None,
+                 on_file_done=None, on_transfer_progress=None, rate_limiter=None, control=None, pool=None):
+        """
+        Args:
+            ftp_config: Diccionario con las credenciales de FTP.
+            local_directory: Carpeta local a subir.
+            remote_directory: Directorio remoto de destino (se crea si no existe).
+            max_connections: Número de conexiones FTP simultáneas. Si no se indica,
+                se usa la clave "max_connections" de la configuración.
+            on_file_done: Función (subidos, total, nombre) llamada al terminar cada archivo.
+            on_transfer_progress: Función que recibe un TransferStats, como
+                máximo unas pocas veces por segundo.
+            rate_limiter: TokenBucket compartido para limitar el ancho de banda.
+            control: TransferControl para pausar o cancelar la subida.
+            pool: FTPPool compartido.
+        """
+        super().__init__(
+            ftp_config, remote_directory, local_directory,
+            max_connections=max_connections,
+            on_file_done=on_file_done,
+            on_transfer_progress=on_transfer_progress,
+            rate_limiter=rate_limiter,
+            control=control,
+            pool=pool,
+        )
+
+    @profiled("subida")
+    @traced("upload")
+    def run(self):
+        """
+        Sube los archivos nuevos o modificados de la carpeta local.
+
+        Returns:
+            UploadResult con lo subido, lo omitido y los errores por archivo.
+
+        Raises:
+            DownloadCancelled: si se canceló con el TransferControl.
+            Exception: si no se pudo conectar o listar la carpeta remota.
+        """
+        self.control.checkpoint()
+        self.plan = None
+        if not os.path.isdir(self.local_directory):
+            raise FileNotFoundError(f"No existe la carpeta local {self.local_directory}.")
+
+        local_files, local_dirs = collect_local_files(self.local_directory)
+        manifest = SyncManifest(self.local_directory)
+
+        ftp = self.connect()
+        try:
+            with span("upload.collect", folder=self.remote_directory, local_files=len(local_files)):
+                remote_files, remote_dirs, exists = collect_remote_files(ftp, self.remote_directory)
+            pending, unchanged = plan_upload(local_files, remote_files, manifest)
+            created = self.create_directories(ftp, local_dirs - remote_dirs, exists)
+        except Exception:
+            self.disconnect(ftp)
+            raise
+        self.release(ftp)
+
+        def with_remote_path(items):
+            return [(local, join_remote(self.remote_directory, local.relative_path), remote) for local, remote in items]
+
+        pending = with_remote_path(pending)
+        unchanged = with_remote_path(unchanged)
+        try:
+            with span("upload.transfer", folder=self.remote_directory, files=len(pending)) as current:
+                failures = self.upload_files(pending, manifest) if pending else []
+                if self.plan is not None:
+                    current.set(predicted_seconds=self.plan.predicted_seconds, actual_seconds=self.plan.actual_seconds)
+        finally:
+            manifest.save()
+
+        return UploadResult(pending + unchanged, pending, unchanged, created, failures, self.plan)
+
+    def create_directories(self, ftp, missing, root_exists=True):
+        """
+        Crea con MKD los directorios remotos que faltan, de arriba hacia abajo.
+
+        Returns:
+            Lista de rutas remotas creadas.
+        """
+        paths = [] if root_exists else [self.remote_directory]
+        paths.extend(join_remote(self.remote_directory, relative) for relative in
+                     sorted(missing, key=lambda relative: (relative.count("/"), relative)))
+        created = []
+        for path in paths:
+            try:
+                ftp.mkd(path)
+                created.append(path)
+            except error_perm as e:
+                # Ya existe (otro cliente lo creó) o no hay permiso: los archivos
+                # de ese directorio fallarán y quedarán en failures
+                print(f"No se pudo crear el directorio {path}: {e}")
+        return created
+
+    def upload_files(self, files, manifest=None):
+        """
+        Sube una lista de archivos usando varias conexiones FTP.
+
+        Cada conexión toma archivos de una cola compartida hasta vaciarla,
+        los más grandes primero (ver TransferPlan). Un error en un archivo se
+        registra y no interrumpe el resto de la subida.
+
+        Args:
+            files: Lista de tuplas (LocalFile, ruta_remota, entrada_remota o None).
+            manifest: SyncManifest donde registrar los archivos subidos.
+
+        Returns:
+            Lista de tuplas (ruta_remota, mensaje_de_error) con los archivos fallidos.
+        """
+        plan = self.plan_transfers(files, lambda item: item[0].size, lambda item: item[1])
+        work = queue.Queue()
+        for item in plan.order:
+            work.put(item)
+
+        total_files = len(files)
+        tracker = ProgressTracker(sum(local.size for local, _, _ in files), total_files, self.report_transfer)
+        state = {"uploaded": 0}
+        failures = []
+        connection_errors = []
+        lock = threading.Lock()
+
+        def finish(local, remote_path, sha256, modify):
+            if manifest is not None:
+                entry = RemoteEntry(remote_path.rsplit("/", 1)[-1], "file", local.size, modify)
+                manifest.update(local.relative_path, entry, sha256, local.local_path)
+            with lock:
+                state["uploaded"] += 1
+                uploaded = state["uploaded"]
+            tracker.file_done(os.path.basename(local.local_path))
+            if self.on_file_done is not None:
+                self.on_file_done(uploaded, total_files, os.path.basename(local.local_path))
+
+        def worker():
+            try:
+                ftp = self.connect_for_transfer()
+            except Exception as e:
+                with lock:
+                    connection_errors.append(str(e))
+                return
+
+            try:
+                while True:
+                    try:
+                        self.control.checkpoint()
+                    except DownloadCancelled:
+                        break
+                    try:
+                        local, remote_path, _ = work.get_nowait()
+                    except queue.Empty:
+                        break
+
+                    try:
+                        ftp, sha256, modify = self.upload_file(ftp, local, remote_path, tracker)
+                    except DownloadCancelled:
+                        # La transferencia quedó a medias: la conexión no se reutiliza
+                        self.disconnect(ftp)
+                        ftp = None
+                        break
+                    except ConnectionLostError as e:
+                        ftp = None
+                        with lock:
+                            failures.append((remote_path, str(e)))
+                        break
+                    except Exception as e:
+                        with lock:
+                            failures.append((remote_path, str(e)))
+                        if isinstance(e, TRANSIENT_ERRORS):
+                            # Se agotaron los reintentos: seguir con una conexión nueva
+                            self.disconnect(ftp)
+                            ftp = None
+                            try:
+                                ftp = self.connect_for_transfer()
+                            except Exception:
+                                break
+                        continue
+
+                    finish(local, remote_path, sha256, modify)
+            finally:
+                plan.connection_finished()
+                if ftp is not None:
+                    self.release(ftp)
+
+        threads = [threading.Thread(target=profile_thread(worker), daemon=True) for _ in range(plan.connections)]
+        plan.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.finish_plan(plan, failures)
+        tracker.finish()
+
+        if self.control.cancelled:
+            raise DownloadCancelled("Subida cancelada.")
+
+        if connection_errors and len(connection_errors) == len(threads):
+            raise ConnectionError(f"No se pudo conectar al servidor FTP: {connection_errors[0]}")
+
+        while not work.empty():
+            _, remote_path, _ = work.get_nowait()
+            failures.append((remote_path, "No se pudo subir: sin conexiones disponibles."))
+
+        return failures
+
+    def upload_file(self, ftp, local, remote_path, tracker=None):
+        """
+        Sube un archivo a un temporal, lo verifica y lo renombra al definitivo.
+
+        Ante un error transitorio se espera con retroceso exponencial, se
+        reconecta y se vuelve a subir el archivo completo (el temporal se
+        sobrescribe). Si la verificación falla también se vuelve a subir.
+
+        Returns:
+            Tupla (conexión FTP a seguir usando, SHA-256 del archivo, fecha
+            de modificación remota o None).
+
+        Raises:
+            IntegrityError: si el archivo sigue sin coincidir tras los reintentos.
+            ConnectionLostError: si se perdió la conexión y no se pudo reconectar.
+        """
+        name = os.path.basename(local.local_path)
+        counted = [0]  # bytes de este archivo ya informados al tracker
+
+        def on_data(count):
+            counted[0] += count
+            if tracker is not None:
+                tracker.add_bytes(count, name)
+
+        temp_path = remote_path + PART_SUFFIX
+        attempt = 0
+        while True:
+            server_hash = getattr(ftp, "server_hash", None)
+            hasher = StreamHasher(server_hash.algorithm if server_hash else None)
+            # Cada intento sube el archivo desde el principio
+            on_data(-counted[0])
+            try:
+                self.store(ftp, local.local_path, temp_path, on_data, hasher)
+                self.check_upload(ftp, temp_path, local, hasher)
+                self.replace(ftp, temp_path, remote_path)
+                return ftp, hasher.hexdigest(), get_modify_time(ftp, remote_path)
+            except IntegrityError as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"{e}, reintento {attempt}/{self.max_retries}")
+            except TRANSIENT_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"Error transitorio en {remote_path} ({e}), reintento {attempt}/{self.max_retries}")
+
+                self.disconnect(ftp)
+                time.sleep(min(self.retry_backoff * 2 ** (attempt - 1), MAX_RETRY_DELAY))
+                try:
+                    ftp = self.connect_for_transfer()
+                except Exception as reconnect_error:
+                    raise ConnectionLostError(f"Conexión perdida: {reconnect_error}") from e
+
+    def store(self, ftp, local_path, remote_path, on_data=None, hasher=None):
+        """
+        Ejecuta STOR de un archivo local, en bloques de block_size.
+
+        Args:
+            on_data: Función opcional que recibe la cantidad de bytes de cada bloque enviado.
+            hasher: StreamHasher opcional que recibe cada bloque enviado.
+        """
+        def sent(block):
+            if hasher is not None:
+                hasher.update(block)
+            if on_data is not None:
+                on_data(len(block))
+            self.throttle(len(block))
+
+        with open(local_path, "rb") as file, span("ftp.stor", path=remote_path):
+            ftp.storbinary(f"STOR {remote_path}", file, self.block_size, sent)
+
+    def check_upload(self, ftp, temp_path, local, hasher):
+        """
+        Comprueba el temporal recién subido contra el archivo local.
+
+        Usa el hash del servidor si lo ofrece y, si no, el tamaño (SIZE).
+
+        Raises:
+            IntegrityError: si el archivo cambió mientras se subía o no coincide en el servidor.
+        """
+        if hasher.size != local.size:
+            raise IntegrityError(
+                f"{local.relative_path} cambió mientras se subía ({hasher.size} de {local.size} bytes)"
+            )
+
+        server_hash = getattr(ftp, "server_hash", None)
+        if server_hash is not None:
+            expected = get_server_hash(ftp, server_hash, temp_path)
+            if expected is not None:
+                actual = hasher.hexdigest(server_hash.algorithm)
+                if not hashes_match(expected, actual, server_hash.algorithm):
+                    raise IntegrityError(
+                        f"El hash de {temp_path} en el servidor no coincide con el local "
+                        f"({server_hash.algorithm}: {expected} en lugar de {actual})"
+                    )
+                return
+
+        try:
+            remote_size = ftp.size(temp_path)
+        except error_perm:
+            return  # El servidor no informa tamaños
+        if remote_size is not None and remote_size != local.size:
+            raise IntegrityError(f"Tamaño incorrecto en {temp_path}: {remote_size} de {local.size} bytes")
+
+    def replace(self, ftp, temp_path, remote_path):
+        """
+        Renombra el temporal al nombre definitivo con RNFR/RNTO.
+
+        Algunos servidores no renombran sobre un archivo existente: en ese
+        caso se borra el anterior y se vuelve a intentar.
+        """
+        try:
+            ftp.rename(temp_path, remote_path)
+        except error_perm as e:
+            try:
+                ftp.delete(remote_path)
+            except error_perm:
+                raise e
+            ftp.rename(temp_path, remote_path)
+
+
+def upload_summary_message(result):
+    """
+    Arma el mensaje para el usuario a partir de un UploadResult.
+    """
+    summary = f" {len(result.pending) - len(result.failures)} archivos subidos, {len(result.unchanged)} sin cambios."
+    if result.created:
+        summary += f" {len(result.created)} carpetas creadas en el FTP."
+    if result.failures:
+        details = "\n".join(f"{path}: {error}" for path, error in result.failures[:10])
+        return (
+            f"Subida completada con {len(result.failures)} errores de {len(result.pending)} archivos."
+            f"{summary}\n{details}"
+        )
+    return f"Subida completada.{summary}"
@@ -2,7 +2,7 @@ import json
 import os
 import sys
 from PyQt6.QtCore import QObject, pyqtSignal
-from ftplib import FTP
+from data.download_engine import DownloadCancelled, DownloadEngine, summary_message
 
 
 def get_file_path(relative_path):
@@ -41,74 +41,58 @@ class DownloadWorker(QObject):
     progress = pyqtSignal(int, int, str)  # Señal para la barra de progreso
     finished = pyqtSignal(str)  # Señal para indicar que la descarga ha terminado
     error = pyqtSignal(str)  # Señal para indicar un error durante la descarga
+    transfer_progress = pyqtSignal(object)  # TransferStats con bytes, velocidad y ETA
+    cancelled = pyqtSignal()  # Señal para indicar que la descarga se canceló
+    result_ready = pyqtSignal(object)  # DownloadResult, emitido justo antes de finished
 
-    def __init__(self, ftp_config, remote_directory, local_directory):
+    def __init__(self, ftp_config, remote_directory, local_directory, max_connections=None,
+                 mirror=False, delete_extraneous=False, rate_limiter=None, control=None, pool=None):
         """
         Constructor del worker para manejar descargas FTP.
 
+        La descarga la hace un DownloadEngine; el worker sólo traduce sus
+        callbacks a señales de Qt.
+
         Args:
-            ftp_config_path: Ruta al archivo JSON con las credenciales de FTP.
+            ftp_config: Diccionario con las credenciales de FTP.
             remote_directory: Directorio remoto en el servidor FTP.
             local_directory: Directorio local para descargar los archivos.
+            max_connections: Número de conexiones FTP simultáneas.
+            mirror: Si es True, sólo se descargan los archivos nuevos o modificados.
+            delete_extraneous: En modo espejo, borra los archivos locales que
+                ya no existen en el servidor.
+            rate_limiter: TokenBucket compartido para limitar el ancho de banda.
+            control: TransferControl para pausar o cancelar la descarga.
+            pool: FTPPool compartido de la aplicación.
         """
         super().__init__()
         self.remote_directory = remote_directory
         self.local_directory = local_directory
         self.ftp_config = ftp_config  # Carga las credenciales
+        self.engine = DownloadEngine(
+            ftp_config, remote_directory, local_directory,
+            max_connections=max_connections,
+            mirror=mirror,
+            delete_extraneous=delete_extraneous,
+            on_file_done=self.progress.emit,
+            on_transfer_progress=self.transfer_progress.emit,
+            rate_limiter=rate_limiter,
+            control=control,
+            pool=pool,
+        )
 
     def run(self):
         """
         Ejecuta la descarga en el hilo separado.
         """
         try:
-            # Conectar al servidor FTP
-            ftp = FTP()
-            ftp.connect(self.ftp_config["host"], timeout=30)
-            ftp.login(self.ftp_config["user"], self.ftp_config["password"])
-            ftp.cwd(self.remote_directory)
-
-            # Crear el directorio local si no existe
-            os.makedirs(self.local_directory, exist_ok=True)
-
-            # Descargar archivos y subdirectorios
-            self.download_directory(ftp, self.remote_directory, self.local_directory)
-
-            ftp.quit()
+            result = self.engine.run()
 
             # Emitir la señal de fin de descarga
-            self.finished.emit("Descarga completada.")
+            self.result_ready.emit(result)
+            self.finished.emit(summary_message(result))
+        except DownloadCancelled:
+            self.cancelled.emit()
         except Exception as e:
             # Emitir la señal de error
             self.error.emit(str(e))
-
-    def download_directory(self, ftp, remote_directory, local_directory):
-        """
-        Descarga un directorio completo desde el servidor FTP al sistema local.
-
-        Args:
-            ftp: Conexión FTP.
-            remote_directory: Ruta del directorio en el servidor FTP.
-            local_directory: Ruta local donde se guardarán los archivos.
-        """
-        ftp.cwd(remote_directory)
-        items = ftp.nlst()  # Obtener la lista de archivos y carpetas en el directorio remoto
-
-        total_items = len(items)
-        downloaded_files = 0
-
-        for item in items:
-            remote_path = f"{remote_directory}/{item}"
-            local_path = os.path.join(local_directory, item)
-
-            try:
-                # Verificar si el elemento es un archivo o un directorio
-                ftp.cwd(remote_path)  # Si se puede cambiar al directorio, es un directorio
-                os.makedirs(local_path, exist_ok=True)  # Crear el directorio local
-                self.download_directory(ftp, remote_path, local_path)  # Llamada recursiva
-                ftp.cwd("..")  # Volver al directorio anterior
-            except Exception:
-                # Es un archivo, descargarlo
-                with open(local_path, "wb") as f:
-                    ftp.retrbinary(f"RETR {remote_path}", f.write)
-                downloaded_files += 1
-                self.progress.emit(downloaded_files, total_items, item)
@@ -0,0 +1,64 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from data.folder_analysis import connect_ftp, close_ftp_connection
+
+
+class IndexWorker(QObject):
+    progress = pyqtSignal(int, str)  # Directorios listados y el último directorio
+    finished = pyqtSignal(object)  # Diccionario carpeta -> FolderSummary
+    error = pyqtSignal(str)  # Señal para indicar un error durante el recorrido
+
+    def __init__(self, ftp_config, remote_index, force=False, pool=None):
+        """
+        Constructor del worker que actualiza el índice local del FTP en segundo plano.
+
+        Args:
+            ftp_config: Diccionario con las credenciales de FTP y el directorio raíz.
+            remote_index: RemoteIndex a actualizar.
+            force: Si es True, vuelve a listar todo el árbol.
+            pool: FTPPool compartido; si no se indica, se abre una conexión propia.
+        """
+        super().__init__()
+        self.ftp_config = ftp_config
+        self.remote_index = remote_index
+        self.force = force
+        self.pool = pool
+        self._stopping = False
+
+    def stop(self):
+        """
+        Pide detener el recorrido después del directorio en curso.
+        """
+        self._stopping = True
+
+    def on_directory(self, listed, path):
+        if self._stopping:
+            raise InterruptedError("Recorrido del FTP detenido.")
+        self.progress.emit(listed, path)
+
+    def crawl(self, ftp):
+        self.remote_index.refresh(
+            ftp, self.ftp_config["base_path"], force=self.force, on_directory=self.on_directory
+        )
+
+    def run(self):
+        """
+        Recorre el árbol remoto listando sólo los directorios que cambiaron.
+        """
+        try:
+            if self.pool is not None:
+                with self.pool.connection() as ftp:
+                    self.crawl(ftp)
+            else:
+                ftp = connect_ftp(
+                    self.ftp_config["host"], self.ftp_config["user"], self.ftp_config["password"],
+                    port=self.ftp_config.get("port", 21),
+                )
+                try:
+                    self.crawl(ftp)
+                finally:
+                    close_ftp_connection(ftp)
+            self.finished.emit(self.remote_index.folder_summaries(self.ftp_config["base_path"]))
+        except InterruptedError:
+            pass
+        except Exception as e:
+            self.error.emit(str(e))
@@ -1,8 +1,11 @@
+import multiprocessing
 import sys
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import FolderManagerApp
 
 if __name__ == "__main__":
+    # La verificación de carpetas usa varios procesos (necesario con PyInstaller)
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = FolderManagerApp()
     window.show()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+
+from data.sheet_queue import SheetWriteQueue
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code)
+
+
+class FakeWorksheet:
+    """
+    Hoja en memoria con la misma interfaz que usa la cola (append_rows).
+    """
+
+    def __init__(self, error_status=None):
+        self.rows = []
+        self.error_status = error_status
+
+    def append_rows(self, rows):
+        if self.error_status is not None:
+            raise FakeAPIError(self.error_status)
+        self.rows.extend(rows)
+
+
+class SheetWriteQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "sheet_queue.json")
+        self.sheets = {}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_queue(self):
+        return SheetWriteQueue(lambda url, rows: self.sheets[url].append_rows(rows), self.path)
+
+    def flush_all(self, queue, attempts=5):
+        errors = []
+        for _ in range(attempts):
+            try:
+                if not queue.flush():
+                    break
+            except FakeAPIError as e:
+                errors.append(e)
+        return errors
+
+    def test_sends_rows_in_one_batch(self):
+        self.sheets["ok"] = FakeWorksheet()
+        queue = self.make_queue()
+        queue.enqueue("ok", ["carpeta1", "ana"])
+        queue.enqueue("ok", ["carpeta2", "ana"])
+
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.sheets["ok"].rows, [["carpeta1", "ana"], ["carpeta2", "ana"]])
+        self.assertEqual(queue.pending_count, 0)
+
+    def test_permanent_error_is_dead_lettered_and_does_not_block_other_sheets(self):
+        self.sheets["deleted"] = FakeWorksheet(error_status=404)
+        self.sheets["ok"] = FakeWorksheet()
+        queue = self.make_queue()
+        queue.enqueue("deleted", ["carpeta1", "ana"])
+        queue.enqueue("ok", ["carpeta2", "ana"])
+
+        errors = self.flush_all(queue)
+
+        self.assertEqual([e.response.status_code for e in errors], [404])
+        self.assertEqual(self.sheets["ok"].rows, [["carpeta2", "ana"]])
+        self.assertEqual(queue.pending_count, 0)
+        self.assertEqual(queue.dead_count, 1)
+        dead = queue.dead_letters[0]
+        self.assertEqual((dead["sheet_url"], dead["row"]), ("deleted", ["carpeta1", "ana"]))
+        self.assertIn("404", dead["error"])
+
+        # Los descartados se guardan en disco y se pueden volver a encolar
+        reloaded = self.make_queue()
+        self.assertEqual(reloaded.dead_count, 1)
+        self.sheets["deleted"].error_status = None
+        self.assertEqual(reloaded.retry_dead_letters(), 1)
+        self.assertEqual(reloaded.flush(), 1)
+        self.assertEqual(self.sheets["deleted"].rows, [["carpeta1", "ana"]])
+        self.assertEqual((reloaded.pending_count, reloaded.dead_count), (0, 0))
+
+    def test_retryable_error_backs_off_only_that_sheet(self):
+        self.sheets["quota"] = FakeWorksheet(error_status=429)
+        self.sheets["ok"] = FakeWorksheet()
+        queue = self.make_queue()
+        queue.enqueue("quota", ["carpeta1", "ana"])
+        queue.enqueue("ok", ["carpeta2", "ana"])
+
+        errors = self.flush_all(queue)
+
+        self.assertEqual([e.response.status_code for e in errors], [429])
+        self.assertEqual(self.sheets["ok"].rows, [["carpeta2", "ana"]])
+        self.assertEqual((queue.pending_count, queue.dead_count), (1, 0))
+        self.assertGreater(queue.retry_delay(), 0)
+
+        # Pasado el retroceso, la hoja se vuelve a intentar
+        queue._retry_at["quota"] = 0.0
+        self.sheets["quota"].error_status = None
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(self.sheets["quota"].rows, [["carpeta1", "ana"]])
+        self.assertIsNone(queue.retry_delay())
+
+    def test_pending_rows_survive_a_restart(self):
+        self.sheets["ok"] = FakeWorksheet()
+        self.make_queue().enqueue("ok", ["carpeta1", "ana"])
+
+        queue = self.make_queue()
+        self.assertEqual(queue.pending_count, 1)
+        queue.flush()
+        self.assertEqual(self.sheets["ok"].rows, [["carpeta1", "ana"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
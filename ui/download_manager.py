@@ -0,0 +1,240 @@
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from data.bandwidth import TokenBucket
+from data.download_engine import TransferControl
+from download_worker import DownloadWorker
+from upload_worker import UploadWorker
+
+DEFAULT_MAX_CONCURRENT = 2
+
+STATUS_QUEUED = "En cola"
+STATUS_RUNNING = "Descargando"
+STATUS_UPLOADING = "Subiendo"
+STATUS_PAUSED = "En pausa"
+STATUS_DONE = "Completada"
+STATUS_DONE_WITH_ERRORS = "Completada con errores"
+STATUS_FAILED = "Error"
+STATUS_CANCELLED = "Cancelada"
+
+FINAL_STATUSES = (STATUS_DONE, STATUS_DONE_WITH_ERRORS, STATUS_FAILED, STATUS_CANCELLED)
+
+
+class DownloadJob:
+    """
+    Una carpeta en la cola de descargas (o, con upload=True, de subidas al FTP).
+    """
+
+    def __init__(self, folder, remote_directory, local_directory, editor=None, mirror=False,
+                 delete_extraneous=False, server=None, ftp_config=None, pool=None, upload=False):
+        """
+        Args:
+            server: Nombre del destino FTP de la carpeta (ver ftp_targets).
+            ftp_config: Configuración de ese destino; por defecto, la del DownloadManager.
+            pool: FTPPool de ese destino; por defecto, el del DownloadManager.
+            upload: Si es True, se devuelve la carpeta local al FTP en lugar de descargarla.
+        """
+        self.folder = folder
+        self.upload = upload
+        self.server = server
+        self.ftp_config = ftp_config
+        self.pool = pool
+        self.remote_directory = remote_directory
+        self.local_directory = local_directory
+        self.editor = editor
+        self.mirror = mirror
+        self.delete_extraneous = delete_extraneous
+        self.status = STATUS_QUEUED
+        self.stats = None
+        self.result = None
+        self.message = ""
+        self.control = TransferControl()
+        self.thread = None
+        self.worker = None
+
+    @property
+    def finished(self):
+        return self.status in FINAL_STATUSES
+
+    @property
+    def running_status(self):
+        return STATUS_UPLOADING if self.upload else STATUS_RUNNING
+
+
+class DownloadManager(QObject):
+    job_added = pyqtSignal(object)  # DownloadJob agregado a la cola
+    job_changed = pyqtSignal(object)  # Cambió el estado o el avance de un trabajo
+    job_finished = pyqtSignal(object)  # Un trabajo terminó (ver job.status y job.message)
+
+    def __init__(self, ftp_config, max_concurrent=DEFAULT_MAX_CONCURRENT, rate_limit=None, pool=None, parent=None):
+        """
+        Administra varias descargas de carpetas a la vez.
+
+        Args:
+            ftp_config: Diccionario con las credenciales de FTP.
+            max_concurrent: Cantidad de carpetas que se descargan al mismo tiempo.
+            rate_limit: Límite global en bytes por segundo, compartido por todas
+                las descargas (None = sin límite).
+            pool: FTPPool compartido; limita las conexiones de todas las descargas juntas.
+        """
+        super().__init__(parent)
+        self.ftp_config = ftp_config
+        self.max_concurrent = max(1, max_concurrent)
+        self.rate_limiter = TokenBucket(rate_limit)
+        self.pool = pool
+        self.jobs = []
+
+    def enqueue(self, job):
+        """
+        Agrega un trabajo a la cola y lo inicia si hay lugar.
+        """
+        self.jobs.append(job)
+        self.job_added.emit(job)
+        self.start_next()
+        return job
+
+    def find_active(self, folder, server=None):
+        """
+        Devuelve el trabajo no terminado de una carpeta (del servidor indicado, si se indica), o None.
+        """
+        for job in self.jobs:
+            if job.folder == folder and (server is None or job.server == server) and not job.finished:
+                return job
+        return None
+
+    def running_jobs(self):
+        return [job for job in self.jobs if job.thread is not None and not job.finished]
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = max(1, value)
+        self.start_next()
+
+    def set_rate_limit(self, bytes_per_second):
+        """
+        Cambia el límite global de ancho de banda (0 o None = sin límite).
+        """
+        self.rate_limiter.set_rate(bytes_per_second)
+
+    def pause(self, job):
+        if job.finished:
+            return
+        job.control.pause()
+        job.status = STATUS_PAUSED
+        self.job_changed.emit(job)
+
+    def resume(self, job):
+        if job.finished:
+            return
+        job.control.resume()
+        job.status = job.running_status if job.thread is not None else STATUS_QUEUED
+        self.job_changed.emit(job)
+        self.start_next()
+
+    def cancel(self, job):
+        if job.finished:
+            return
+        job.control.cancel()
+        if job.thread is None:
+            # Todavía no empezó: se cancela de inmediato
+            self._finish(job, STATUS_CANCELLED, "Subida cancelada." if job.upload else "Descarga cancelada.")
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def start_next(self):
+        """
+        Inicia trabajos en cola hasta llegar al máximo de descargas simultáneas.
+        """
+        running = len(self.running_jobs())
+        for job in self.jobs:
+            if running >= self.max_concurrent:
+                break
+            if job.thread is None and job.status == STATUS_QUEUED:
+                self._start(job)
+                running += 1
+
+    def _start(self, job):
+        job.thread = QThread()
+        if job.upload:
+            job.worker = UploadWorker(
+                job.ftp_config or self.ftp_config, job.local_directory, job.remote_directory,
+                rate_limiter=self.rate_limiter,
+                control=job.control,
+                pool=job.pool or self.pool,
+            )
+        else:
+            job.worker = DownloadWorker(
+                job.ftp_config or self.ftp_config, job.remote_directory, job.local_directory,
+                mirror=job.mirror,
+                delete_extraneous=job.delete_extraneous,
+                rate_limiter=self.rate_limiter,
+                control=job.control,
+                pool=job.pool or self.pool,
+            )
+        job.worker.moveToThread(job.thread)
+
+        # Slots del manager (que vive en el hilo de la interfaz): las señales
+        # llegan encoladas y el trabajo se identifica por el worker emisor
+        job.worker.transfer_progress.connect(self._on_progress)
+        job.worker.result_ready.connect(self._on_result)
+        job.worker.finished.connect(self._on_finished)
+        job.worker.error.connect(self._on_error)
+        job.worker.cancelled.connect(self._on_cancelled)
+
+        job.thread.started.connect(job.worker.run)
+        job.thread.finished.connect(self._on_thread_finished)
+        job.thread.finished.connect(job.worker.deleteLater)
+        job.thread.finished.connect(job.thread.deleteLater)
+
+        job.status = job.running_status
+        self.job_changed.emit(job)
+        job.thread.start()
+
+    def _job_for_sender(self):
+        worker = self.sender()
+        for job in self.jobs:
+            if job.worker is worker:
+                return job
+        return None
+
+    def _on_thread_finished(self):
+        # Qt borra el QThread (deleteLater): que no quede una referencia inválida en el trabajo
+        thread = self.sender()
+        for job in self.jobs:
+            if job.thread is thread:
+                job.thread = None
+
+    def _on_progress(self, stats):
+        job = self._job_for_sender()
+        if job is not None:
+            job.stats = stats
+            self.job_changed.emit(job)
+
+    def _on_result(self, result):
+        job = self._job_for_sender()
+        if job is not None:
+            job.result = result
+
+    def _on_finished(self, message):
+        job = self._job_for_sender()
+        if job is not None:
+            failed = job.result is not None and bool(job.result.failures)
+            self._finish(job, STATUS_DONE_WITH_ERRORS if failed else STATUS_DONE, message)
+
+    def _on_error(self, message):
+        job = self._job_for_sender()
+        if job is not None:
+            self._finish(job, STATUS_FAILED, message)
+
+    def _on_cancelled(self):
+        job = self._job_for_sender()
+        if job is not None:
+            self._finish(job, STATUS_CANCELLED, "Subida cancelada." if job.upload else "Descarga cancelada.")
+
+    def _finish(self, job, status, message):
+        job.status = status
+        job.message = message
+        if job.thread is not None:
+            job.thread.quit()
+        self.job_changed.emit(job)
+        self.job_finished.emit(job)
+        self.start_next()
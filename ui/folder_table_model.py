@@ -0,0 +1,153 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class FolderTableModel(QAbstractTableModel):
+    """
+    Modelo de tabla para listas grandes de carpetas.
+
+    Los datos se guardan como una lista de Python por columna, sin un objeto
+    por celda: la vista sólo pide los valores de las filas visibles, así que
+    el costo de dibujar no depende del total de filas. La primera columna es
+    el nombre de la carpeta; las filas se indexan por las columnas de
+    key_columns (por defecto, sólo la carpeta; con varios servidores, la
+    carpeta y el servidor) para actualizar filas sueltas sin reconstruir la
+    tabla.
+
+    Las columnas con un formateador (por ejemplo, tamaños en bytes) muestran
+    el texto formateado pero conservan el valor original para ordenar
+    (Qt.ItemDataRole.UserRole).
+    """
+
+    def __init__(self, headers, formatters=None, key_columns=(0,), parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.formatters = dict(formatters or {})
+        self.key_columns = tuple(key_columns)
+        self._columns = [[] for _ in self.headers]
+        self._raw = {column: [] for column in self.formatters}
+        self._row_by_folder = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.UserRole:
+            if index.column() in self._raw:
+                return self._raw[index.column()][index.row()]
+            return self._columns[index.column()][index.row()]
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        return self._columns[index.column()][index.row()]
+
+    def _display(self, column, value):
+        if value is None:
+            return ""
+        formatter = self.formatters.get(column)
+        return formatter(value) if formatter is not None else str(value)
+
+    def _key(self, row):
+        if len(self.key_columns) == 1:
+            return self._columns[self.key_columns[0]][row]
+        return tuple(self._columns[column][row] for column in self.key_columns)
+
+    def _append_values(self, row):
+        for position, column in enumerate(self._columns):
+            value = row[position] if position < len(row) else None
+            column.append(self._display(position, value))
+            if position in self._raw:
+                self._raw[position].append(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return section + 1
+
+    def set_rows(self, rows):
+        """
+        Reemplaza todas las filas. Cada fila es una tupla con un valor por columna.
+        """
+        self.beginResetModel()
+        self._columns = [[] for _ in self.headers]
+        self._raw = {column: [] for column in self.formatters}
+        for row in rows:
+            self._append_values(row)
+        self._row_by_folder = {self._key(row): row for row in range(len(self._columns[0]))}
+        self.endResetModel()
+
+    def append_row(self, row):
+        """
+        Agrega una fila al final de la tabla.
+        """
+        position = self.rowCount()
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._append_values(row)
+        self._row_by_folder[self._key(position)] = position
+        self.endInsertRows()
+
+    def remove_folder(self, key):
+        """
+        Quita la fila de una carpeta, si existe.
+
+        Args:
+            key: Nombre de la carpeta o, con varias key_columns, la tupla de sus valores.
+
+        Returns:
+            True si la carpeta estaba en la tabla.
+        """
+        position = self._row_by_folder.pop(key, None)
+        if position is None:
+            return False
+
+        self.beginRemoveRows(QModelIndex(), position, position)
+        for column in self._columns:
+            del column[position]
+        for column in self._raw.values():
+            del column[position]
+        for row in range(position, len(self._columns[0])):
+            self._row_by_folder[self._key(row)] = row
+        self.endRemoveRows()
+        return True
+
+    def set_column_values(self, column, values):
+        """
+        Actualiza una columna a partir de un diccionario clave de la fila -> valor.
+
+        Las filas que no están en values quedan vacías. Se emite un solo
+        dataChanged para toda la columna, sin reconstruir la tabla.
+        """
+        for row in range(len(self._columns[0])):
+            value = values.get(self._key(row))
+            self._columns[column][row] = self._display(column, value)
+            if column in self._raw:
+                self._raw[column][row] = value
+        if self._columns[0]:
+            self.dataChanged.emit(self.index(0, column), self.index(len(self._columns[0]) - 1, column))
+
+    def folder_at(self, row):
+        """
+        Devuelve el nombre de la carpeta en una fila del modelo.
+        """
+        return self._columns[0][row]
+
+    def key_at(self, row):
+        """
+        Devuelve la clave de una fila del modelo (ver key_columns).
+        """
+        return self._key(row)
+
+    def row_values(self, row):
+        """
+        Devuelve todos los valores de una fila del modelo.
+        """
+        return tuple(column[row] for column in self._columns)
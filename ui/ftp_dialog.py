@@ -1,11 +1,37 @@
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QPushButton, QFormLayout, QMessageBox
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QFormLayout, QMessageBox, QLabel,
+    QTableWidget, QTableWidgetItem, QStyledItemDelegate, QAbstractItemView,
+)
+from data.ftp_targets import ftp_targets
+
+# Columnas de la tabla de destinos adicionales y la clave de configuración de cada una
+TARGET_COLUMNS = [
+    ("Nombre", "name"), ("Host", "host"), ("Puerto", "port"), ("Usuario", "user"),
+    ("Contraseña", "password"), ("Directorio Raíz", "base_path"),
+]
+PASSWORD_COLUMN = 4
+
+
+class PasswordDelegate(QStyledItemDelegate):
+    """
+    Oculta las contraseñas de la tabla, tanto al mostrarlas como al editarlas.
+    """
+
+    def displayText(self, value, locale):
+        return "\u2022" * len(str(value or ""))
+
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        editor.setEchoMode(QLineEdit.EchoMode.Password)
+        return editor
 
 
 class FTPConfigDialog(QDialog):
     def __init__(self, parent, config):
         super().__init__(parent)
         self.setWindowTitle("Configuración de FTP y Google Sheets")
-        self.setGeometry(200, 200, 400, 350)
+        self.setGeometry(200, 200, 700, 500)
 
         self.config = config
 
@@ -30,6 +56,26 @@ class FTPConfigDialog(QDialog):
 
         layout.addLayout(form_layout)
 
+        # Otros servidores o directorios raíz; lo que se deja vacío se toma del principal
+        layout.addWidget(QLabel("Otros servidores o directorios (los campos vacíos usan los del servidor principal):"))
+        self.targets_table = QTableWidget(0, len(TARGET_COLUMNS))
+        self.targets_table.setHorizontalHeaderLabels([header for header, _ in TARGET_COLUMNS])
+        self.targets_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.targets_table.setItemDelegateForColumn(PASSWORD_COLUMN, PasswordDelegate(self.targets_table))
+        self.targets_table.horizontalHeader().setStretchLastSection(True)
+        for target in self.config.get("targets", []):
+            self.add_target_row(target)
+        layout.addWidget(self.targets_table)
+
+        targets_buttons = QHBoxLayout()
+        self.add_target_btn = QPushButton("Agregar servidor")
+        self.add_target_btn.clicked.connect(lambda: self.add_target_row({}))
+        targets_buttons.addWidget(self.add_target_btn)
+        self.remove_target_btn = QPushButton("Quitar servidor")
+        self.remove_target_btn.clicked.connect(self.remove_target_row)
+        targets_buttons.addWidget(self.remove_target_btn)
+        layout.addLayout(targets_buttons)
+
         # Botones
         self.save_btn = QPushButton("Guardar")
         self.save_btn.clicked.connect(self.save_config)
@@ -41,6 +87,53 @@ class FTPConfigDialog(QDialog):
 
         self.setLayout(layout)
 
+    def add_target_row(self, target):
+        """
+        Agrega una fila a la tabla de destinos; el diccionario original se
+        conserva para no perder claves que no tienen columna (por ejemplo, plazos).
+        """
+        row = self.targets_table.rowCount()
+        self.targets_table.insertRow(row)
+        for column, (_, key) in enumerate(TARGET_COLUMNS):
+            item = QTableWidgetItem(str(target.get(key, "")))
+            if column == 0:
+                item.setData(Qt.ItemDataRole.UserRole, dict(target))
+            self.targets_table.setItem(row, column, item)
+
+    def remove_target_row(self):
+        row = self.targets_table.currentRow()
+        if row >= 0:
+            self.targets_table.removeRow(row)
+
+    def read_targets(self):
+        """
+        Devuelve los destinos adicionales de la tabla, sin las filas vacías.
+
+        Raises:
+            ValueError: si un valor no es válido.
+        """
+        targets = []
+        for row in range(self.targets_table.rowCount()):
+            first = self.targets_table.item(row, 0)
+            target = dict(first.data(Qt.ItemDataRole.UserRole) or {}) if first is not None else {}
+            for column, (header, key) in enumerate(TARGET_COLUMNS):
+                item = self.targets_table.item(row, column)
+                value = item.text().strip() if item is not None else ""
+                if not value:
+                    target.pop(key, None)
+                elif key == "port":
+                    if not value.isdigit():
+                        raise ValueError(f"Fila {row + 1}: el puerto debe ser un número.")
+                    target[key] = int(value)
+                else:
+                    target[key] = value
+            if not target.get("host") and not target.get("base_path"):
+                if any(target.get(key) for _, key in TARGET_COLUMNS):
+                    raise ValueError(f"Fila {row + 1}: indica al menos el host o el directorio raíz.")
+                continue
+            targets.append(target)
+        return targets
+
     def save_config(self):
         """
         Guarda la configuración ingresada y cierra el diálogo.
@@ -55,9 +148,28 @@ class FTPConfigDialog(QDialog):
             QMessageBox.warning(self, "Error", "Todos los campos son obligatorios.")
             return
 
+        try:
+            targets = self.read_targets()
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+
+        # El nombre identifica a cada destino en las tablas: no se puede repetir
+        names = [target["name"] for target in ftp_targets(
+            {"host": host, "user": user, "password": password, "base_path": base_path, "targets": targets}
+        )]
+        repeated = sorted({name for name in names if names.count(name) > 1})
+        if repeated:
+            QMessageBox.warning(self, "Error", f"Hay destinos repetidos: {', '.join(repeated)}. Usa otro nombre.")
+            return
+
         self.config["host"] = host
         self.config["user"] = user
         self.config["password"] = password
         self.config["base_path"] = base_path
         self.config["google_sheet_url"] = sheet_url
+        if targets:
+            self.config["targets"] = targets
+        else:
+            self.config.pop("targets", None)
         self.accept()
@@ -1,16 +1,33 @@
 import sys
 import os
-from PyQt6.QtCore import QThread
+import time
+from PyQt6.QtCore import QThread, QTimer, Qt, QSortFilterProxyModel
 from PyQt6.QtWidgets import (
-    QMainWindow, QVBoxLayout, QPushButton, QLabel, QFileDialog, QWidget, QMessageBox, QTableWidget, QTableWidgetItem, QInputDialog, QProgressBar, QTabWidget
+    QMainWindow, QVBoxLayout, QPushButton, QLabel, QFileDialog, QWidget, QMessageBox, QTableView, QInputDialog, QProgressBar, QTabWidget, QCheckBox, QLineEdit, QAbstractItemView, QHeaderView,
+    QTableWidget, QTableWidgetItem, QHBoxLayout, QSpinBox, QDoubleSpinBox
 )
 from ui.ftp_dialog import FTPConfigDialog
-from config.settings import *
-from config.utils import *
+from ui.folder_table_model import FolderTableModel
+from ui.download_manager import DownloadManager, DownloadJob, STATUS_PAUSED, STATUS_DONE, STATUS_DONE_WITH_ERRORS, STATUS_CANCELLED, DEFAULT_MAX_CONCURRENT
+from config.utils import get_file_path
 from ftp_config import load_config, save_config
-from data.google_sheets import load_excel_data, append_row_to_google_sheet
-from data.folder_analysis import connect_ftp, verificar_carpetas_ftp, close_ftp_connection
-from download_worker import DownloadWorker
+from data.folder_analysis import analizar_destinos
+from data.ftp_targets import ftp_targets, find_target
+from data.google_sheets import (
+    RETURNED_HEADER, append_rows_to_google_sheet, clear_sheet_sessions, update_rows_in_google_sheet,
+)
+from data.sheet_queue import SheetWriteQueue
+from data.sync_manifest import MANIFEST_FILE_NAME
+from data.integrity import verify_message
+from data.remote_index import RemoteIndex, server_key
+from data.ftp_pool import get_pool, close_pools
+from data.tracing import configure_tracing, disable_tracing, span
+from data.transfer_progress import format_bytes, format_duration
+from analysis_worker import AnalysisWorker
+from verify_worker import VerifyWorker
+from index_worker import IndexWorker
+
+DOWNLOAD_HEADERS = ["Carpeta", "Servidor", "Estado", "Progreso", "Velocidad", "ETA"]
 
 class FolderManagerApp(QMainWindow):
     def __init__(self):
@@ -45,21 +62,77 @@ class FolderManagerApp(QMainWindow):
         self.download_btn.clicked.connect(self.download_and_update)
         self.layout.addWidget(self.download_btn)
 
+        self.sync_btn = QPushButton("Sincronizar Carpeta en Uso (solo cambios)")
+        self.sync_btn.clicked.connect(self.sync_used_folder)
+        self.layout.addWidget(self.sync_btn)
+
+        self.upload_btn = QPushButton("Devolver Carpeta en Uso al FTP (solo cambios)")
+        self.upload_btn.clicked.connect(self.return_used_folder)
+        self.layout.addWidget(self.upload_btn)
+
+        self.verify_btn = QPushButton("Verificar Carpeta en Uso (hashes)")
+        self.verify_btn.clicked.connect(self.verify_used_folder)
+        self.layout.addWidget(self.verify_btn)
+
+        self.delete_extraneous_checkbox = QCheckBox("Al sincronizar, borrar archivos locales que ya no están en el FTP")
+        self.layout.addWidget(self.delete_extraneous_checkbox)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Buscar carpeta o editor...")
+        self.search_input.textChanged.connect(self.filter_tables)
+        self.layout.addWidget(self.search_input)
+
         self.tab_widget = QTabWidget()
         self.layout.addWidget(self.tab_widget)
 
         self.available_tab = QWidget()
         self.tab_widget.addTab(self.available_tab, "Carpetas Disponibles")
         self.available_layout = QVBoxLayout(self.available_tab)
-        self.available_table = QTableWidget()
+        # Con varios servidores una carpeta puede repetirse: cada fila es (carpeta, servidor)
+        self.available_model = FolderTableModel(
+            ["Carpetas Disponibles", "Tamaño", "Archivos", "Servidor"], {1: format_bytes, 2: str}, key_columns=(0, 3)
+        )
+        self.available_proxy, self.available_table = self.create_table_view(self.available_model)
+        # Se pueden seleccionar varias carpetas para encolarlas de una vez
+        self.available_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.available_layout.addWidget(self.available_table)
 
         self.used_tab = QWidget()
         self.tab_widget.addTab(self.used_tab, "Carpetas en Uso")
         self.used_layout = QVBoxLayout(self.used_tab)
-        self.used_table = QTableWidget()
+        self.used_model = FolderTableModel(["Carpeta", "Editor", "Servidor"], key_columns=(0, 2))
+        self.used_proxy, self.used_table = self.create_table_view(self.used_model)
         self.used_layout.addWidget(self.used_table)
 
+        self.downloads_tab = QWidget()
+        self.tab_widget.addTab(self.downloads_tab, "Descargas")
+        self.downloads_layout = QVBoxLayout(self.downloads_tab)
+        self.downloads_table = QTableWidget(0, len(DOWNLOAD_HEADERS))
+        self.downloads_table.setHorizontalHeaderLabels(DOWNLOAD_HEADERS)
+        self.downloads_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.downloads_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.downloads_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.downloads_table.horizontalHeader().setStretchLastSection(True)
+        self.downloads_layout.addWidget(self.downloads_table)
+
+        self.downloads_controls = QHBoxLayout()
+        self.pause_btn = QPushButton("Pausar / Reanudar")
+        self.pause_btn.clicked.connect(self.toggle_pause_download)
+        self.downloads_controls.addWidget(self.pause_btn)
+        self.cancel_btn = QPushButton("Cancelar")
+        self.cancel_btn.clicked.connect(self.cancel_download)
+        self.downloads_controls.addWidget(self.cancel_btn)
+        self.downloads_controls.addWidget(QLabel("Simultáneas:"))
+        self.concurrent_spin = QSpinBox()
+        self.concurrent_spin.setRange(1, 8)
+        self.downloads_controls.addWidget(self.concurrent_spin)
+        self.downloads_controls.addWidget(QLabel("Límite (MB/s, 0 = sin límite):"))
+        self.rate_limit_spin = QDoubleSpinBox()
+        self.rate_limit_spin.setRange(0, 1000)
+        self.rate_limit_spin.setDecimals(1)
+        self.downloads_controls.addWidget(self.rate_limit_spin)
+        self.downloads_layout.addLayout(self.downloads_controls)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setValue(0)
         self.layout.addWidget(self.progress_bar)
@@ -67,18 +140,98 @@ class FolderManagerApp(QMainWindow):
         self.progress_label = QLabel("Descargando: ")
         self.layout.addWidget(self.progress_label)
 
+        self.sheet_queue_label = QLabel("")
+        self.layout.addWidget(self.sheet_queue_label)
+
+        self.index_label = QLabel("")
+        self.layout.addWidget(self.index_label)
+
         self.container = QWidget()
         self.container.setLayout(self.layout)
         self.setCentralWidget(self.container)
 
+    def create_table_view(self, model):
+        """Crea una vista de tabla con filtro y orden sobre el modelo dado."""
+        proxy = QSortFilterProxyModel(self)
+        proxy.setSourceModel(model)
+        proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        proxy.setFilterKeyColumn(-1)  # Buscar en todas las columnas
+        proxy.setSortRole(Qt.ItemDataRole.UserRole)  # Ordenar tamaños por valor, no por texto
+
+        table = QTableView()
+        table.setModel(proxy)
+        table.setSortingEnabled(True)
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        # Alturas y anchos fijos: no hace falta medir cada celda
+        table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        table.horizontalHeader().setStretchLastSection(True)
+        return proxy, table
+
+    def filter_tables(self, text):
+        """Filtra ambas tablas por el texto de búsqueda."""
+        self.available_proxy.setFilterFixedString(text)
+        self.used_proxy.setFilterFixedString(text)
+
+    def selected_folder(self, table, proxy, model):
+        """Devuelve (carpeta, servidor) de la fila seleccionada en una tabla, o None."""
+        index = table.currentIndex()
+        if not index.isValid():
+            return None
+        return model.key_at(proxy.mapToSource(index).row())
+
+    def selected_folders(self, table, proxy, model):
+        """Devuelve (carpeta, servidor) de las filas seleccionadas en una tabla, en orden de aparición."""
+        rows = sorted({proxy.mapToSource(index).row() for index in table.selectionModel().selectedRows()})
+        return [model.key_at(row) for row in rows]
+
     def setup_variables(self):
         """Inicializa las variables de estado."""
         config_path = get_file_path("credentials/ftp_config.json")
         self.credential_path = get_file_path("credentials/credentials.json")
         self.config = load_config(config_path)
         self.google_sheet_url = self.config.get("google_sheet_url", None)
-        self.ftp_config = self.config.get("ftp", {})
+        # Opciones generales (en el nivel superior, como las guarda el diálogo, o bajo "ftp")
+        self.ftp_config = self.config.get("ftp") or self.config
+        self.ftp_targets = ftp_targets(self.config)
+        # Medición de tiempos por fase (claves trace_log, trace_metrics y profile_dir)
+        configure_tracing(self.ftp_config)
         self.download_path = os.path.expanduser("~/Downloads")
+        self.remote_indexes = {}  # server_key -> RemoteIndex
+        self.index_workers = {}  # servidor -> (QThread, IndexWorker) de los recorridos en curso
+        self.folder_summaries = {}  # servidor -> carpeta -> FolderSummary
+        self.analysis_failures = {}  # servidor -> error del último análisis
+
+        # Las filas para la planilla se envían en segundo plano y en lotes
+        self.sheet_queue = SheetWriteQueue(
+            lambda sheet_url, rows: append_rows_to_google_sheet(sheet_url, self.credential_path, rows),
+            updater=lambda sheet_url, updates: update_rows_in_google_sheet(sheet_url, self.credential_path, updates),
+        )
+        self.sheet_queue.start()
+        self.sheet_queue_timer = QTimer(self)
+        self.sheet_queue_timer.timeout.connect(self.update_sheet_queue_label)
+        self.sheet_queue_timer.start(2000)
+        self.update_sheet_queue_label()
+
+        # Cola de descargas: varias carpetas a la vez con un límite de ancho de banda común
+        max_concurrent = self.ftp_config.get("max_concurrent_downloads", DEFAULT_MAX_CONCURRENT)
+        rate_limit_mbps = self.ftp_config.get("rate_limit_mbps", 0)
+        # Cada trabajo lleva la configuración y el pool de su servidor
+        self.download_manager = DownloadManager(
+            self.ftp_config, max_concurrent=max_concurrent, rate_limit=rate_limit_mbps * 1024 * 1024, parent=self,
+        )
+        self.download_manager.job_added.connect(self.add_download_row)
+        self.download_manager.job_changed.connect(self.update_download_row)
+        self.download_manager.job_finished.connect(self.download_job_finished)
+        self.download_rows = {}  # DownloadJob -> fila de la tabla de descargas
+
+        self.concurrent_spin.setValue(self.download_manager.max_concurrent)
+        self.rate_limit_spin.setValue(rate_limit_mbps)
+        self.concurrent_spin.valueChanged.connect(self.download_manager.set_max_concurrent)
+        self.rate_limit_spin.valueChanged.connect(
+            lambda value: self.download_manager.set_rate_limit(value * 1024 * 1024)
+        )
 
     def open_config_dialog(self):
         """Abre el formulario para configurar credenciales FTP y Google Sheets."""
@@ -86,121 +239,502 @@ class FolderManagerApp(QMainWindow):
         if dialog.exec():
             config_path = get_file_path("credentials/ftp_config.json")
             save_config(config_path, self.config)
+            clear_sheet_sessions()
             self.google_sheet_url = self.config.get("google_sheet_url")
+            self.ftp_config = self.config.get("ftp") or self.config
+            self.ftp_targets = ftp_targets(self.config)
+            configure_tracing(self.ftp_config)
+            self.close_remote_index()
+            # Las conexiones abiertas son de los servidores anteriores
+            close_pools()
             QMessageBox.information(self, "Configuración Guardada", "La configuración ha sido guardada correctamente.")
             self.analyze_btn.setEnabled(bool(self.google_sheet_url))
 
+    def get_ftp_pool(self, target):
+        """Devuelve el pool de conexiones FTP de un destino, o None si falta la configuración."""
+        if all(target.get(key) for key in ("host", "user", "password")):
+            return get_pool(target)
+        return None
+
+    def get_remote_index(self, target):
+        """Devuelve el índice local del servidor de un destino, o None si falta la configuración."""
+        if not target.get("host"):
+            return None
+        key = server_key(target)
+        if key not in self.remote_indexes:
+            try:
+                self.remote_indexes[key] = RemoteIndex(key)
+            except Exception as e:
+                print(f"No se pudo abrir el índice local del FTP: {e}")
+                return None
+        return self.remote_indexes[key]
+
+    def close_remote_index(self):
+        """Cierra los índices (por ejemplo, al cambiar de servidores)."""
+        for thread, worker in self.index_workers.values():
+            worker.stop()
+            thread.quit()
+            thread.wait()
+        self.index_workers = {}
+        for index in self.remote_indexes.values():
+            index.close()
+        self.remote_indexes = {}
+        self.folder_summaries = {}
+
+    def load_folder_summaries(self):
+        """Lee de los índices locales el tamaño de las carpetas de cada destino."""
+        for target in self.ftp_targets:
+            index = self.get_remote_index(target)
+            if index is not None:
+                self.folder_summaries[target["name"]] = index.folder_summaries(target["base_path"])
+
     def update_tabs(self, used, available):
         """Actualiza las pestañas con carpetas disponibles y usadas."""
-        def fill_table(table, data, headers):
-            table.setRowCount(len(data))
-            table.setColumnCount(len(headers))
-            table.setHorizontalHeaderLabels(headers)
-            for row, items in enumerate(data):
-                for col, item in enumerate(items):
-                    table.setItem(row, col, QTableWidgetItem(item))
-            table.resizeColumnsToContents()
-
-        fill_table(self.available_table, [(folder,) for folder in available], ["Carpetas Disponibles"])
-        fill_table(self.used_table, used, ["Carpeta", "Editor"])
+        with span("ui.update_tabs", used=len(used), available=len(available)):
+            self.load_folder_summaries()
+            empty = (None, None, None)
+
+            def available_row(folder, server):
+                files, size, _ = self.folder_summaries.get(server, {}).get(folder, empty)
+                return folder, size, files, server
+
+            self.available_model.set_rows(available_row(folder, server) for folder, server in available)
+            self.used_model.set_rows(used)
+
+    def refresh_remote_index(self):
+        """Actualiza en segundo plano los índices del FTP (tamaños y cantidad de archivos), un hilo por destino."""
+        for target in self.ftp_targets:
+            index = self.get_remote_index(target)
+            if index is None or target["name"] in self.index_workers or target["name"] in self.analysis_failures:
+                continue
+
+            thread = QThread()
+            worker = IndexWorker(target, index, pool=self.get_ftp_pool(target))
+            worker.moveToThread(thread)
+
+            worker.progress.connect(self.update_index_progress)
+            worker.finished.connect(lambda summaries, server=target["name"]: self.index_finished(server, summaries))
+            worker.error.connect(lambda message, server=target["name"]: self.index_error(server, message))
+
+            thread.started.connect(worker.run)
+            thread.finished.connect(thread.deleteLater)
+            self.index_workers[target["name"]] = (thread, worker)
+            thread.start()
+
+    def update_index_progress(self, listed, path):
+        self.index_label.setText(f"Indexando el FTP: {listed} carpetas revisadas ({path})")
+
+    def index_finished(self, server, summaries):
+        # Se reemplazan las columnas completas, con los tamaños de todos los servidores
+        self.folder_summaries[server] = summaries
+        by_row = {
+            (folder, name): summary
+            for name, folders in self.folder_summaries.items() for folder, summary in folders.items()
+        }
+        self.available_model.set_column_values(1, {key: summary.bytes for key, summary in by_row.items()})
+        self.available_model.set_column_values(2, {key: summary.files for key, summary in by_row.items()})
+        self.index_worker_done(server)
+
+    def index_error(self, server, error_message):
+        self.index_worker_done(server)
+        self.index_label.setText(f"No se pudo actualizar el índice de {server}: {error_message}")
+
+    def index_worker_done(self, server):
+        thread, _ = self.index_workers.pop(server, (None, None))
+        if thread is not None:
+            thread.quit()
+        if not self.index_workers:
+            self.index_label.setText("")
 
     def analyze_folders(self):
-        """Analiza las carpetas en el servidor FTP."""
+        """Analiza las carpetas en el servidor FTP en un hilo separado."""
         try:
             self.validate_ftp_and_sheet_config()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error al analizar carpetas: {e}")
+            return
 
-            ftp = connect_ftp(self.ftp_config["host"], self.ftp_config["user"], self.ftp_config["password"])
-            self.sheet_data = load_excel_data(self.google_sheet_url, self.credential_path)
-
-            used, available = verificar_carpetas_ftp(ftp, self.ftp_config["base_path"], self.sheet_data, "Carpeta")
-            close_ftp_connection(ftp)
-
-            used_with_editor = [
-                (folder, self.sheet_data.loc[self.sheet_data["Carpeta"] == folder, "Editor"].values[0]
-                if len(self.sheet_data.loc[self.sheet_data["Carpeta"] == folder, "Editor"].values) > 0
-                else "Sin Editor")
-                for folder in used
-            ]
+        remote_indexes = {}
+        pools = {}
+        for target in self.ftp_targets:
+            remote_indexes[target["name"]] = self.get_remote_index(target)
+            pools[target["name"]] = self.get_ftp_pool(target)
+        self.analysis_failures = {}
+        self.listed_folders = {}
+
+        self.analysis_thread = QThread()
+        self.analysis_worker = AnalysisWorker(
+            self.ftp_targets, self.google_sheet_url, self.credential_path, remote_indexes, pools=pools,
+        )
+        self.analysis_worker.moveToThread(self.analysis_thread)
+
+        self.analysis_worker.folders_listed.connect(self.analysis_folders_listed)
+        self.analysis_worker.sheet_loaded.connect(self.analysis_sheet_loaded)
+        self.analysis_worker.target_failed.connect(self.analysis_target_failed)
+        self.analysis_worker.finished.connect(self.analysis_finished)
+        self.analysis_worker.error.connect(self.analysis_error)
+
+        self.analysis_thread.started.connect(self.analysis_worker.run)
+        self.analysis_thread.finished.connect(self.analysis_thread.deleteLater)
 
+        self.analyze_btn.setEnabled(False)
+        self.progress_label.setText("Analizando: conectando al FTP y a Google Sheets...")
+        self.analysis_thread.start()
+
+    def analysis_folders_listed(self, folders_by_server):
+        """Muestra las carpetas de los servidores que ya respondieron mientras se espera al resto."""
+        self.listed_folders = folders_by_server
+        total = sum(len(folders) for folders in folders_by_server.values())
+        # Resultado provisional con la planilla del análisis anterior, si la hay
+        if hasattr(self, "sheet_data"):
+            used_with_editor, available, _ = analizar_destinos(folders_by_server, self.sheet_data, "Carpeta", "Editor")
             self.update_tabs(used_with_editor, available)
-            QMessageBox.information(self, "Análisis Completo", "Análisis de carpetas completado.")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error al analizar carpetas: {e}")
+            self.progress_label.setText(
+                f"Analizando: {total} carpetas en {len(folders_by_server)} de {len(self.ftp_targets)} servidores..."
+            )
+        else:
+            # Sin planilla no se sabe cuáles están en uso: se listan sin clasificar
+            # y no se pueden descargar hasta que llegue
+            self.update_tabs([], sorted(
+                (folder, server) for server, folders in folders_by_server.items() for folder in folders
+            ))
+            self.download_btn.setEnabled(False)
+            self.progress_label.setText(
+                f"Analizando: {total} carpetas en {len(folders_by_server)} de {len(self.ftp_targets)} servidores, "
+                "sin clasificar hasta cargar la planilla..."
+            )
+
+    def analysis_sheet_loaded(self, sheet_data):
+        self.sheet_data = sheet_data
+        if self.listed_folders:
+            used_with_editor, available, _ = analizar_destinos(self.listed_folders, sheet_data, "Carpeta", "Editor")
+            self.update_tabs(used_with_editor, available)
+        self.download_btn.setEnabled(True)
+        self.progress_label.setText("Analizando: planilla cargada, esperando el listado del FTP...")
+
+    def analysis_target_failed(self, server, error_message):
+        """Registra un servidor que falló o no respondió; el análisis sigue con los demás."""
+        self.analysis_failures[server] = error_message
+        self.progress_label.setText(f"Analizando: {server} no respondió ({error_message})")
+
+    def analysis_finished(self, used_with_editor, available, missing):
+        self.update_tabs(used_with_editor, available)
+        self.download_btn.setEnabled(True)
+        self.progress_label.setText("Análisis de carpetas completado.")
+        self.analyze_btn.setEnabled(True)
+        self.analysis_thread.quit()
+        # Tamaños y cantidad de archivos: sólo se listan las carpetas que cambiaron
+        self.refresh_remote_index()
+
+        message = "Análisis de carpetas completado."
+        if missing:
+            message += f"\n{len(missing)} carpetas de la planilla no existen en el FTP."
+        if self.analysis_failures:
+            message += "\nServidores sin analizar:\n" + "\n".join(
+                f"{server}: {error}" for server, error in self.analysis_failures.items()
+            )
+            QMessageBox.warning(self, "Análisis Completo", message)
+        else:
+            QMessageBox.information(self, "Análisis Completo", message)
+
+    def analysis_error(self, error_message):
+        self.progress_label.setText("")
+        if not hasattr(self, "sheet_data"):
+            # No se llegó a cargar la planilla: no dejar carpetas sin clasificar como disponibles
+            self.update_tabs([], [])
+        self.download_btn.setEnabled(True)
+        self.analyze_btn.setEnabled(True)
+        self.analysis_thread.quit()
+        QMessageBox.critical(self, "Error", f"Error al analizar carpetas: {error_message}")
 
     def validate_ftp_and_sheet_config(self):
         """Valida la configuración del FTP y Google Sheets."""
+        if not self.ftp_targets:
+            raise Exception("No hay ningún servidor FTP configurado.")
         required_keys = ["host", "user", "password", "base_path"]
-        for key in required_keys:
-            if key not in self.ftp_config or not self.ftp_config[key]:
-                raise Exception(f"Falta la clave de configuración: {key}")
+        for target in self.ftp_targets:
+            for key in required_keys:
+                if key not in target or not target[key]:
+                    raise Exception(f"Falta la clave de configuración {key} en {target['name']}")
 
         if not self.google_sheet_url:
             raise Exception("URL de Google Sheets no configurada.")
 
     def download_and_update(self):
-        """Descarga un directorio y actualiza Google Sheets."""
+        """Encola la descarga de las carpetas seleccionadas y actualiza Google Sheets al terminar cada una."""
         if not self.google_sheet_url:
             QMessageBox.warning(self, "Error", "Por favor, carga los datos de Google Sheets primero.")
             return
 
-        selected_row = self.available_table.currentRow()
-        if selected_row == -1:
+        selected = self.selected_folders(self.available_table, self.available_proxy, self.available_model)
+        if not selected:
             QMessageBox.warning(self, "Error", "Por favor, selecciona una carpeta disponible.")
             return
 
-        selected_folder = self.available_table.item(selected_row, 0).text()
+        busy = [key for key in selected if self.download_manager.find_active(*key)]
+        selected = [key for key in selected if key not in busy]
+        if not selected:
+            QMessageBox.warning(self, "Error", "Las carpetas seleccionadas ya están en la cola de descargas.")
+            return
+
         editor, ok = QInputDialog.getText(self, "Nombre del Editor", "Introduce tu nombre:")
         if not ok or not editor.strip():
             QMessageBox.warning(self, "Error", "El nombre del editor es obligatorio.")
             return
-        
-        base_path = self.ftp_config["base_path"]
-        remote_directory = f"{base_path}/{selected_folder}"
+
+        for folder, server in selected:
+            local_directory = os.path.join(self.download_path, folder)
+            # Si la carpeta ya se descargó antes, transferir solo lo nuevo o modificado
+            self.enqueue_download(
+                folder,
+                server,
+                local_directory,
+                editor=editor,
+                mirror=os.path.exists(os.path.join(local_directory, MANIFEST_FILE_NAME)),
+            )
+        self.tab_widget.setCurrentWidget(self.downloads_tab)
+
+    def sync_used_folder(self):
+        """Actualiza una carpeta ya descargada transfiriendo solo los archivos nuevos o modificados."""
+        selected = self.selected_folder(self.used_table, self.used_proxy, self.used_model)
+        if selected is None:
+            QMessageBox.warning(self, "Error", "Por favor, selecciona una carpeta en uso.")
+            return
+        selected_folder, server = selected
+        if self.download_manager.find_active(selected_folder, server):
+            QMessageBox.warning(self, "Error", "La carpeta ya está en la cola de descargas.")
+            return
+
+        self.enqueue_download(
+            selected_folder,
+            server,
+            os.path.join(self.download_path, selected_folder),
+            mirror=True,
+            delete_extraneous=self.delete_extraneous_checkbox.isChecked(),
+        )
+        self.tab_widget.setCurrentWidget(self.downloads_tab)
+
+    def return_used_folder(self):
+        """Sube al FTP los archivos nuevos o modificados de una carpeta en uso y marca la devolución en la planilla."""
+        selected = self.selected_folder(self.used_table, self.used_proxy, self.used_model)
+        if selected is None:
+            QMessageBox.warning(self, "Error", "Por favor, selecciona una carpeta en uso.")
+            return
+        selected_folder, server = selected
         local_directory = os.path.join(self.download_path, selected_folder)
+        if not os.path.isdir(local_directory):
+            QMessageBox.warning(self, "Error", f"No existe la carpeta local {local_directory}.")
+            return
+        if self.download_manager.find_active(selected_folder, server):
+            QMessageBox.warning(self, "Error", "La carpeta ya está en la cola de descargas.")
+            return
+
+        self.enqueue_download(selected_folder, server, local_directory, upload=True)
+        self.tab_widget.setCurrentWidget(self.downloads_tab)
+
+    def enqueue_download(self, folder, server, local_directory, editor=None, mirror=False, delete_extraneous=False,
+                         upload=False):
+        """Agrega una carpeta de un servidor a la cola de descargas (o de subidas, con upload=True)."""
+        try:
+            target = find_target(self.ftp_targets, server)
+        except KeyError as e:
+            # El servidor se quitó de la configuración después del análisis
+            QMessageBox.warning(self, "Error", f"{folder}: {e.args[0]}")
+            return
         os.makedirs(local_directory, exist_ok=True)
+        remote_directory = f"{target['base_path']}/{folder}"
+        self.download_manager.enqueue(DownloadJob(
+            folder, remote_directory, local_directory,
+            editor=editor, mirror=mirror, delete_extraneous=delete_extraneous,
+            server=server, ftp_config=target, pool=self.get_ftp_pool(target), upload=upload,
+        ))
+
+    def selected_download_job(self):
+        """Devuelve el trabajo seleccionado en la pestaña de descargas, o None."""
+        row = self.downloads_table.currentRow()
+        for job, job_row in self.download_rows.items():
+            if job_row == row:
+                return job
+        return None
+
+    def toggle_pause_download(self):
+        job = self.selected_download_job()
+        if job is None:
+            QMessageBox.warning(self, "Error", "Por favor, selecciona una descarga.")
+            return
+        if job.status == STATUS_PAUSED:
+            self.download_manager.resume(job)
+        else:
+            self.download_manager.pause(job)
 
-        self.thread = QThread()
-        self.worker = DownloadWorker(self.ftp_config, remote_directory, local_directory)
-        self.worker.moveToThread(self.thread)
+    def cancel_download(self):
+        job = self.selected_download_job()
+        if job is None:
+            QMessageBox.warning(self, "Error", "Por favor, selecciona una descarga.")
+            return
+        self.download_manager.cancel(job)
+
+    def add_download_row(self, job):
+        row = self.downloads_table.rowCount()
+        self.downloads_table.insertRow(row)
+        self.download_rows[job] = row
+        self.update_download_row(job)
+
+    def update_download_row(self, job):
+        """Actualiza la fila de un trabajo en la pestaña de descargas."""
+        row = self.download_rows.get(job)
+        if row is None:
+            return
 
-        self.worker.progress.connect(self.update_progress)
-        self.worker.finished.connect(lambda msg: self.download_finished(msg, selected_row, selected_folder, editor))
-        self.worker.error.connect(self.handle_error)
+        stats = job.stats
+        if stats is None:
+            progress, rate, eta = "", "", ""
+        else:
+            if stats.bytes_total:
+                percentage = min(stats.bytes_done * 100 / stats.bytes_total, 100)
+            else:
+                percentage = stats.files_done * 100 / max(stats.files_total, 1)
+            progress = (f"{percentage:.0f}% - {stats.files_done}/{stats.files_total} archivos, "
+                        f"{format_bytes(stats.bytes_done)} de {format_bytes(stats.bytes_total)}")
+            rate = f"{stats.rate / (1024 * 1024):.1f} MB/s"
+            eta = format_duration(stats.eta)
+        if job.finished:
+            rate, eta = "", ""
+
+        for column, value in enumerate([job.folder, job.server or "", job.status, progress, rate, eta]):
+            self.downloads_table.setItem(row, column, QTableWidgetItem(value))
+        self.update_transfer_progress()
+
+    def update_transfer_progress(self):
+        """Actualiza la barra con el total de las descargas en curso, la velocidad y el tiempo restante."""
+        running = [job for job in self.download_manager.running_jobs() if job.stats is not None]
+        if not running:
+            self.progress_bar.setValue(0)
+            self.progress_label.setText("")
+            return
 
-        self.thread.started.connect(self.worker.run)
-        self.thread.finished.connect(self.thread.deleteLater)
+        bytes_done = sum(job.stats.bytes_done for job in running)
+        bytes_total = sum(job.stats.bytes_total for job in running)
+        rate = sum(job.stats.rate for job in running)
+        eta = (bytes_total - bytes_done) / rate if rate > 0 else None
+
+        # QProgressBar usa enteros de 32 bits: se trabaja en milésimas del total
+        self.progress_bar.setMaximum(1000)
+        self.progress_bar.setValue(min(int(bytes_done * 1000 / bytes_total), 1000) if bytes_total else 0)
+        self.progress_label.setText(
+            f"Descargando {len(running)} carpetas: "
+            f"{format_bytes(bytes_done)} de {format_bytes(bytes_total)} - "
+            f"{rate / (1024 * 1024):.1f} MB/s - ETA {format_duration(eta)}"
+        )
+
+    def download_job_finished(self, job):
+        """Registra en la planilla las carpetas descargadas o devueltas y avisa del resultado."""
+        if job.upload and job.status == STATUS_DONE and self.google_sheet_url:
+            # Sólo una devolución completa se marca en la fila de la carpeta
+            self.sheet_queue.enqueue_update(
+                self.google_sheet_url, job.folder, {RETURNED_HEADER: time.strftime("%Y-%m-%d %H:%M")}
+            )
+            self.update_sheet_queue_label()
+        elif job.editor and job.status in (STATUS_DONE, STATUS_DONE_WITH_ERRORS):
+            self.sheet_queue.enqueue(self.google_sheet_url, [job.folder, job.editor])
+            self.update_sheet_queue_label()
+
+            # Mover solo la fila afectada, sin reconstruir las tablas
+            self.available_model.remove_folder((job.folder, job.server))
+            self.used_model.append_row((job.folder, job.editor, job.server))
+
+        self.progress_label.setText(f"{job.folder}: {job.status}")
+        if job.status not in (STATUS_DONE, STATUS_DONE_WITH_ERRORS, STATUS_CANCELLED):
+            action = "la subida" if job.upload else "la descarga"
+            QMessageBox.critical(self, "Error", f"Error durante {action} de {job.folder}: {job.message}")
+        elif job.status == STATUS_DONE_WITH_ERRORS:
+            title = "Subida con errores" if job.upload else "Descarga con errores"
+            QMessageBox.warning(self, title, f"{job.folder}: {job.message}")
+
+    def verify_used_folder(self):
+        """Comprueba los archivos de una carpeta descargada contra su manifiesto, en un hilo separado."""
+        selected = self.selected_folder(self.used_table, self.used_proxy, self.used_model)
+        if selected is None:
+            QMessageBox.warning(self, "Error", "Por favor, selecciona una carpeta en uso.")
+            return
 
-        self.progress_bar.setValue(0)
-        self.progress_label.setText("Descargando: ")
-        self.thread.start()
+        selected_folder = selected[0]
+        local_directory = os.path.join(self.download_path, selected_folder)
+        if not os.path.exists(os.path.join(local_directory, MANIFEST_FILE_NAME)):
+            QMessageBox.warning(self, "Error", f"No hay un manifiesto de descarga en {local_directory}.")
+            return
 
-    def update_progress(self, current, total, filename=None):
-        self.progress_bar.setMaximum(total)
-        self.progress_bar.setValue(current)
-        percentage = int((current / total) * 100)
-        if filename:
-            self.progress_label.setText(f"Descargando: {filename} ({percentage}%)")
-        else:
-            self.progress_label.setText(f"Progreso: ({percentage}%)")
-            
-    def handle_error(self, error_message):
-        QMessageBox.critical(self, "Error", f"Error durante la descarga: {error_message}")
-        self.progress_bar.setValue(0)
-        self.thread.quit()
+        self.verify_thread = QThread()
+        self.verify_worker = VerifyWorker(local_directory)
+        self.verify_worker.moveToThread(self.verify_thread)
 
-    def download_finished(self, message, selected_row, selected_folder, editor):
-        QMessageBox.information(self, "Descarga completa", message)
-        append_row_to_google_sheet(self.google_sheet_url, self.credential_path, [selected_folder, editor])
+        self.verify_worker.progress.connect(self.update_verify_progress)
+        self.verify_worker.finished.connect(lambda result: self.verify_finished(result, selected_folder))
+        self.verify_worker.error.connect(self.verify_error)
 
-        self.available_table.removeRow(selected_row)
-        row_position = self.used_table.rowCount()
-        self.used_table.insertRow(row_position)
-        self.used_table.setItem(row_position, 0, QTableWidgetItem(selected_folder))
-        self.used_table.setItem(row_position, 1, QTableWidgetItem(editor))
+        self.verify_thread.started.connect(self.verify_worker.run)
+        self.verify_thread.finished.connect(self.verify_thread.deleteLater)
 
+        self.verify_btn.setEnabled(False)
+        self.progress_label.setText(f"Verificando {selected_folder}...")
+        self.verify_thread.start()
+
+    def update_verify_progress(self, current, total, filename):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(current)
+        self.progress_label.setText(f"Verificando: {filename} ({current}/{total})")
+
+    def verify_finished(self, result, selected_folder):
+        self.verify_btn.setEnabled(True)
+        self.verify_thread.quit()
         self.progress_bar.setValue(0)
-        self.thread.quit()
+        self.progress_label.setText("")
+        if result.mismatched or result.missing:
+            QMessageBox.warning(
+                self, "Verificación",
+                f"{selected_folder}: {verify_message(result)}\n\nSincroniza la carpeta para volver a descargarlos."
+            )
+        else:
+            QMessageBox.information(self, "Verificación", f"{selected_folder}: {verify_message(result)}")
+
+    def verify_error(self, error_message):
+        self.verify_btn.setEnabled(True)
+        self.verify_thread.quit()
+        self.progress_label.setText("")
+        QMessageBox.critical(self, "Error", f"Error al verificar la carpeta: {error_message}")
+
+    def update_sheet_queue_label(self):
+        """Muestra cuántas filas esperan ser enviadas a la planilla y cuántas se descartaron."""
+        pending = self.sheet_queue.pending_count
+        dead = self.sheet_queue.dead_count
+        if not pending and not dead:
+            self.sheet_queue_label.setText("")
+            return
+        if not pending:
+            text = "Planilla: sin filas pendientes"
+        elif self.sheet_queue.last_error is not None:
+            text = f"Planilla: {pending} filas pendientes (reintentando: {self.sheet_queue.last_error})"
+        else:
+            text = f"Planilla: {pending} filas pendientes de envío"
+        if dead:
+            text += f", {dead} descartadas por errores permanentes (ver {self.sheet_queue.path})"
+        self.sheet_queue_label.setText(text)
+
+    def closeEvent(self, event):
+        """Cancela las descargas en curso e intenta enviar las filas pendientes; el resto queda en disco."""
+        self.download_manager.cancel_all()
+        self.close_remote_index()
+        for job in self.download_manager.jobs:
+            if job.thread is None:
+                continue
+            try:
+                job.thread.wait(5000)
+            except RuntimeError:
+                pass  # Qt ya borró el hilo: el trabajo terminó
+        close_pools()
+        self.sheet_queue.stop()
+        disable_tracing()
+        super().closeEvent(event)
 
     def select_download_path(self):
         path = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta de Descarga", self.download_path)
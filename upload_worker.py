@@ -0,0 +1,55 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from data.download_engine import DownloadCancelled
+from data.upload_engine import UploadEngine, upload_summary_message
+
+
+class UploadWorker(QObject):
+    progress = pyqtSignal(int, int, str)  # Archivos subidos, total y el último archivo
+    finished = pyqtSignal(str)  # Señal para indicar que la subida ha terminado
+    error = pyqtSignal(str)  # Señal para indicar un error durante la subida
+    transfer_progress = pyqtSignal(object)  # TransferStats con bytes, velocidad y ETA
+    cancelled = pyqtSignal()  # Señal para indicar que la subida se canceló
+    result_ready = pyqtSignal(object)  # UploadResult, emitido justo antes de finished
+
+    def __init__(self, ftp_config, local_directory, remote_directory, max_connections=None,
+                 rate_limiter=None, control=None, pool=None):
+        """
+        Constructor del worker que devuelve una carpeta al FTP.
+
+        La subida la hace un UploadEngine; el worker sólo traduce sus
+        callbacks a señales de Qt, con las mismas señales que DownloadWorker.
+
+        Args:
+            ftp_config: Diccionario con las credenciales de FTP.
+            local_directory: Carpeta local a subir.
+            remote_directory: Directorio remoto de destino.
+            max_connections: Número de conexiones FTP simultáneas.
+            rate_limiter: TokenBucket compartido para limitar el ancho de banda.
+            control: TransferControl para pausar o cancelar la subida.
+            pool: FTPPool compartido de la aplicación.
+        """
+        super().__init__()
+        self.local_directory = local_directory
+        self.remote_directory = remote_directory
+        self.engine = UploadEngine(
+            ftp_config, local_directory, remote_directory,
+            max_connections=max_connections,
+            on_file_done=self.progress.emit,
+            on_transfer_progress=self.transfer_progress.emit,
+            rate_limiter=rate_limiter,
+            control=control,
+            pool=pool,
+        )
+
+    def run(self):
+        """
+        Ejecuta la subida en el hilo separado.
+        """
+        try:
+            result = self.engine.run()
+            self.result_ready.emit(result)
+            self.finished.emit(upload_summary_message(result))
+        except DownloadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.error.emit(str(e))
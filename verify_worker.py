@@ -0,0 +1,32 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from data.integrity import verify_directory
+
+
+class VerifyWorker(QObject):
+    progress = pyqtSignal(int, int, str)  # Archivos verificados, total y último archivo
+    finished = pyqtSignal(object)  # VerifyResult
+    error = pyqtSignal(str)  # Señal para indicar un error durante la verificación
+
+    def __init__(self, local_directory, max_workers=None):
+        """
+        Constructor del worker que verifica una carpeta descargada.
+
+        Args:
+            local_directory: Carpeta local con su manifiesto.
+            max_workers: Procesos para calcular hashes (por defecto, uno por núcleo).
+        """
+        super().__init__()
+        self.local_directory = local_directory
+        self.max_workers = max_workers
+
+    def run(self):
+        """
+        Compara los archivos de la carpeta con los hashes del manifiesto.
+        """
+        try:
+            result = verify_directory(
+                self.local_directory, self.max_workers, self.progress.emit, forget_mismatched=True
+            )
+            self.finished.emit(result)
+        except Exception as e:
+            self.error.emit(str(e))